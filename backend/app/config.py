@@ -0,0 +1,74 @@
+"""
+Runtime settings, read from environment variables
+"""
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# Where blocking model inference runs: "thread", "process" or "inline" (on the event loop)
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+# Number of worker threads/processes serving inference
+INFERENCE_WORKERS = _env_int("INFERENCE_WORKERS", min(4, os.cpu_count() or 1))
+# Maximum queued + running inference jobs before requests are rejected with 503
+INFERENCE_MAX_PENDING = _env_int("INFERENCE_MAX_PENDING", 64)
+
+# Forest evaluator: "sklearn" (the pickled pipeline) or "compiled" (array-backed CompiledForest).
+# Only "compiled" loads the memory-mapped cricket_model.bundle/ that workers share; with
+# "sklearn" every worker process unpickles its own copy of the pipeline.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "sklearn").lower()
+
+# SHAP explanations: "builtin" (exact TreeSHAP per input feature, no extra dependency)
+# or "shap" (shap.TreeExplainer per one-hot column, when the package is installed)
+SHAP_EXPLAINER = os.getenv("SHAP_EXPLAINER", "builtin").lower()
+
+# Micro-batching of concurrent /api/predict calls; a window of 0 disables it
+PREDICT_BATCH_WINDOW_MS = _env_float("PREDICT_BATCH_WINDOW_MS", 0.0)
+# Flush a micro-batch early once this many requests are waiting
+PREDICT_BATCH_MAX_SIZE = _env_int("PREDICT_BATCH_MAX_SIZE", 32)
+
+# Model registry: versioned artifacts under <dir>/versions/ and a CURRENT pointer (default: backend/models)
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "")
+# Seconds between checks of the CURRENT pointer for a new version to hot-swap in (0 disables the watcher)
+MODEL_WATCH_INTERVAL = _env_float("MODEL_WATCH_INTERVAL", 0.0)
+# Token required in the X-Admin-Token header by /api/admin endpoints (unset disables them)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Route requests to the registry's per-match_type models (formats/<match_type>/) when there are any
+FORMAT_MODELS = os.getenv("FORMAT_MODELS", "true").lower() not in ("0", "false", "no")
+# Estimated memory the lazily loaded per-format models may hold before the least recently used is dropped
+FORMAT_MODEL_MEMORY_MB = _env_float("FORMAT_MODEL_MEMORY_MB", 512.0)
+
+# Answer chase states of the fixtures in cricket_model.surfaces/ (build_surfaces.py) by array lookup
+LOOKUP_SURFACES = os.getenv("LOOKUP_SURFACES", "true").lower() not in ("0", "false", "no")
+
+# Add a Server-Timing header with the per-stage durations to every /api response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() not in ("0", "false", "no")
+
+# Scenario grid cells expanded and scored per model call (bounds memory for large grids)
+SCENARIO_GRID_CHUNK_ROWS = _env_int("SCENARIO_GRID_CHUNK_ROWS", 5000)
+
+# Load and warm up the model when the app starts instead of on the first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() not in ("0", "false", "no")
+# Warm-up runs at least/at most this many rounds of synthetic predictions...
+WARMUP_MIN_ITERATIONS = _env_int("WARMUP_MIN_ITERATIONS", 20)
+WARMUP_MAX_ITERATIONS = _env_int("WARMUP_MAX_ITERATIONS", 200)
+# ...and stops once the p50 of consecutive windows of this many rounds moves by less than the tolerance
+WARMUP_WINDOW = _env_int("WARMUP_WINDOW", 10)
+WARMUP_TOLERANCE = _env_float("WARMUP_TOLERANCE", 0.1)
+
+# In-process LRU cache of prediction results keyed on the normalized match state (0 disables)
+PREDICTION_CACHE_SIZE = _env_int("PREDICTION_CACHE_SIZE", 4096)
+# Seconds before a cached result expires (0 = only evicted by size or model reload)
+PREDICTION_CACHE_TTL = _env_float("PREDICTION_CACHE_TTL", 60.0)
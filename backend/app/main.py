@@ -1,8 +1,19 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app import metrics
 from app.routers import prediction
 
-app = FastAPI(title="Win Wise Cricket Insight API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm up the model in the background; /api/health turns ready when done
+    prediction.begin_startup()
+    yield
+    # Stop inference workers on shutdown
+    await prediction.shutdown_prediction_service()
+
+app = FastAPI(title="Win Wise Cricket Insight API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -23,3 +34,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Request and stage latency histograms and fallback counters for Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,189 @@
+"""
+Stage-level latency metrics in the Prometheus text format.
+
+Code on the prediction path times its stages with `stage(name)` and counts
+fallbacks with `count(name)`. Both go to the Timings collector of the
+current request (a context variable, so nothing is recorded outside a
+request). Inference executors run predictor calls under their own collector
+with `call_collecting` and merge it back into the caller's, which also
+carries the timings out of process pool workers. At the end of a request
+`observe()` adds them to the histograms and counters that `render()` exports.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Timings:
+    """Stage durations (seconds) and fallback counts of one request or one executor call"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        # Set by TimedRoute when the endpoint returns; serialization follows
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def merge(self, other: "Timings"):
+        for name, seconds in other.stages.items():
+            self.add(name, seconds)
+        for name, n in other.counts.items():
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, durations in ms"""
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items())
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+def current() -> Optional[Timings]:
+    return _current.get()
+
+
+@contextmanager
+def collect() -> Iterator[Timings]:
+    """Collect the stages and counts recorded in this block (and the calls it awaits)"""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one stage of the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def count(name: str, n: int = 1):
+    """Count a fallback (mock prediction, generated explanation) in the current request"""
+    timings = _current.get()
+    if timings is not None:
+        timings.counts[name] = timings.counts.get(name, 0) + n
+
+
+def call_collecting(function, *args) -> Tuple[object, Timings]:
+    """function(*args) and the timings it recorded, for running on executor threads and workers"""
+    with collect() as timings:
+        return function(*args), timings
+
+
+def merge(timings: Timings):
+    """Add timings collected elsewhere (an executor call, a micro-batch) to the current request"""
+    target = _current.get()
+    if target is not None:
+        target.merge(timings)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # Label values -> (per-bucket counts with +Inf last, sum)
+        self._series: Dict[Tuple[str, ...], Tuple[list, list]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        with self._lock:
+            counts, total = self._series.setdefault(labelvalues, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def count(self, *labelvalues: str) -> int:
+        """Observations of one series so far"""
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return sum(series[0]) if series else 0
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total[0]) for labels, (counts, total) in self._series.items()]
+        for labelvalues, counts, total in sorted(series):
+            labels = _labels(self.labelnames, labelvalues)
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{{{labels}{',' if labels else ''}le=\"{le}\"}} {cumulative}"
+            yield f"{self.name}_sum{{{labels}}} {total}"
+            yield f"{self.name}_count{{{labels}}} {cumulative}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n: float, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + n
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            yield f"{self.name}{{{_labels(self.labelnames, labelvalues)}}} {value}"
+
+
+REQUEST_SECONDS = Histogram("cricket_request_seconds", "Time spent in an API route handler",
+                            ("route", "method"))
+STAGE_SECONDS = Histogram("cricket_stage_seconds", "Time spent in each stage of an API request",
+                          ("route", "stage"))
+FALLBACKS = Counter("cricket_fallbacks_total",
+                    "Predictions not made by the model (mock_prediction, fallback_prediction) and "
+                    "explanations made up by dynamic_shap",
+                    ("route", "kind"))
+METRICS = (REQUEST_SECONDS, STAGE_SECONDS, FALLBACKS)
+
+
+def observe(route: str, method: str, timings: Timings, seconds: float):
+    """Record a finished request"""
+    REQUEST_SECONDS.observe(seconds, route, method)
+    for name, stage_seconds in timings.stages.items():
+        STAGE_SECONDS.observe(stage_seconds, route, name)
+    for name, n in timings.counts.items():
+        FALLBACKS.inc(n, route, name)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
@@ -0,0 +1,285 @@
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.ml.row_encoder import RowEncoder
+
+logger = logging.getLogger(__name__)
+
+# Bump when the array layout changes so stale artifacts are recompiled
+FORMAT_VERSION = 2
+
+
+class CompiledForest:
+    """
+    Array-backed evaluator for a trained CricketModelTrainer pipeline.
+
+    All trees of the RandomForest are flattened into contiguous node arrays,
+    and the preprocessing is folded into them:
+
+    - StandardScaler: every split on a scaled numerical feature is rewritten as
+      an equivalent threshold on the raw value, so inputs are only imputed.
+    - OneHotEncoder: each category maps straight to its indicator column, so
+      encoding a row is a dictionary lookup per categorical feature.
+
+    Traversal runs every tree at once, one depth level per numpy step.
+    Probabilities match the sklearn pipeline to floating point rounding.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 value: np.ndarray, cover: np.ndarray, roots: np.ndarray, max_depth: int,
+                 numerical_features: List[str], categorical_features: List[str],
+                 num_fill: np.ndarray, cat_fill: List, categories: List[List],
+                 slots: Optional[Dict[str, np.ndarray]] = None):
+        self.feature = feature          # (n_nodes,) input column tested at each node
+        self.threshold = threshold      # (n_nodes,) go right when x > threshold; +inf at leaves
+        self.children = children        # (n_nodes, 2) left/right child; leaves point at themselves
+        self.value = value              # (n_nodes,) class-1 probability at leaves
+        self.cover = cover              # (n_nodes,) weighted training samples reaching each node
+        self.roots = roots              # (n_trees,) root node of each tree
+        self.max_depth = int(max_depth)
+        self.numerical_features = list(numerical_features)
+        self.categorical_features = list(categorical_features)
+        self.num_fill = np.asarray(num_fill, dtype=np.float64)
+        self.cat_fill = list(cat_fill)
+        self.categories = [list(c) for c in categories]
+        # Raw (unscaled) numerical values followed by one-hot indicators
+        self.encoder = RowEncoder(numerical_features, categorical_features, num_fill=self.num_fill,
+                                  num_mean=None, num_scale=None, cat_fill=self.cat_fill,
+                                  categories=self.categories)
+
+        # Traversal layout: node i lives at slot 2*i (repeated at 2*i + 1), so the next
+        # slot is a single lookup at `slot + go_right` with no index arithmetic per level
+        if slots is None:
+            slots = {
+                'slot_feature': np.repeat(feature, 2).astype(np.intp),
+                'slot_threshold': np.repeat(threshold, 2),
+                'slot_child': (children.reshape(-1) * 2).astype(np.intp),
+                'slot_value': np.repeat(value, 2),
+                'root_slots': roots.astype(np.intp) * 2
+            }
+        self._slot_feature = slots['slot_feature']
+        self._slot_threshold = slots['slot_threshold']
+        self._slot_child = slots['slot_child']
+        self._slot_value = slots['slot_value']
+        self._root_slots = slots['root_slots']
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_pipeline(cls, model, numerical_features: List[str],
+                      categorical_features: List[str]) -> "CompiledForest":
+        """Compile a fitted preprocessor + RandomForestClassifier pipeline"""
+        scaled = RowEncoder.from_pipeline(model, numerical_features, categorical_features)
+        if scaled is None:
+            raise ValueError("Pipeline preprocessor has an unsupported structure")
+        forest = model.named_steps['classifier']
+        positive = list(forest.classes_).index(1)
+        n_numerical = len(numerical_features)
+        mean = scaled.num_mean if scaled.num_mean is not None else np.zeros(n_numerical)
+        scale = scaled.num_scale if scaled.num_scale is not None else np.ones(n_numerical)
+
+        features, thresholds, children, values, covers, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+            threshold = np.where(is_leaf, np.inf, tree.threshold).astype(np.float64)
+
+            # Rewrite numerical splits into raw-value thresholds
+            numeric = ~is_leaf & (feature < n_numerical)
+            threshold[numeric] = _raw_thresholds(threshold[numeric], mean[feature[numeric]], scale[feature[numeric]])
+            onehot = ~is_leaf & (feature >= n_numerical)
+            if np.any((tree.threshold[onehot] < 0) | (tree.threshold[onehot] >= 1)):
+                raise ValueError("Unexpected threshold on a one-hot column")
+
+            own = np.arange(n, dtype=np.int32) + offset
+            left = np.where(is_leaf, own, tree.children_left + offset).astype(np.int32)
+            right = np.where(is_leaf, own, tree.children_right + offset).astype(np.int32)
+
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1)
+            totals[totals == 0] = 1.0
+
+            features.append(feature)
+            thresholds.append(threshold)
+            children.append(np.stack([left, right], axis=1))
+            values.append(np.where(is_leaf, counts[:, positive] / totals, 0.0))
+            covers.append(tree.weighted_n_node_samples.astype(np.float64))
+            roots.append(offset)
+            offset += n
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children),
+            value=np.concatenate(values),
+            cover=np.concatenate(covers),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max(e.tree_.max_depth for e in forest.estimators_),
+            numerical_features=numerical_features,
+            categorical_features=categorical_features,
+            num_fill=scaled.num_fill,
+            cat_fill=scaled.cat_fill,
+            categories=scaled.categories
+        )
+
+    def encode(self, rows: List[Dict]) -> np.ndarray:
+        """Raw feature matrix for normalized input rows"""
+        return self.encoder.transform(rows)
+
+    def _leaf_slots(self, Z: np.ndarray) -> np.ndarray:
+        feature, threshold, child = self._slot_feature, self._slot_threshold, self._slot_child
+        if Z.shape[0] == 1:
+            # One row: a handful of small numpy calls per level is all the work
+            z = Z[0]
+            slot = self._root_slots
+            for _ in range(self.max_depth):
+                slot = child.take(slot + (z.take(feature.take(slot)) > threshold.take(slot)))
+            return slot[np.newaxis, :]
+
+        # Index the flattened matrix directly, 2-D fancy indexing is several times slower
+        values = np.ascontiguousarray(Z).reshape(-1)
+        row_start = (np.arange(Z.shape[0], dtype=np.intp) * Z.shape[1])[:, np.newaxis]
+        slot = np.broadcast_to(self._root_slots, (Z.shape[0], self.n_trees))
+        for _ in range(self.max_depth):
+            slot = child.take(slot + (values.take(row_start + feature.take(slot)) > threshold.take(slot)))
+        return slot
+
+    def apply(self, Z: np.ndarray) -> np.ndarray:
+        """Leaf node reached in every tree for every encoded row, shape (n_rows, n_trees)"""
+        return self._leaf_slots(Z) // 2
+
+    def predict_proba_encoded(self, Z: np.ndarray) -> np.ndarray:
+        """Class-1 probability for every encoded row"""
+        return self._slot_value.take(self._leaf_slots(Z)).mean(axis=1)
+
+    def predict_proba(self, rows: List[Dict]) -> np.ndarray:
+        """Class-1 (batting team wins) probability for every normalized input row"""
+        return self.predict_proba_encoded(self.encode(rows))
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """Every array, including the traversal layout, and the JSON-serializable metadata"""
+        arrays = {
+            'feature': self.feature, 'threshold': self.threshold, 'children': self.children,
+            'value': self.value, 'cover': self.cover, 'roots': self.roots, 'num_fill': self.num_fill,
+            'slot_feature': self._slot_feature, 'slot_threshold': self._slot_threshold,
+            'slot_child': self._slot_child, 'slot_value': self._slot_value, 'root_slots': self._root_slots
+        }
+        return arrays, self._meta()
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict) -> "CompiledForest":
+        """Rebuild from to_arrays() output without copying the arrays, e.g. memory maps"""
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format: {meta.get('format_version')}")
+        return cls(
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            children=arrays['children'],
+            value=arrays['value'],
+            cover=arrays['cover'],
+            roots=arrays['roots'],
+            max_depth=meta['max_depth'],
+            numerical_features=meta['numerical_features'],
+            categorical_features=meta['categorical_features'],
+            num_fill=arrays['num_fill'],
+            cat_fill=meta['cat_fill'],
+            categories=meta['categories'],
+            slots={name: arrays[name] for name in
+                   ('slot_feature', 'slot_threshold', 'slot_child', 'slot_value', 'root_slots')}
+        )
+
+    def _meta(self) -> Dict:
+        return {
+            'format_version': FORMAT_VERSION,
+            'max_depth': self.max_depth,
+            'numerical_features': self.numerical_features,
+            'categorical_features': self.categorical_features,
+            'cat_fill': [str(c) for c in self.cat_fill],
+            'categories': [[str(c) for c in cats] for cats in self.categories]
+        }
+
+    def save(self, path: Union[str, Path]) -> Path:
+        meta = self._meta()
+        path = Path(path)
+        # Write through a file handle so numpy doesn't append another .npz suffix
+        with open(path, 'wb') as f:
+            np.savez(f, feature=self.feature, threshold=self.threshold, children=self.children,
+                     value=self.value, cover=self.cover, roots=self.roots, num_fill=self.num_fill,
+                     meta=np.array(json.dumps(meta)))
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "CompiledForest":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('format_version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled model format: {meta.get('format_version')}")
+            return cls(
+                feature=data['feature'],
+                threshold=data['threshold'],
+                children=data['children'],
+                value=data['value'],
+                cover=data['cover'],
+                roots=data['roots'],
+                max_depth=meta['max_depth'],
+                numerical_features=meta['numerical_features'],
+                categorical_features=meta['categorical_features'],
+                num_fill=data['num_fill'],
+                cat_fill=meta['cat_fill'],
+                categories=meta['categories']
+            )
+
+
+def _ordered_keys(x: np.ndarray) -> np.ndarray:
+    """Map float64 values to uint64 keys with the same ordering"""
+    bits = x.view(np.int64)
+    return np.where(bits < 0, ~bits.view(np.uint64), bits.view(np.uint64) | np.uint64(1 << 63))
+
+
+def _from_ordered_keys(keys: np.ndarray) -> np.ndarray:
+    negative = keys < np.uint64(1 << 63)
+    bits = np.where(negative, ~keys, keys & np.uint64((1 << 63) - 1))
+    return bits.view(np.float64)
+
+
+def _raw_thresholds(threshold: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    Largest raw x per split with float32((x - mean) / scale) <= threshold.
+
+    That is exactly how the pipeline decides a split (StandardScaler in float64,
+    then the forest casts to float32), so `x <= raw` reproduces every decision.
+    Found by bisection over the ordered float64 values.
+    """
+    def goes_left(x):
+        with np.errstate(over='ignore', invalid='ignore'):
+            return ((x - mean) / scale).astype(np.float32) <= threshold
+
+    lo = _ordered_keys(np.full_like(threshold, -np.finfo(np.float64).max))
+    hi = _ordered_keys(np.full_like(threshold, np.finfo(np.float64).max))
+    all_left = goes_left(_from_ordered_keys(hi))
+    none_left = ~goes_left(_from_ordered_keys(lo))
+
+    # Invariant: goes_left(lo) and not goes_left(hi)
+    for _ in range(64):
+        mid = lo + (hi - lo) // np.uint64(2)
+        left = goes_left(_from_ordered_keys(mid))
+        lo = np.where(left, mid, lo)
+        hi = np.where(left, hi, mid)
+
+    raw = _from_ordered_keys(lo)
+    raw[all_left] = np.inf
+    raw[none_left] = -np.inf
+    return raw
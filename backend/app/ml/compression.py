@@ -0,0 +1,228 @@
+"""
+Smaller serving models derived from a trained pipeline.
+
+Every candidate keeps the trained pipeline's fitted preprocessor and
+replaces its classifier:
+
+- `prune:N`        the first N trees of the forest (its trees are
+                   interchangeable, so any N of them form an unbiased
+                   smaller forest)
+- `depth:D`        every tree cut back to depth D; the cut nodes become
+                   leaves holding their class distribution
+- `distill:N:D`    a new forest of N trees of depth D fitted on the trained
+                   forest's probabilities instead of the raw labels
+- `gbm:N`          a HistGradientBoosting model with N iterations, distilled
+                   the same way (sklearn backend only)
+
+evaluate() scores candidates on held-out rows: accuracy, log-loss, artifact
+size and single-row predict latency through the serving code paths.
+"""
+import copy
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.metrics import accuracy_score, log_loss
+from sklearn.pipeline import Pipeline
+
+from app.ml.compiled_forest import CompiledForest
+from app.ml.row_encoder import RowEncoder
+
+# Compared when no candidates are given
+DEFAULT_CANDIDATES = ['prune:50', 'prune:25', 'depth:12', 'depth:8', 'distill:50:10', 'gbm:100']
+
+# Held-out rows timed one at a time for the latency percentiles
+LATENCY_ROWS = 200
+
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+
+def parse_candidate(spec: str):
+    """'distill:50:10' -> ('distill', [50, 10])"""
+    kind, *args = spec.split(':')
+    arity = {'prune': 1, 'depth': 1, 'distill': 2, 'gbm': 1}
+    if kind not in arity or len(args) != arity[kind] or not all(a.isdigit() and int(a) > 0 for a in args):
+        raise ValueError(f"Unknown compression candidate '{spec}', expected one of "
+                         f"prune:N, depth:D, distill:N:D or gbm:N")
+    return kind, [int(a) for a in args]
+
+
+def build_candidate(model: Pipeline, spec: str, X_train: Optional[pd.DataFrame] = None,
+                    random_state: int = 42) -> Pipeline:
+    """A copy of the fitted pipeline with its classifier compressed as spec describes"""
+    kind, args = parse_candidate(spec)
+    preprocessor = model.named_steps['preprocessor']
+    forest = model.named_steps['classifier']
+
+    if kind == 'prune':
+        classifier = copy.copy(forest)
+        classifier.estimators_ = forest.estimators_[:args[0]]
+        classifier.n_estimators = len(classifier.estimators_)
+    elif kind == 'depth':
+        classifier = copy.copy(forest)
+        classifier.estimators_ = [_truncate_tree(estimator, args[0]) for estimator in forest.estimators_]
+        classifier.max_depth = min(args[0], forest.max_depth or args[0])
+    else:
+        if X_train is None:
+            raise ValueError(f"'{spec}' needs the training rows to distill from")
+        if kind == 'distill':
+            classifier = RandomForestClassifier(n_estimators=args[0], max_depth=args[1], min_samples_leaf=2,
+                                                random_state=random_state, n_jobs=-1)
+        else:
+            classifier = HistGradientBoostingClassifier(max_iter=args[0], random_state=random_state)
+            # HistGradientBoosting only takes dense input
+            preprocessor = copy.copy(preprocessor)
+            preprocessor.sparse_output_ = False
+        _distill(classifier, forest, _dense(preprocessor.transform(X_train)))
+        if isinstance(classifier, RandomForestClassifier):
+            classifier.set_params(n_jobs=None)
+
+    return Pipeline(steps=[('preprocessor', preprocessor), ('classifier', classifier)])
+
+
+def _distill(student, teacher: RandomForestClassifier, X: np.ndarray):
+    """
+    Fit student to the teacher's probabilities: every row appears once as a
+    win and once as a loss, weighted by the teacher's probability of each
+    """
+    positive = list(teacher.classes_).index(1)
+    p = teacher.predict_proba(X)[:, positive]
+    student.fit(np.vstack([X, X]), np.concatenate([np.ones(len(X), dtype=int), np.zeros(len(X), dtype=int)]),
+                sample_weight=np.concatenate([p, 1 - p]))
+
+
+def _truncate_tree(estimator, max_depth: int):
+    """Copy of a fitted tree whose nodes below max_depth are cut off, renumbered compactly"""
+    tree = estimator.tree_
+    cls, args, state = tree.__reduce__()
+    nodes, values = state['nodes'], state['values']
+
+    # Breadth-first over the kept nodes; old index -> new index
+    order, depth_of = [0], {0: 0}
+    for node in order:
+        left = nodes['left_child'][node]
+        if left != TREE_LEAF and depth_of[node] < max_depth:
+            for child in (left, nodes['right_child'][node]):
+                depth_of[child] = depth_of[node] + 1
+                order.append(child)
+    new_index = {old: new for new, old in enumerate(order)}
+
+    kept = nodes[order].copy()
+    for new, old in enumerate(order):
+        left = nodes['left_child'][old]
+        if left == TREE_LEAF or depth_of[old] >= max_depth:
+            kept['left_child'][new] = kept['right_child'][new] = TREE_LEAF
+            kept['feature'][new] = TREE_UNDEFINED
+            kept['threshold'][new] = TREE_UNDEFINED
+        else:
+            kept['left_child'][new] = new_index[left]
+            kept['right_child'][new] = new_index[nodes['right_child'][old]]
+
+    truncated = cls(*args)
+    truncated.__setstate__(dict(state, nodes=kept, values=values[order].copy(), node_count=len(order),
+                                max_depth=max(depth_of[old] for old in order)))
+    estimator = copy.copy(estimator)
+    estimator.tree_ = truncated
+    return estimator
+
+
+def _dense(X) -> np.ndarray:
+    X = X.toarray() if hasattr(X, 'toarray') else X
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def evaluate(name: str, model: Pipeline, X_test: pd.DataFrame, y_test, numerical_features: List[str],
+             categorical_features: List[str], fit_seconds: float = 0.0) -> Dict:
+    """Held-out quality, artifact size and single-row latency of one candidate"""
+    classifier = model.named_steps['classifier']
+    positive = list(classifier.classes_).index(1)
+    probabilities = model.predict_proba(X_test)[:, positive]
+
+    with tempfile.TemporaryDirectory(prefix="cricket-compress-") as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        joblib.dump(model, path)
+        pickle_bytes = os.path.getsize(path)
+
+    # Time rows the way the API sees them: normalized dicts
+    rows = X_test.head(LATENCY_ROWS).to_dict('records')
+    encoder = RowEncoder.from_pipeline(model, numerical_features, categorical_features)
+    sklearn_ms = _latencies(lambda row: classifier.predict_proba(encoder.transform([row])), rows)
+
+    try:
+        compiled = CompiledForest.from_pipeline(model, numerical_features, categorical_features)
+        compiled_ms = _latencies(lambda row: compiled.predict_proba([row]), rows)
+        compiled_bytes = sum(array.nbytes for array in compiled.to_arrays()[0].values())
+    except Exception:
+        # Not a random forest
+        compiled_ms, compiled_bytes = None, None
+
+    return {
+        'candidate': name,
+        'accuracy': accuracy_score(y_test, (probabilities > 0.5).astype(int)),
+        'log_loss': log_loss(y_test, np.clip(probabilities, 1e-15, 1 - 1e-15), labels=[0, 1]),
+        'n_trees': len(getattr(classifier, 'estimators_', [])) or getattr(classifier, 'n_iter_', 0),
+        'n_nodes': _node_count(classifier),
+        'pickle_mb': pickle_bytes / 1e6,
+        'compiled_mb': compiled_bytes / 1e6 if compiled_bytes is not None else None,
+        'fit_seconds': fit_seconds,
+        'sklearn_p50_ms': sklearn_ms[0],
+        'sklearn_p99_ms': sklearn_ms[1],
+        'compiled_p50_ms': compiled_ms[0] if compiled_ms else None,
+        'compiled_p99_ms': compiled_ms[1] if compiled_ms else None,
+    }
+
+
+def _latencies(predict, rows: List[Dict]):
+    """p50 and p99 of one call per row, in ms, after one untimed call"""
+    predict(rows[0])
+    timings = []
+    for row in rows:
+        started = time.perf_counter()
+        predict(row)
+        timings.append((time.perf_counter() - started) * 1000)
+    cuts = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return cuts[49], cuts[98]
+
+
+def _node_count(classifier) -> int:
+    if hasattr(classifier, 'estimators_'):
+        return int(sum(estimator.tree_.node_count for estimator in classifier.estimators_))
+    # HistGradientBoosting: one predictor per iteration and class
+    return int(sum(len(p.nodes) for iteration in getattr(classifier, '_predictors', []) for p in iteration))
+
+
+def compare(model: Pipeline, X_train: pd.DataFrame, X_test: pd.DataFrame, y_test, numerical_features: List[str],
+            categorical_features: List[str],
+            candidates: Optional[List[str]] = None) -> Tuple[List[Dict], Dict[str, Pipeline]]:
+    """Build and evaluate every candidate next to the full model; returns the report rows and the models"""
+    models, report = {'full': model}, [evaluate('full', model, X_test, y_test, numerical_features, categorical_features)]
+    for spec in candidates or DEFAULT_CANDIDATES:
+        started = time.perf_counter()
+        models[spec] = build_candidate(model, spec, X_train)
+        fit_seconds = time.perf_counter() - started
+        report.append(evaluate(spec, models[spec], X_test, y_test, numerical_features, categorical_features,
+                               fit_seconds))
+    return report, models
+
+
+def format_report(report: List[Dict]) -> str:
+    """Table of candidate results for the console"""
+    def ms(value):
+        return f"{value:8.3f}" if value is not None else f"{'-':>8}"
+
+    lines = [f"{'candidate':<15} {'accuracy':>8} {'log-loss':>8} {'nodes':>9} {'pkl MB':>7} {'arr MB':>7} "
+             f"{'build s':>7} {'skl p50':>8} {'skl p99':>8} {'cmp p50':>8} {'cmp p99':>8}"]
+    for r in report:
+        compiled_mb = f"{r['compiled_mb']:7.2f}" if r['compiled_mb'] is not None else f"{'-':>7}"
+        lines.append(f"{r['candidate']:<15} {r['accuracy']:8.4f} {r['log_loss']:8.4f} {r['n_nodes']:9,d} "
+                     f"{r['pickle_mb']:7.2f} {compiled_mb} {r['fit_seconds']:7.1f} "
+                     f"{ms(r['sklearn_p50_ms'])} {ms(r['sklearn_p99_ms'])} "
+                     f"{ms(r['compiled_p50_ms'])} {ms(r['compiled_p99_ms'])}")
+    return "\n".join(lines)
@@ -0,0 +1,375 @@
+"""
+Build cricket_features.csv from a directory of per-match ball-by-ball files.
+
+Every second-innings delivery of every decided limited-overs match becomes
+one training row: the chase state after that ball (CricketModelTrainer.chase_features)
+plus the teams, venue, toss and whether the chasing side went on to win.
+
+Supported Cricsheet layouts, found recursively under the match directory:
+
+- `<id>.json`: Cricsheet JSON
+- `<id>.yaml` / `<id>.yml`: Cricsheet YAML (needs PyYAML)
+- `<id>.csv` with `<id>_info.csv`: Cricsheet ball-by-ball CSV
+
+Matches are processed in parallel in a process pool, each into its own part
+file. A manifest records the size and mtime of every source file, so a
+rebuild only reprocesses new or changed matches and drops deleted ones
+before concatenating the parts into the output CSV.
+"""
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from app.ml.model_trainer import CricketModelTrainer
+
+try:
+    import yaml
+    _YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+# Bump when row semantics change so every match is reprocessed
+BUILDER_VERSION = 3
+
+MANIFEST = "manifest.json"
+
+COLUMNS = ['batting_team', 'bowling_team', 'venue', 'runs_required', 'balls_remaining', 'wickets_in_hand',
+           'target_match', 'current_run_rate', 'required_run_rate', 'toss_winner', 'toss_decision', 'win',
+           'match_type', 'match_id']
+
+# Innings length of limited-overs formats when a match file doesn't give one.
+# Other formats (Test, MDM) have no fixed chase length and give no rows.
+DEFAULT_OVERS = {'T20': 20, 'IT20': 20, 'ODI': 50, 'ODM': 50}
+
+
+class MatchFileError(ValueError):
+    """A match file that can't be turned into training rows"""
+
+
+def find_match_files(match_dir: Union[str, Path]) -> Dict[str, Path]:
+    """Match files under match_dir keyed by their path relative to it"""
+    match_dir = Path(match_dir)
+    files = {}
+    for path in sorted(match_dir.rglob("*")):
+        if not path.is_file():
+            continue
+        suffix = path.suffix.lower()
+        if suffix == ".json" or (suffix in (".yaml", ".yml") and YAML_AVAILABLE) \
+                or (suffix == ".csv" and not path.stem.endswith("_info")):
+            files[path.relative_to(match_dir).as_posix()] = path
+    return files
+
+
+def load_match(path: Union[str, Path]) -> Dict:
+    """
+    Parse one match file into a common shape:
+    info (teams, venue, toss, winner, match type, overs) and innings, each a
+    batting team, an optional target and deliveries as (runs, legal, wickets)
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".json":
+        with open(path) as f:
+            return _from_cricsheet(json.load(f))
+    if suffix in (".yaml", ".yml"):
+        if not YAML_AVAILABLE:
+            raise MatchFileError("PyYAML is not installed")
+        with open(path) as f:
+            return _from_cricsheet(yaml.load(f, Loader=_YAML_LOADER))
+    if suffix == ".csv":
+        return _from_ball_csv(path)
+    raise MatchFileError(f"Unsupported match file type: {suffix}")
+
+
+def skip_reason(match: Dict) -> Optional[str]:
+    """Why a match gives no chase rows, or None when it does"""
+    info = match['info']
+    innings = [i for i in match['innings'] if not i.get('super_over')]
+    if info.get('winner') is None:
+        return "no result"
+    if len(innings) < 2:
+        return "no second innings"
+    if _innings_overs(info, innings[1]) is None:
+        return f"not limited-overs ({info.get('match_type') or 'unknown format'})"
+    return None
+
+
+def chase_rows(match: Dict, match_id: str) -> Iterator[List]:
+    """
+    One row per second-innings delivery, in COLUMNS order; nothing for
+    undecided matches or formats without a known innings length
+    """
+    if skip_reason(match) is not None:
+        return
+    info = match['info']
+    innings = [i for i in match['innings'] if not i.get('super_over')]
+    first, second = innings[0], innings[1]
+    batting_team = second['team']
+    bowling_team = next((t for t in info['teams'] if t != batting_team), first['team'])
+    win = int(info['winner'] == batting_team)
+
+    balls_per_over = info.get('balls_per_over') or 6
+    target = second.get('target_runs') or sum(runs for runs, _, _ in first['deliveries']) + 1
+    total_balls = _overs_to_balls(_innings_overs(info, second), balls_per_over)
+
+    runs = wickets = balls = 0
+    for delivery_runs, legal, delivery_wickets in second['deliveries']:
+        runs += delivery_runs
+        wickets = min(wickets + delivery_wickets, 10)
+        balls += legal
+        features = CricketModelTrainer.chase_features(target, runs, wickets, balls, total_balls)
+        yield [
+            batting_team, bowling_team, info.get('venue'),
+            features['runs_required'], features['balls_remaining'], features['wickets_in_hand'],
+            features['target_match'], features['current_run_rate'], features['required_run_rate'],
+            info.get('toss_winner'), info.get('toss_decision'), win,
+            info.get('match_type'), match_id
+        ]
+
+
+def process_match_file(path: str, part_path: str, match_id: str) -> Tuple[int, Optional[str], Optional[str]]:
+    """
+    Write one match's rows to part_path; returns (rows, error, skip reason).
+    Runs in a worker process.
+    """
+    try:
+        match = load_match(path)
+        skipped = skip_reason(match)
+        rows = list(chase_rows(match, match_id))
+    except Exception as e:
+        return 0, f"{type(e).__name__}: {e}", None
+    tmp = f"{part_path}.tmp"
+    with open(tmp, "w", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+    os.replace(tmp, part_path)
+    return len(rows), None, skipped
+
+
+def build_features(match_dir: Union[str, Path], output_path: Union[str, Path],
+                   n_workers: Optional[int] = None, full: bool = False) -> Dict:
+    """
+    Incrementally rebuild output_path from the match files under match_dir.
+
+    Part files and the manifest live in `<output>.parts/`. Returns a summary of
+    what was reprocessed; `full` ignores the manifest and reprocesses everything.
+    """
+    started = time.perf_counter()
+    output_path = Path(output_path)
+    parts_dir = output_path.with_name(f"{output_path.stem}.parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {} if full else _read_manifest(parts_dir)
+
+    files = find_match_files(match_dir)
+    previous = manifest.get('matches', {})
+    entries, todo = {}, []
+    for key, path in files.items():
+        stamp = _source_stamp(path)
+        entry = previous.get(key)
+        if entry and entry['source'] == stamp and (entry['error'] or (parts_dir / entry['part']).exists()):
+            entries[key] = entry
+        else:
+            entries[key] = {'source': stamp, 'part': _part_name(key), 'rows': 0, 'error': None, 'skipped': None}
+            todo.append(key)
+
+    removed = [key for key in previous if key not in files]
+    for key in removed:
+        (parts_dir / previous[key]['part']).unlink(missing_ok=True)
+
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(todo) or 1))
+    print(f"{len(files)} match files: {len(todo)} new or changed, {len(removed)} removed, "
+          f"{len(files) - len(todo)} unchanged")
+    if todo:
+        # match_id is the relative path without its suffix: t20s/1234.json and odis/1234.json are different matches
+        jobs = [(str(files[key]), str(parts_dir / entries[key]['part']), Path(key).with_suffix("").as_posix())
+                for key in todo]
+        if n_workers == 1:
+            results = [process_match_file(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                chunksize = max(1, len(jobs) // (n_workers * 8))
+                results = list(pool.map(process_match_file, *zip(*jobs), chunksize=chunksize))
+        for key, (n_rows, error, skipped) in zip(todo, results):
+            entries[key]['rows'] = n_rows
+            entries[key]['error'] = error
+            entries[key]['skipped'] = skipped
+            if error:
+                (parts_dir / entries[key]['part']).unlink(missing_ok=True)
+                print(f"Skipped {key}: {error}")
+
+    # Manifest first: a crash while writing the output only costs the concatenation
+    _write_manifest(parts_dir, {'builder_version': BUILDER_VERSION, 'matches': entries})
+    n_rows = _concatenate(output_path, [parts_dir / entries[key]['part'] for key in sorted(entries)
+                                        if not entries[key]['error']])
+
+    skipped = Counter(e['skipped'] for e in entries.values() if e.get('skipped'))
+    if skipped:
+        print(f"{sum(skipped.values())} match files gave no rows: "
+              + ", ".join(f"{n} {reason}" for reason, n in skipped.most_common()))
+
+    summary = {
+        'match_files': len(files),
+        'processed': len(todo),
+        'removed': len(removed),
+        'failed': sum(1 for e in entries.values() if e['error']),
+        'skipped': sum(skipped.values()),
+        'rows': n_rows,
+        'wall_seconds': round(time.perf_counter() - started, 3)
+    }
+    print(f"Wrote {n_rows:,} rows to {output_path} in {summary['wall_seconds']:.1f}s")
+    return summary
+
+
+def _from_cricsheet(data: Dict) -> Dict:
+    """Cricsheet JSON, or YAML whose innings are single-key {"1st innings": {...}} maps"""
+    info = data.get('info') or {}
+    outcome = info.get('outcome') or {}
+    toss = info.get('toss') or {}
+    match = {
+        'info': {
+            'teams': list(info.get('teams') or []),
+            'venue': info.get('venue'),
+            'toss_winner': toss.get('winner'),
+            'toss_decision': toss.get('decision'),
+            'winner': outcome.get('winner') or outcome.get('eliminator'),
+            'match_type': info.get('match_type'),
+            'overs': info.get('overs'),
+            'balls_per_over': info.get('balls_per_over')
+        },
+        'innings': []
+    }
+    for innings in data.get('innings') or []:
+        if 'team' not in innings and len(innings) == 1:
+            innings = next(iter(innings.values()))
+        target = innings.get('target') or {}
+        if 'overs' in innings:
+            # JSON: overs -> deliveries
+            deliveries = [d for over in innings['overs'] for d in over.get('deliveries', [])]
+        else:
+            # YAML: a list of single-key {"0.1": delivery} maps
+            deliveries = [next(iter(d.values())) for d in innings.get('deliveries') or []]
+        match['innings'].append({
+            'team': innings.get('team'),
+            'super_over': bool(innings.get('super_over')),
+            'target_runs': target.get('runs'),
+            'target_overs': target.get('overs'),
+            'deliveries': [_delivery(d) for d in deliveries]
+        })
+    return match
+
+
+def _delivery(delivery: Dict) -> Tuple[int, int, int]:
+    extras = delivery.get('extras') or {}
+    legal = int('wides' not in extras and 'noballs' not in extras)
+    wickets = delivery.get('wickets', delivery.get('wicket')) or []
+    return int(delivery['runs']['total']), legal, len(wickets) if isinstance(wickets, list) else 1
+
+
+def _from_ball_csv(path: Path) -> Dict:
+    """Cricsheet ball-by-ball CSV plus its `<id>_info.csv` (toss, outcome, overs)"""
+    info_path = path.with_name(f"{path.stem}_info.csv")
+    if not info_path.exists():
+        raise MatchFileError(f"Missing {info_path.name}")
+    fields: Dict[str, List[str]] = {}
+    with open(info_path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) >= 3 and row[0] == "info":
+                fields.setdefault(row[1], []).append(row[2])
+
+    def first(name):
+        return fields.get(name, [None])[0]
+
+    innings: Dict[str, Dict] = {}
+    venue = first('venue')
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            venue = venue or row.get('venue')
+            entry = innings.setdefault(row['innings'], {
+                'team': row['batting_team'], 'super_over': int(row['innings']) > 2,
+                'target_runs': None, 'target_overs': None, 'deliveries': []
+            })
+            legal = int(not row.get('wides') and not row.get('noballs'))
+            wickets = int(bool(row.get('player_dismissed'))) + int(bool(row.get('other_player_dismissed')))
+            runs = int(row['runs_off_bat'] or 0) + int(row['extras'] or 0)
+            entry['deliveries'].append((runs, legal, wickets))
+
+    overs = first('overs')
+    balls_per_over = first('balls_per_over')
+    return {
+        'info': {
+            'teams': fields.get('team', []),
+            'venue': venue,
+            'toss_winner': first('toss_winner'),
+            'toss_decision': first('toss_decision'),
+            'winner': first('winner') or first('eliminator'),
+            'match_type': first('match_type'),
+            'overs': float(overs) if overs else None,
+            'balls_per_over': int(balls_per_over) if balls_per_over else None
+        },
+        'innings': [innings[k] for k in sorted(innings, key=int)]
+    }
+
+
+def _innings_overs(info: Dict, innings: Dict) -> Optional[Union[int, float]]:
+    """Overs available to an innings: its target overs, the match's, or its format's default"""
+    return innings.get('target_overs') or info.get('overs') or DEFAULT_OVERS.get(info.get('match_type'))
+
+
+def _overs_to_balls(overs: Union[int, float], balls_per_over: int) -> int:
+    """Cricket overs notation to balls: 17.3 overs is 17 overs and 3 balls"""
+    whole = int(overs)
+    return whole * balls_per_over + round((float(overs) - whole) * 10)
+
+
+def _source_stamp(path: Path) -> List[int]:
+    """Size and mtime of a match file, and of its info file for ball-by-ball CSVs"""
+    paths = [path]
+    if path.suffix.lower() == ".csv":
+        paths.append(path.with_name(f"{path.stem}_info.csv"))
+    stamp = []
+    for p in paths:
+        if p.exists():
+            stat = p.stat()
+            stamp += [stat.st_size, stat.st_mtime_ns]
+    return stamp
+
+
+def _part_name(key: str) -> str:
+    return key.replace("/", "__") + ".part.csv"
+
+
+def _read_manifest(parts_dir: Path) -> Dict:
+    try:
+        with open(parts_dir / MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get('builder_version') == BUILDER_VERSION else {}
+
+
+def _write_manifest(parts_dir: Path, manifest: Dict):
+    tmp = parts_dir / f"{MANIFEST}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, parts_dir / MANIFEST)
+
+
+def _concatenate(output_path: Path, parts: List[Path]) -> int:
+    """Header plus every part file, written to a temp file and swapped into place"""
+    n_rows = 0
+    tmp = output_path.with_name(f"{output_path.name}.tmp")
+    with open(tmp, "w", newline="") as out:
+        csv.writer(out, lineterminator="\n").writerow(COLUMNS)
+        for part in parts:
+            with open(part, newline="") as f:
+                chunk = f.read()
+            n_rows += chunk.count("\n")
+            out.write(chunk)
+    os.replace(tmp, output_path)
+    return n_rows
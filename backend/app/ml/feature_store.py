@@ -0,0 +1,217 @@
+"""
+Columnar, memory-mapped copy of cricket_features.csv for training.
+
+The CSV is streamed in chunks with explicit dtypes, categorical columns are
+dictionary-encoded to integer codes, and each column is appended to its own
+raw binary file. A manifest (dtypes, row count, vocabularies, source file
+stamp) is written last, so a store without one is incomplete.
+
+Reading maps the column files without loading them; only the rows and
+columns asked for are materialized, with categoricals as pandas Categoricals
+backed by the shared vocabulary instead of one Python string per cell.
+
+Partition columns (e.g. match_type) are stored like categorical features but
+are not model inputs; they select subsets of rows.
+"""
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+
+# Bump when the on-disk layout changes so stale stores are re-ingested
+FORMAT_VERSION = 1
+
+CODE_DTYPE = np.int32
+NUMERICAL_DTYPE = np.float32
+TARGET_DTYPE = np.int8
+
+DEFAULT_CHUNK_ROWS = 250_000
+
+
+class FeatureStore:
+    """Read side of an ingested feature store directory"""
+
+    def __init__(self, store_dir: Union[str, Path]):
+        self.path = Path(store_dir)
+        with open(self.path / MANIFEST) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature store format: {self.manifest.get('format_version')}")
+        self.n_rows = int(self.manifest['n_rows'])
+        self.categorical_features = list(self.manifest['categorical_features'])
+        self.numerical_features = list(self.manifest['numerical_features'])
+        self.target = self.manifest['target']
+        self.partition_columns = list(self.manifest.get('partition_columns', []))
+        self.vocabularies = {name: list(vocab) for name, vocab in self.manifest['vocabularies'].items()}
+        self._columns = {}
+
+    @staticmethod
+    def exists(store_dir: Union[str, Path]) -> bool:
+        return (Path(store_dir) / MANIFEST).is_file()
+
+    def is_current(self, csv_path: Union[str, Path]) -> bool:
+        """True if the store was ingested from csv_path as it is now"""
+        return self.manifest.get('source') == _file_stamp(csv_path)
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only memory map of one column (codes for categorical features)"""
+        if name not in self._columns:
+            spec = self.manifest['columns'][name]
+            if self.n_rows == 0:
+                self._columns[name] = np.zeros(0, dtype=spec['dtype'])
+            else:
+                self._columns[name] = np.memmap(self.path / spec['file'], dtype=spec['dtype'],
+                                                mode='r', shape=(self.n_rows,))
+        return self._columns[name]
+
+    def frame(self, columns: Sequence[str], rows: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        DataFrame of the given columns, for all rows or the given row indices.
+
+        Categorical features come back as pandas Categoricals (missing values
+        as NaN) and numerical features as float64, matching what the serving
+        pipeline is fed.
+        """
+        data = {}
+        for name in columns:
+            values = self.column(name)
+            values = values[rows] if rows is not None else np.asarray(values)
+            if name in self.vocabularies:
+                data[name] = pd.Categorical.from_codes(values, categories=self.vocabularies[name])
+            elif name == self.target:
+                data[name] = values.astype(np.int64)
+            else:
+                data[name] = values.astype(np.float64)
+        return pd.DataFrame(data)
+
+    def rows_where(self, column: str, value: str) -> np.ndarray:
+        """Indices of the rows whose categorical or partition column equals value"""
+        vocabulary = self.vocabularies[column]
+        if value not in vocabulary:
+            return np.zeros(0, dtype=np.intp)
+        return np.flatnonzero(self.column(column) == vocabulary.index(value))
+
+    def value_counts(self, column: str) -> Dict[str, int]:
+        """Rows per value of a categorical or partition column, missing values left out"""
+        codes = self.column(column)
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.vocabularies[column]))
+        return {value: int(count) for value, count in zip(self.vocabularies[column], counts)}
+
+    def labels(self, rows: Optional[np.ndarray] = None) -> pd.Series:
+        target = self.column(self.target)
+        return pd.Series(target[rows] if rows is not None else np.asarray(target), name=self.target)
+
+
+def ingest(csv_path: Union[str, Path], store_dir: Union[str, Path], categorical_features: List[str],
+           numerical_features: List[str], target: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+           partition_columns: Sequence[str] = ()) -> FeatureStore:
+    """
+    Stream csv_path into a feature store at store_dir, replacing any existing one.
+
+    Only one chunk of rows is ever held as a DataFrame. Partition columns the
+    CSV doesn't have are skipped.
+    """
+    store_dir = Path(store_dir)
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    store_dir.mkdir(parents=True)
+    partition_columns = _present_columns(csv_path, partition_columns)
+    encoded = list(categorical_features) + partition_columns
+
+    columns = {name: {'file': f"{name}.bin", 'dtype': np.dtype(CODE_DTYPE).name, 'kind': 'categorical'}
+               for name in categorical_features}
+    columns.update({name: {'file': f"{name}.bin", 'dtype': np.dtype(CODE_DTYPE).name, 'kind': 'partition'}
+                    for name in partition_columns})
+    columns.update({name: {'file': f"{name}.bin", 'dtype': np.dtype(NUMERICAL_DTYPE).name, 'kind': 'numerical'}
+                    for name in numerical_features})
+    columns[target] = {'file': f"{target}.bin", 'dtype': np.dtype(TARGET_DTYPE).name, 'kind': 'target'}
+
+    dtypes = {name: str for name in encoded}
+    dtypes.update({name: np.float64 for name in numerical_features})
+    dtypes[target] = np.float64
+    vocab_index: Dict[str, Dict[str, int]] = {name: {} for name in encoded}
+
+    started = time.perf_counter()
+    n_rows = 0
+    files = {name: open(store_dir / spec['file'], 'wb') for name, spec in columns.items()}
+    try:
+        for chunk in pd.read_csv(csv_path, usecols=list(columns), dtype=dtypes, chunksize=chunk_rows):
+            for name in encoded:
+                _encode(chunk[name], vocab_index[name]).tofile(files[name])
+            for name in numerical_features:
+                chunk[name].to_numpy(dtype=NUMERICAL_DTYPE).tofile(files[name])
+
+            labels = chunk[target]
+            if labels.isna().any():
+                raise ValueError(f"Missing '{target}' values in rows {n_rows}-{n_rows + len(chunk) - 1}")
+            labels.to_numpy(dtype=TARGET_DTYPE).tofile(files[target])
+            n_rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'n_rows': n_rows,
+        'categorical_features': categorical_features,
+        'numerical_features': numerical_features,
+        'target': target,
+        'partition_columns': partition_columns,
+        'columns': columns,
+        'vocabularies': {name: list(index) for name, index in vocab_index.items()},
+        'source': _file_stamp(csv_path)
+    }
+    # Written last and renamed into place: a store with a manifest is complete
+    tmp = store_dir / f"{MANIFEST}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, store_dir / MANIFEST)
+
+    size_mb = sum((store_dir / spec['file']).stat().st_size for spec in columns.values()) / 1e6
+    print(f"Ingested {n_rows:,} rows into {store_dir} ({size_mb:.1f} MB) in {time.perf_counter() - started:.1f}s")
+    return FeatureStore(store_dir)
+
+
+def open_or_ingest(csv_path: Union[str, Path], store_dir: Union[str, Path], categorical_features: List[str],
+                   numerical_features: List[str], target: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                   partition_columns: Sequence[str] = ()) -> FeatureStore:
+    """Reuse the store at store_dir if it was built from csv_path as it is now, otherwise re-ingest"""
+    if FeatureStore.exists(store_dir):
+        try:
+            store = FeatureStore(store_dir)
+            if (store.is_current(csv_path) and store.categorical_features == categorical_features
+                    and store.numerical_features == numerical_features and store.target == target
+                    and store.partition_columns == _present_columns(csv_path, partition_columns)):
+                return store
+        except (ValueError, KeyError, json.JSONDecodeError):
+            pass
+    return ingest(csv_path, store_dir, categorical_features, numerical_features, target, chunk_rows,
+                  partition_columns)
+
+
+def _present_columns(csv_path: Union[str, Path], names: Sequence[str]) -> List[str]:
+    """The given columns that the CSV's header has, in the given order"""
+    if not names:
+        return []
+    header = set(pd.read_csv(csv_path, nrows=0).columns)
+    return [name for name in names if name in header]
+
+
+def _encode(values: pd.Series, index: Dict[str, int]) -> np.ndarray:
+    """Integer codes for one chunk of a categorical column, growing its vocabulary; -1 for missing"""
+    for value in values.dropna().unique():
+        if value not in index:
+            index[value] = len(index)
+    return values.map(index).fillna(-1).to_numpy(dtype=CODE_DTYPE)
+
+
+def _file_stamp(path: Union[str, Path]) -> Dict:
+    stat = os.stat(path)
+    return {'path': str(Path(path).resolve()), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
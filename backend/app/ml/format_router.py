@@ -0,0 +1,141 @@
+"""
+Per-format model routing.
+
+Models trained on a single match_type live in the registry's
+`formats/<match_type>/` directories. FormatRouter sends every input to the
+model of its match_type and everything else to the default model. Format
+models are loaded on first use and kept in an LRU bounded by an estimated
+memory budget, so many format- or competition-specific models can be served
+without all of them being resident.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.ml.model_registry import ModelRegistry
+from app.ml.predictor import CricketPredictor, default_registry
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+class FormatRouter:
+    """
+    Route predictions on the input's match_type
+
+    Everything other than predict/predict_batch (model_path, model_version,
+    known_categories, cache, ...) is the default predictor's, so the router
+    stands in wherever a CricketPredictor is used.
+    """
+
+    def __init__(self, default: CricketPredictor, registry: ModelRegistry, memory_budget_mb: float = None):
+        self.default = default
+        self.registry = registry
+        self.memory_budget = (config.FORMAT_MODEL_MEMORY_MB if memory_budget_mb is None else memory_budget_mb) * 1e6
+        # Lower-cased match type -> format directory name
+        self.formats = {name.lower(): name for name in registry.formats()}
+        self._loaded: "OrderedDict[str, Tuple[CricketPredictor, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __getattr__(self, name):
+        return getattr(self.default, name)
+
+    def predictor_for(self, match_type: Optional[str]) -> CricketPredictor:
+        """Model for a match_type, loading it if needed; the default model for formats without one"""
+        name = self.formats.get(str(match_type).lower()) if match_type else None
+        if name is None:
+            return self.default
+
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                self.hits += 1
+                return self._loaded[name][0]
+            loading = self._loading.setdefault(name, threading.Lock())
+
+        # Concurrent first requests for one format share a single load
+        with loading:
+            with self._lock:
+                if name in self._loaded:
+                    self._loaded.move_to_end(name)
+                    self.hits += 1
+                    return self._loaded[name][0]
+            predictor = CricketPredictor(str(self.registry.format_registry(name).model_path()))
+            if not predictor.is_loaded:
+                logger.warning(f"Could not load the {name} model, using the default model for it")
+                self.formats.pop(name.lower(), None)
+                return self.default
+            size = predictor.memory_bytes()
+            with self._lock:
+                self._loaded[name] = (predictor, size)
+                self.loads += 1
+                self._evict()
+            logger.info(f"Loaded {name} model {predictor.model_version} ({size / 1e6:.1f} MB)")
+            return predictor
+
+    def _evict(self):
+        """Drop least recently used models until the rest fit the budget, keeping the newest one"""
+        while len(self._loaded) > 1 and sum(size for _, size in self._loaded.values()) > self.memory_budget:
+            name, (_, size) = self._loaded.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"Evicted {name} model ({size / 1e6:.1f} MB)")
+
+    def predict(self, input_data: Dict, explain: str = "full", use_cache: bool = True) -> Tuple[str, float, List[Dict]]:
+        return self.predictor_for(input_data.get('match_type')).predict(input_data, explain, use_cache)
+
+    def predict_batch(self, inputs: List[Dict], explain: Union[str, List[str]] = "full",
+                      use_cache: bool = True) -> List[Tuple[str, float, List[Dict]]]:
+        """One vectorized call per model the inputs route to, results in input order"""
+        levels = [explain] * len(inputs) if isinstance(explain, str) else list(explain)
+        groups: Dict[str, List[int]] = {}
+        for i, input_data in enumerate(inputs):
+            groups.setdefault(input_data.get('match_type'), []).append(i)
+
+        results = [None] * len(inputs)
+        for match_type, indices in groups.items():
+            outcomes = self.predictor_for(match_type).predict_batch([inputs[i] for i in indices],
+                                                                    [levels[i] for i in indices], use_cache)
+            for i, outcome in zip(indices, outcomes):
+                results[i] = outcome
+        return results
+
+    def score(self, inputs: List[Dict]) -> np.ndarray:
+        """Win probabilities only, one call per model the inputs route to"""
+        groups: Dict[str, List[int]] = {}
+        for i, input_data in enumerate(inputs):
+            groups.setdefault(input_data.get('match_type'), []).append(i)
+
+        probabilities = np.empty(len(inputs))
+        for match_type, indices in groups.items():
+            probabilities[indices] = self.predictor_for(match_type).score([inputs[i] for i in indices])
+        return probabilities
+
+    def stats(self) -> Dict:
+        with self._lock:
+            loaded = {name: {"model_version": predictor.model_version, "mb": round(size / 1e6, 1)}
+                      for name, (predictor, size) in self._loaded.items()}
+        return {
+            "formats": sorted(self.formats.values()),
+            "loaded": loaded,
+            "loaded_mb": round(sum(model["mb"] for model in loaded.values()), 1),
+            "budget_mb": round(self.memory_budget / 1e6, 1),
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
+
+
+def load_predictor(model_path: str = None) -> Union[CricketPredictor, FormatRouter]:
+    """The default model, behind a FormatRouter when the registry has per-format models"""
+    predictor = CricketPredictor(model_path)
+    registry = default_registry()
+    if config.FORMAT_MODELS and registry.formats():
+        return FormatRouter(predictor, registry)
+    return predictor
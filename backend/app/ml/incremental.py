@@ -0,0 +1,98 @@
+"""
+Incremental updates of a fitted CricketModelTrainer pipeline.
+
+New data is added by fitting extra trees on it (RandomForest warm start)
+with the preprocessor left as fitted, optionally retiring the oldest trees.
+Teams and venues the OneHotEncoder hasn't seen are added to its
+vocabulary: its columns are rebuilt in the usual sorted order and the
+split features of every existing tree are remapped to match, so old trees
+make exactly the same decisions as before.
+"""
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+def extend_categories(model, X_new: pd.DataFrame, numerical_features: List[str],
+                      categorical_features: List[str]) -> Dict[str, List]:
+    """
+    Add categories seen in X_new to the pipeline's OneHotEncoder, in place.
+
+    Returns the added categories per feature (empty if there were none).
+    """
+    preprocessor = model.named_steps['preprocessor']
+    encoder = preprocessor.named_transformers_['cat'].named_steps['onehot']
+    n_numerical = len(numerical_features)
+
+    added = {}
+    categories = []
+    for name, known in zip(categorical_features, encoder.categories_):
+        seen = pd.unique(X_new[name].dropna().astype(object))
+        extra = sorted(set(seen) - set(known.tolist()))
+        if extra:
+            added[name] = extra
+            categories.append(np.array(sorted(known.tolist() + extra), dtype=known.dtype))
+        else:
+            categories.append(known)
+    if not added:
+        return added
+
+    # Old encoded column -> new encoded column
+    column_map = list(range(n_numerical))
+    offset = n_numerical
+    for known, merged in zip(encoder.categories_, categories):
+        position = {c: i for i, c in enumerate(merged.tolist())}
+        column_map += [offset + position[c] for c in known.tolist()]
+        offset += len(merged)
+    n_features = offset
+
+    encoder.categories_ = categories
+    encoder._n_features_outs = encoder._compute_n_features_outs()
+    preprocessor.output_indices_['cat'] = slice(n_numerical, n_features)
+
+    forest = model.named_steps['classifier']
+    column_map = np.asarray(column_map, dtype=np.intp)
+    for estimator in forest.estimators_:
+        _remap_tree_features(estimator, column_map, n_features)
+    forest.n_features_in_ = n_features
+    return added
+
+
+def add_trees(model, X_new: pd.DataFrame, y_new, n_trees: int, retire_oldest: int = 0) -> Dict[str, int]:
+    """
+    Fit n_trees more trees on X_new with the existing preprocessor, then drop
+    the retire_oldest oldest trees. The pipeline is updated in place.
+    """
+    if len(np.unique(y_new)) < 2:
+        raise ValueError("New data must contain both wins and losses")
+    preprocessor = model.named_steps['preprocessor']
+    forest = model.named_steps['classifier']
+    n_before = len(forest.estimators_)
+    if retire_oldest >= n_before + n_trees:
+        raise ValueError("Cannot retire every tree")
+
+    forest.set_params(warm_start=True, n_estimators=n_before + n_trees)
+    try:
+        forest.fit(preprocessor.transform(X_new), y_new)
+    finally:
+        forest.set_params(warm_start=False)
+
+    if retire_oldest:
+        forest.estimators_ = forest.estimators_[retire_oldest:]
+        forest.set_params(n_estimators=len(forest.estimators_))
+    return {'trees_added': n_trees, 'trees_retired': retire_oldest, 'n_trees': len(forest.estimators_)}
+
+
+def _remap_tree_features(estimator, column_map: np.ndarray, n_features: int):
+    """Point a fitted tree's splits at the remapped encoded columns"""
+    tree = estimator.tree_
+    cls, args, state = tree.__reduce__()
+    nodes = state['nodes'].copy()
+    internal = nodes['left_child'] != -1
+    nodes['feature'][internal] = column_map[nodes['feature'][internal]]
+
+    remapped = cls(n_features, *args[1:])
+    remapped.__setstate__(dict(state, nodes=nodes))
+    estimator.tree_ = remapped
+    estimator.n_features_in_ = n_features
@@ -0,0 +1,231 @@
+"""
+Precomputed win-probability surfaces for configured fixtures.
+
+For one fixture (teams, venue, toss, target and innings length) every chase
+state is a cell of a runs_required x balls_remaining x wickets_in_hand grid,
+and the other numerical features (target, run rates) follow from the grid
+axes. build() scores every cell with batched model calls and stores each
+grid as a float16 (or float32) .npy array indexed
+[wickets_in_hand, balls_remaining, runs_required], plus a manifest, in
+`cricket_model.surfaces/` next to the model.
+
+LookupSurfaces maps those arrays and answers a query in the grid of a
+fixture by indexing it. Fixtures that differ only in innings length (a T20
+and an ODI with the same teams and target) are told apart by the run rates,
+which depend on the balls already bowled. Queries off the grid, or with run rates that don't
+follow from it, get None and go to the model.
+"""
+import json
+import logging
+import math
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.ml.model_trainer import CricketModelTrainer
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+# Bump when the surface layout changes so stale surfaces are ignored
+FORMAT_VERSION = 1
+
+# Fields that identify a fixture, besides its target
+FIXTURE_FIELDS = ('batting_team', 'bowling_team', 'venue', 'toss_winner', 'toss_decision')
+
+# Run rates in a query may differ from the ones the grid implies by this much (rounding to 2 decimals)
+RATE_TOLERANCE = 0.005
+
+# Grid cells scored per model call
+BUILD_CHUNK_ROWS = 20_000
+
+
+def surfaces_path(model_path: Union[str, Path]) -> Path:
+    """Surfaces directory that sits next to a cricket_model.pkl"""
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}.surfaces")
+
+
+def fixture_key(fields: Dict, target: int) -> Tuple:
+    """Key of a fixture's surfaces; the innings length is not part of it, queries don't carry one"""
+    return tuple(fields.get(name) for name in FIXTURE_FIELDS) + (int(target),)
+
+
+def build(predictor, fixtures: List[Dict], path: Union[str, Path], dtype: str = "float16") -> Path:
+    """
+    Score the full chase grid of every fixture and write the surfaces directory
+
+    A fixture has the FIXTURE_FIELDS, `target` and `total_balls`; toss fields
+    default like API requests do (team1 won the toss and batted). Raises
+    ValueError for two fixtures with the same fields, target and total_balls.
+    """
+    specs, seen = [], set()
+    for n, fixture in enumerate(fixtures):
+        fields = {
+            'batting_team': fixture['batting_team'],
+            'bowling_team': fixture['bowling_team'],
+            'venue': fixture['venue'],
+            'toss_winner': fixture.get('toss_winner') or fixture['batting_team'],
+            'toss_decision': fixture.get('toss_decision') or 'bat'
+        }
+        target, total_balls = int(fixture['target']), int(fixture['total_balls'])
+        key = fixture_key(fields, target) + (total_balls,)
+        if key in seen:
+            raise ValueError(f"Duplicate fixture {n}: {fields['batting_team']} chasing {target} v "
+                             f"{fields['bowling_team']} at {fields['venue']} in {total_balls} balls")
+        seen.add(key)
+        specs.append((fields, target, total_balls))
+
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    entries = []
+    for n, (fields, target, total_balls) in enumerate(specs):
+        started = time.perf_counter()
+        grid = _score_grid(predictor, fields, target, total_balls).astype(dtype)
+        file = f"surface_{n:04d}.npy"
+        np.save(tmp / file, grid, allow_pickle=False)
+        entries.append({**fields, 'target': target, 'total_balls': total_balls, 'file': file})
+        print(f"Scored {grid.size:,} states of {fields['batting_team']} chasing {target} v "
+              f"{fields['bowling_team']} at {fields['venue']} in {time.perf_counter() - started:.1f}s")
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'model_version': predictor.model_version,
+        'dtype': dtype,
+        'fixtures': entries
+    }
+    with open(tmp / MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if path.exists():
+        old = path.with_name(f"{path.name}.old-{os.getpid()}")
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(tmp, path)
+    return path
+
+
+def _score_grid(predictor, fields: Dict, target: int, total_balls: int) -> np.ndarray:
+    """Win probability of every (wickets_in_hand, balls_remaining, runs_required) state, in batches"""
+    shape = (11, total_balls + 1, target + 1)
+    states = np.indices(shape).reshape(3, -1).T
+    probabilities = np.empty(len(states), dtype=np.float64)
+    for start in range(0, len(states), BUILD_CHUNK_ROWS):
+        rows = [
+            dict(fields, **CricketModelTrainer.chase_features(target, target - runs_required, 10 - wickets_in_hand,
+                                                              total_balls - balls_remaining, total_balls))
+            for wickets_in_hand, balls_remaining, runs_required in states[start:start + BUILD_CHUNK_ROWS].tolist()
+        ]
+        probabilities[start:start + len(rows)] = predictor._win_probabilities(rows)[0]
+    return probabilities.reshape(shape)
+
+
+class LookupSurfaces:
+    """Read side of a surfaces directory: direct lookups for in-grid queries"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path / MANIFEST) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported lookup surface format: {self.manifest.get('format_version')}")
+        self._surfaces = {}
+        for entry in self.manifest['fixtures']:
+            grid = np.load(self.path / entry['file'], mmap_mode='r', allow_pickle=False).view(np.ndarray)
+            self._surfaces.setdefault(fixture_key(entry, entry['target']), []).append((grid, entry['total_balls']))
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.manifest.get('model_version')
+
+    def lookup(self, row: Dict) -> Optional[float]:
+        """Win probability of a normalized input row from its fixture's grid, None if it isn't in one"""
+        target = _as_index(row.get('target_match'))
+        surfaces = self._surfaces.get(fixture_key(row, target), ()) if target is not None else ()
+        runs_required = _as_index(row.get('runs_required'), target)
+        wickets_in_hand = _as_index(row.get('wickets_in_hand'), 10)
+        if runs_required is not None and wickets_in_hand is not None:
+            # One surface per innings length; the run rates pick the one the row is in
+            for grid, total_balls in surfaces:
+                balls_remaining = _as_index(row.get('balls_remaining'), total_balls)
+                if balls_remaining is not None and self._rates_match(row, target, runs_required, balls_remaining,
+                                                                     wickets_in_hand, total_balls):
+                    self.hits += 1
+                    return float(grid[wickets_in_hand, balls_remaining, runs_required])
+        self.misses += 1
+        return None
+
+    @staticmethod
+    def _rates_match(row: Dict, target: int, runs_required: int, balls_remaining: int, wickets_in_hand: int,
+                     total_balls: int) -> bool:
+        """True if the row's run rates are the ones the grid cell was scored with"""
+        expected = CricketModelTrainer.chase_features(target, target - runs_required, 10 - wickets_in_hand,
+                                                      total_balls - balls_remaining, total_balls)
+        for name in ('current_run_rate', 'required_run_rate'):
+            value, grid_value = row.get(name), expected[name]
+            if grid_value is None:
+                if not _is_missing(value):
+                    return False
+            elif _is_missing(value) or abs(float(value) - grid_value) > RATE_TOLERANCE:
+                return False
+        return True
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "fixtures": len(self.manifest['fixtures']),
+            "model_version": self.model_version,
+            "dtype": self.manifest.get('dtype'),
+            "mb": round(sum(grid.nbytes for surfaces in self._surfaces.values() for grid, _ in surfaces) / 1e6, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None
+        }
+
+
+def load_surfaces(model_path: Union[str, Path], model_version: Optional[str]) -> Optional[LookupSurfaces]:
+    """Surfaces next to the model, if they were built from this version of it"""
+    path = surfaces_path(model_path)
+    if not (path / MANIFEST).exists():
+        return None
+    try:
+        surfaces = LookupSurfaces(path)
+    except Exception as e:
+        logger.warning(f"Could not load lookup surfaces {path}: {e}")
+        return None
+    stale = os.path.exists(model_path) and (path / MANIFEST).stat().st_mtime < os.path.getmtime(model_path)
+    if stale or surfaces.model_version != model_version:
+        logger.warning(f"Ignoring lookup surfaces {path}: built for model {surfaces.model_version}, "
+                       f"serving {model_version}")
+        return None
+    return surfaces
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _as_index(value, upper: Optional[int] = None) -> Optional[int]:
+    """value as a grid index if it is a whole number in [0, upper], else None"""
+    if _is_missing(value):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not number.is_integer() or number < 0 or (upper is not None and number > upper):
+        return None
+    return int(number)
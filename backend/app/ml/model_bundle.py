@@ -0,0 +1,117 @@
+"""
+Memory-mappable serving artifact: `cricket_model.bundle/`.
+
+A directory with one uncompressed .npy file per array of the CompiledForest
+(including its traversal layout) and of the precomputed TreeShapExplainer,
+plus manifest.json holding the model info (features, classifier settings,
+version) and the small metadata of both.
+
+Loading maps every array read-only instead of unpickling and rebuilding the
+model, so it takes milliseconds, and worker processes loading the same
+bundle share one page-cache copy of it instead of each holding their own.
+"""
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+
+import numpy as np
+
+from app.ml.compiled_forest import CompiledForest
+from app.ml.tree_shap import TreeShapExplainer
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+# Bump when the bundle layout changes so stale bundles are ignored
+BUNDLE_FORMAT_VERSION = 1
+
+
+class ModelBundle(NamedTuple):
+    forest: CompiledForest
+    explainer: Optional[TreeShapExplainer]
+    manifest: Dict
+
+    @property
+    def model_info(self) -> Dict:
+        return self.manifest['model_info']
+
+
+def save_bundle(path: Union[str, Path], forest: CompiledForest, explainer: Optional[TreeShapExplainer],
+                model_info: Dict) -> Path:
+    """Write a bundle directory, replacing any existing one only once it is complete"""
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    sections = {'forest': forest.to_arrays()}
+    if explainer is not None:
+        sections['explainer'] = explainer.to_arrays()
+
+    manifest = {'format_version': BUNDLE_FORMAT_VERSION, 'model_info': model_info}
+    for section, (arrays, meta) in sections.items():
+        files = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            files[name] = f"{section}.{name}.npy"
+            np.save(tmp / files[name], array, allow_pickle=False)
+        manifest[section] = {'meta': meta, 'arrays': files}
+
+    with open(tmp / MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+    # Processes still mapping the old files keep them until they let go
+    if path.exists():
+        old = path.with_name(f"{path.name}.old-{os.getpid()}")
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(tmp, path)
+    return path
+
+
+def load_bundle(path: Union[str, Path]) -> ModelBundle:
+    """Memory-map a bundle directory written by save_bundle"""
+    path = Path(path)
+    with open(path / MANIFEST) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model bundle format: {manifest.get('format_version')}")
+
+    def arrays(section: str) -> Dict[str, np.ndarray]:
+        return {name: _map(path / file) for name, file in manifest[section]['arrays'].items()}
+
+    forest = CompiledForest.from_arrays(arrays('forest'), manifest['forest']['meta'])
+    explainer = None
+    if 'explainer' in manifest:
+        explainer = TreeShapExplainer.from_arrays(forest, arrays('explainer'), manifest['explainer']['meta'])
+    return ModelBundle(forest, explainer, manifest)
+
+
+def bundle_path(model_path: Union[str, Path]) -> Path:
+    """Bundle directory that sits next to a cricket_model.pkl"""
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}.bundle")
+
+
+def is_current(path: Union[str, Path], model_path: Union[str, Path]) -> bool:
+    """True if the bundle exists and is at least as new as the pickled model (or there is none)"""
+    manifest = Path(path) / MANIFEST
+    if not manifest.exists():
+        return False
+    return not os.path.exists(model_path) or manifest.stat().st_mtime >= os.path.getmtime(model_path)
+
+
+def _map(file: Path) -> np.ndarray:
+    """Read-only memory map as a plain ndarray (np.memmap adds per-operation overhead)"""
+    try:
+        return np.load(file, mmap_mode='r', allow_pickle=False).view(np.ndarray)
+    except ValueError:
+        # Empty arrays can't be mapped
+        return np.load(file, allow_pickle=False)
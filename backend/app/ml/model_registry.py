@@ -0,0 +1,81 @@
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "cricket_model.pkl"
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+FORMATS_DIR = "formats"
+
+
+class ModelRegistry:
+    """
+    Directory of versioned model artifacts with a pointer to the one to serve.
+
+    Every CricketModelTrainer.save_model call archives a version under
+    `<root>/versions/vNNNN/` and writes its name to `<root>/CURRENT`. Pointing
+    CURRENT at another version (set_current) promotes or rolls back without
+    touching the artifacts. Without a CURRENT file, the model at
+    `<root>/cricket_model.pkl` is served as before.
+
+    Models trained for a single match_type live in `<root>/formats/<match_type>/`,
+    each a registry of its own (format_registry).
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def versions(self) -> List[str]:
+        """Archived versions that contain a model, oldest first"""
+        versions_dir = self.root / VERSIONS_DIR
+        if not versions_dir.is_dir():
+            return []
+        return sorted(p.name for p in versions_dir.iterdir() if (p / MODEL_FILE).exists())
+
+    def current(self) -> Optional[str]:
+        """Version named by the CURRENT pointer, or None if there is none"""
+        try:
+            version = (self.root / CURRENT_FILE).read_text().strip()
+        except OSError:
+            return None
+        return version or None
+
+    def model_path(self, version: Optional[str] = None) -> Path:
+        """Model file of a version, by default the current one (or the unversioned model)"""
+        version = version or self.current()
+        if version is None:
+            return self.root / MODEL_FILE
+        _check_name(version, "model version")
+        return self.root / VERSIONS_DIR / version / MODEL_FILE
+
+    def set_current(self, version: str):
+        """Atomically point CURRENT at an archived version"""
+        if not self.model_path(version).exists():
+            raise ValueError(f"Unknown model version '{version}', available: {', '.join(self.versions()) or 'none'}")
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f"{CURRENT_FILE}.tmp-{os.getpid()}"
+        tmp.write_text(version + "\n")
+        os.replace(tmp, self.root / CURRENT_FILE)
+        logger.info(f"Current model version set to {version}")
+
+    def formats(self) -> List[str]:
+        """Match types that have a model of their own"""
+        formats_dir = self.root / FORMATS_DIR
+        if not formats_dir.is_dir():
+            return []
+        return sorted(p.name for p in formats_dir.iterdir()
+                      if p.is_dir() and ModelRegistry(p).model_path().exists())
+
+    def format_registry(self, match_type: str) -> "ModelRegistry":
+        """Registry of the models trained on one match_type"""
+        _check_name(match_type, "match type")
+        return ModelRegistry(self.root / FORMATS_DIR / match_type)
+
+
+def _check_name(name: str, kind: str):
+    """Reject names that would escape the registry directory"""
+    if not name or Path(name).name != name or name in (".", ".."):
+        raise ValueError(f"Invalid {kind} '{name}'")
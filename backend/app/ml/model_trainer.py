@@ -1,8 +1,14 @@
+import numpy as np
 import pandas as pd
 import joblib
+import json
 import os
+import shutil
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from sklearn.model_selection import train_test_split
+from typing import Dict, List, Optional
+from sklearn.model_selection import StratifiedGroupKFold, train_test_split
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
@@ -10,6 +16,12 @@ from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
 
+from app.ml.compiled_forest import CompiledForest
+from app.ml.feature_store import FeatureStore
+from app.ml.tree_shap import build_explainer
+from app.ml.model_registry import ModelRegistry
+from app.ml import compression, feature_store, incremental, model_bundle, tuning
+
 class CricketModelTrainer:
     """
     Train and save the cricket match prediction model
@@ -20,10 +32,53 @@ class CricketModelTrainer:
         self.numerical_features = ['runs_required', 'balls_remaining', 'wickets_in_hand', 
                                    'target_match', 'current_run_rate', 'required_run_rate']
         self.target = 'win'
+        # Row attribute that per-format models are trained on subsets of
+        self.format_column = 'match_type'
+        # Row attribute naming the match a row comes from; cross-validation folds keep matches whole
+        self.group_column = 'match_id'
+        self.match_type = None
         self.model = None
         self.preprocessor = None
+        # Default classifier settings, replaced by the best candidate after tune()
+        self.classifier_params = {
+            'n_estimators': 100,
+            'max_depth': 20,
+            'min_samples_split': 5,
+            'min_samples_leaf': 2
+        }
+        self.tuning_results = None
+        # Compression candidates compared by compress(), and the one serving if any
+        self.compression_report = None
+        self.compression = None
+        # Version this model was loaded from, and the incremental updates applied since its last full fit
+        self.model_version = None
+        self.update_history = []
         
-    def create_model_pipeline(self):
+    @staticmethod
+    def chase_features(target: int, runs: int, wickets: int, balls_bowled: int, total_balls: int) -> Dict:
+        """
+        Numerical model features for a second-innings chase state
+        
+        Args:
+            target: Runs the batting team needs to win
+            runs: Runs scored so far
+            wickets: Wickets fallen so far
+            balls_bowled: Legal balls bowled so far
+            total_balls: Legal balls in the innings
+        """
+        runs_required = max(target - runs, 0)
+        balls_remaining = max(total_balls - balls_bowled, 0)
+        return {
+            'runs_required': runs_required,
+            'balls_remaining': balls_remaining,
+            'wickets_in_hand': 10 - wickets,
+            'target_match': target,
+            'current_run_rate': runs * 6 / balls_bowled if balls_bowled else 0.0,
+            # Undefined once the innings is out of balls; the pipeline imputes it
+            'required_run_rate': runs_required * 6 / balls_remaining if balls_remaining else None
+        }
+    
+    def create_model_pipeline(self, n_jobs: Optional[int] = None):
         """Create the model pipeline with preprocessing"""
         # Numerical transformer
         numerical_transformer = Pipeline(steps=[
@@ -49,76 +104,381 @@ class CricketModelTrainer:
             ('preprocessor', self.preprocessor),
             ('classifier', RandomForestClassifier(
                 random_state=42,
-                n_estimators=100,
-                max_depth=20,
-                min_samples_split=5,
-                min_samples_leaf=2
+                n_jobs=n_jobs,
+                **self.classifier_params
             ))
         ])
         
         return self.model
     
-    def train(self, data_path: str):
-        """Train the model on cricket data"""
+    def open_feature_store(self, data_path: str) -> FeatureStore:
+        """
+        Feature store for data_path: either a store directory, or a CSV that is
+        ingested into a `<name>.store` directory next to it (reused while the CSV
+        is unchanged)
+        """
+        path = Path(data_path)
+        if path.is_dir():
+            return FeatureStore(path)
+        return feature_store.open_or_ingest(path, path.with_name(f"{path.stem}.store"), self.categorical_features,
+                                            self.numerical_features, self.target,
+                                            partition_columns=[self.format_column, self.group_column])
+    
+    def format_counts(self, data_path: str) -> Dict[str, int]:
+        """Training rows per match_type (empty if the data has no match_type column)"""
+        store = self.open_feature_store(data_path)
+        if self.format_column not in store.partition_columns:
+            return {}
+        return store.value_counts(self.format_column)
+    
+    def _load_split(self, data_path: str, match_type: Optional[str] = None, with_groups: bool = False):
+        """
+        Split the feature store into train and held-out test sets, materializing only the model's columns
+        
+        Rows of one match are highly correlated, so when the store has a
+        group_column the 20% held-out set is made of whole matches; only data
+        without it is split by row. with_groups also returns the group_column codes of the training rows, or
+        None when the data has no such column.
+        """
+        store = self.open_feature_store(data_path)
+        print(f"Loaded feature store with {store.n_rows:,} rows from: {store.path}")
+        
+        rows = np.arange(store.n_rows)
+        if match_type is not None:
+            if self.format_column not in store.partition_columns:
+                raise ValueError(f"{data_path} has no '{self.format_column}' column to select {match_type} rows")
+            rows = store.rows_where(self.format_column, match_type)
+            print(f"Selected {len(rows):,} {match_type} rows")
+        
+        # Split row indices on the memory-mapped target, then read just those rows
+        labels = store.column(self.target)[rows]
+        has_groups = self.group_column in store.partition_columns
+        if has_groups and len(np.unique(store.column(self.group_column)[rows])) >= 5:
+            # One fold of five: about 20% of the matches, stratified on the outcome
+            folds = StratifiedGroupKFold(n_splits=5, shuffle=True, random_state=42)
+            train_pos, test_pos = next(folds.split(rows, labels, store.column(self.group_column)[rows]))
+            train_idx, test_idx = rows[train_pos], rows[test_pos]
+            print(f"Held out {len(test_idx):,} rows of whole matches (split by '{self.group_column}')")
+        else:
+            print(f"Held out 20% of rows at random (no '{self.group_column}' column to split matches on); "
+                  f"held-out accuracy is optimistic")
+            train_idx, test_idx = train_test_split(rows, test_size=0.2, random_state=42, stratify=labels)
+        columns = self.categorical_features + self.numerical_features
+        split = (store.frame(columns, train_idx), store.frame(columns, test_idx),
+                 store.labels(train_idx), store.labels(test_idx))
+        if not with_groups:
+            return split
+        groups = store.column(self.group_column)[train_idx] if has_groups else None
+        return split + (groups,)
+    
+    def train(self, data_path: str, n_jobs: Optional[int] = None, match_type: Optional[str] = None):
+        """Train the model on cricket data, or only on the rows of one match_type"""
         try:
-            # Load data
-            df = pd.read_csv(data_path)
-            print(f"Loaded data with shape: {df.shape}")
-            
-            # Create model pipeline
-            self.create_model_pipeline()
-            
-            # Split features and target
-            X = df[self.categorical_features + self.numerical_features]
-            y = df[self.target]
-            
-            # Train-test split
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=0.2, random_state=42, stratify=y
-            )
+            X_train, X_test, y_train, y_test = self._load_split(data_path, match_type)
+            self.match_type = match_type
+            return self._fit_and_evaluate(X_train, X_test, y_train, y_test, n_jobs)
             
-            # Train model
-            print("Training model...")
-            self.model.fit(X_train, y_train)
-            print("Model training complete.")
+        except Exception as e:
+            print(f"Error during training: {e}")
+            raise
+    
+    def train_per_format(self, data_path: str, model_dir: str = "models", min_rows: int = 5000,
+                         n_jobs: Optional[int] = None) -> Dict[str, float]:
+        """
+        Train and save one model per match_type with at least min_rows rows
+        
+        Each model is saved to the format's own registry under
+        model_dir/formats/<match_type>/ with this trainer's classifier settings.
+        Returns the held-out accuracy per trained format.
+        """
+        counts = self.format_counts(data_path)
+        if not counts:
+            raise ValueError(f"{data_path} has no '{self.format_column}' column to train per-format models on")
+        
+        store = self.open_feature_store(data_path)
+        registry = ModelRegistry(model_dir)
+        accuracies = {}
+        for match_type, n_rows in sorted(counts.items(), key=lambda item: -item[1]):
+            if n_rows < min_rows:
+                print(f"Skipping {match_type}: {n_rows:,} rows (fewer than {min_rows:,})")
+                continue
+            if len(np.unique(store.column(self.target)[store.rows_where(self.format_column, match_type)])) < 2:
+                print(f"Skipping {match_type}: its rows are all wins or all losses")
+                continue
+            print(f"\n--- {match_type} ({n_rows:,} rows) ---")
+            trainer = CricketModelTrainer()
+            trainer.classifier_params = dict(self.classifier_params)
+            _, accuracies[match_type] = trainer.train(data_path, n_jobs, match_type=match_type)
+            trainer.save_model(str(registry.format_registry(match_type).root))
+        return accuracies
+    
+    def tune(self, data_path: str, param_grid: Optional[Dict[str, List]] = None, n_folds: int = 5,
+             n_workers: Optional[int] = None):
+        """
+        Pick classifier hyperparameters by k-fold cross-validation, then train the final model
+        
+        Candidates from param_grid (tuning.DEFAULT_PARAM_GRID by default) are fitted
+        on every fold in a process pool, on preprocessed folds cached once. The best
+        candidate is refitted on the whole training split using every core and
+        evaluated on the held-out test split. With a group_column, both the folds
+        and the held-out split keep the rows of a match together.
+        """
+        try:
+            started = time.perf_counter()
+            X_train, X_test, y_train, y_test, groups = self._load_split(data_path, with_groups=True)
+            if groups is None:
+                print(f"No '{self.group_column}' column: folds split rows, not matches, so rows of one match "
+                      f"can be in training and validation folds and CV accuracy is optimistic")
             
-            # Evaluate
-            y_pred = self.model.predict(X_test)
-            accuracy = accuracy_score(y_test, y_pred)
+            results = tuning.search(self.create_model_pipeline().named_steps['preprocessor'],
+                                    X_train, y_train, param_grid, n_folds, n_workers, groups=groups)
+            print(f"\nCross-validation results ({n_folds} folds, {time.perf_counter() - started:.1f}s wall time):")
+            print(tuning.format_results(results))
             
-            print(f"\nAccuracy: {accuracy:.4f}")
-            print("\nClassification Report:")
-            print(classification_report(y_test, y_pred))
+            best = {k: v for k, v in tuning.BASE_PARAMS.items() if k != 'random_state'}
+            best.update(results[0]['params'])
+            self.classifier_params = best
+            print(f"\nBest parameters: {self.classifier_params}")
             
-            return self.model, accuracy
+            model, accuracy = self._fit_and_evaluate(X_train, X_test, y_train, y_test, n_jobs=n_workers or -1)
+            self.tuning_results = {
+                'n_folds': n_folds,
+                'folds_grouped_by': self.group_column if groups is not None else None,
+                'wall_seconds': round(time.perf_counter() - started, 3),
+                'test_accuracy': accuracy,
+                'best_params': self.classifier_params,
+                'candidates': results
+            }
+            return model, accuracy
             
         except Exception as e:
-            print(f"Error during training: {e}")
+            print(f"Error during tuning: {e}")
             raise
     
+    def compress(self, data_path: str, candidates: Optional[List[str]] = None,
+                 serve: Optional[str] = None) -> List[Dict]:
+        """
+        Compare smaller versions of the trained model on its held-out split
+        
+        Candidates are compression specs (compression.DEFAULT_CANDIDATES by
+        default): pruned or depth-limited copies of the forest, or smaller models
+        distilled from it. The report lists accuracy, log-loss, artifact size and
+        single-row p50/p99 latency of each next to the full model. With serve,
+        that candidate replaces the model, so it is what save_model writes.
+        """
+        if self.model is None:
+            raise ValueError("No model to compress. Train or load a model first.")
+        candidates = list(candidates or compression.DEFAULT_CANDIDATES)
+        if serve is not None and serve not in candidates:
+            candidates.append(serve)
+        
+        X_train, X_test, _, y_test = self._load_split(data_path, self.match_type)
+        print(f"Comparing {len(candidates)} compressed candidates with the full model...")
+        report, models = compression.compare(self.model, X_train, X_test, y_test, self.numerical_features,
+                                             self.categorical_features, candidates)
+        print(compression.format_report(report))
+        self.compression_report = report
+        
+        if serve is not None:
+            self.model = models[serve]
+            self.preprocessor = self.model.named_steps['preprocessor']
+            classifier = self.model.named_steps['classifier']
+            if isinstance(classifier, RandomForestClassifier):
+                self.classifier_params.update(n_estimators=len(classifier.estimators_),
+                                              max_depth=classifier.max_depth)
+            self.compression = next(row for row in report if row['candidate'] == serve)
+            print(f"\nServing the {serve} model")
+        return report
+    
+    def _fit_and_evaluate(self, X_train, X_test, y_train, y_test, n_jobs: Optional[int] = None):
+        """Fit a fresh pipeline and report held-out accuracy"""
+        # Create model pipeline; a full fit starts a fresh update history
+        self.create_model_pipeline(n_jobs=n_jobs)
+        self.update_history = []
+        self.compression = None
+        
+        # Train model
+        print("Training model...")
+        self.model.fit(X_train, y_train)
+        print("Model training complete.")
+        
+        # Evaluate
+        y_pred = self.model.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred)
+        
+        print(f"\nAccuracy: {accuracy:.4f}")
+        print("\nClassification Report:")
+        print(classification_report(y_test, y_pred))
+        
+        # Single-row serving is faster without a thread pool per predict call
+        self.model.named_steps['classifier'].set_params(n_jobs=None)
+        
+        return self.model, accuracy
+    
+    def load(self, model_dir: str = "models"):
+        """Load a saved model and its info, e.g. to update it incrementally"""
+        self.model = joblib.load(os.path.join(model_dir, "cricket_model.pkl"))
+        self.preprocessor = self.model.named_steps['preprocessor']
+        info = joblib.load(os.path.join(model_dir, "model_info.pkl"))
+        self.categorical_features = info['categorical_features']
+        self.numerical_features = info['numerical_features']
+        self.target = info['target']
+        self.match_type = info.get('match_type')
+        self.classifier_params = dict(info.get('classifier_params', self.classifier_params))
+        self.model_version = info.get('model_version')
+        self.update_history = list(info.get('updates', []))
+        self.compression = info.get('compression')
+        print(f"Loaded model version {self.model_version or 'unversioned'} from: {model_dir}")
+        return self.model
+    
+    def update(self, new_data_path: str, n_trees: int = 25, retire_oldest: int = 0,
+               reference_data_path: Optional[str] = None, tolerance: float = 0.01) -> Dict:
+        """
+        Update the loaded model with newly arrived data instead of retraining it
+        
+        Teams and venues not seen before are added to the one-hot vocabulary,
+        n_trees trees are fitted on the first 80% of the new rows with the existing
+        preprocessing, and the retire_oldest oldest trees are dropped. Accuracy
+        is measured on the last 20%. With reference_data_path (the data the
+        model was trained on), a full retrain on it plus the new data is timed
+        and scored on the same rows, and the accuracy gap checked against tolerance.
+        """
+        if self.model is None:
+            raise ValueError("No model to update. Load or train a model first.")
+        if not isinstance(self.model.named_steps['classifier'], RandomForestClassifier):
+            raise ValueError("Incremental updates need a random forest model; retrain instead.")
+        
+        started = time.perf_counter()
+        # Hold out the latest rows rather than a random sample: rows of one match are
+        # highly correlated, so this scores the model on matches it hasn't seen
+        store = self.open_feature_store(new_data_path)
+        print(f"Loaded feature store with {store.n_rows:,} new rows from: {store.path}")
+        columns = self.categorical_features + self.numerical_features
+        rows = np.arange(store.n_rows)
+        train_idx, test_idx = rows[:int(store.n_rows * 0.8)], rows[int(store.n_rows * 0.8):]
+        X_train, X_test = store.frame(columns, train_idx), store.frame(columns, test_idx)
+        y_train, y_test = store.labels(train_idx), store.labels(test_idx)
+        added = incremental.extend_categories(self.model, X_train, self.numerical_features,
+                                              self.categorical_features)
+        for feature, categories in added.items():
+            print(f"New {feature} values: {', '.join(map(str, categories))}")
+        
+        print(f"Fitting {n_trees} new trees" + (f", retiring the {retire_oldest} oldest" if retire_oldest else ""))
+        trees = incremental.add_trees(self.model, X_train, y_train, n_trees, retire_oldest)
+        self.classifier_params['n_estimators'] = trees['n_trees']
+        accuracy = accuracy_score(y_test, self.model.predict(X_test))
+        report = {
+            'updated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'new_rows': len(X_train) + len(X_test),
+            **trees,
+            'added_categories': added,
+            'update_seconds': round(time.perf_counter() - started, 3),
+            'accuracy': accuracy
+        }
+        print(f"Incremental update: accuracy {accuracy:.4f} in {report['update_seconds']:.1f}s")
+        
+        if reference_data_path:
+            # Same classifier settings and tree count, fitted from scratch on old + new training rows
+            reference_store = self.open_feature_store(reference_data_path)
+            reference = CricketModelTrainer()
+            reference.classifier_params = dict(self.classifier_params)
+            X_full = pd.concat([reference_store.frame(columns), X_train], ignore_index=True)
+            y_full = pd.concat([reference_store.labels(), y_train], ignore_index=True)
+            
+            started = time.perf_counter()
+            reference.create_model_pipeline(n_jobs=-1).fit(X_full, y_full)
+            reference_accuracy = accuracy_score(y_test, reference.model.predict(X_test))
+            report.update({
+                'full_retrain_seconds': round(time.perf_counter() - started, 3),
+                'full_retrain_accuracy': reference_accuracy,
+                'accuracy_gap': reference_accuracy - accuracy,
+                'tolerance': tolerance,
+                'within_tolerance': reference_accuracy - accuracy <= tolerance
+            })
+            print(f"Full retrain:       accuracy {reference_accuracy:.4f} in {report['full_retrain_seconds']:.1f}s")
+            if not report['within_tolerance']:
+                print(f"Warning: incremental model is {report['accuracy_gap']:.4f} less accurate than a full "
+                      f"retrain (tolerance {tolerance}); consider running a full retrain")
+        
+        self.update_history.append(report)
+        return report
+    
     def save_model(self, model_dir: str = "models"):
-        """Save the trained model"""
+        """
+        Save the trained model
+        
+        Every save gets the next version number, is kept under
+        model_dir/versions/vNNNN/ and becomes the registry's current version,
+        which a running API can hot-swap in. The same files are also copied
+        to model_dir for tools that load the unversioned model.
+        """
         if self.model is None:
             raise ValueError("No model to save. Train the model first.")
         
         # Create models directory if it doesn't exist
         Path(model_dir).mkdir(parents=True, exist_ok=True)
+        version = self._next_version(model_dir)
+        version_dir = Path(model_dir) / "versions" / f"v{version:04d}"
+        version_dir.mkdir(parents=True)
         
-        model_path = os.path.join(model_dir, "cricket_model.pkl")
+        model_path = os.path.join(version_dir, "cricket_model.pkl")
         joblib.dump(self.model, model_path)
-        print(f"Model saved to: {model_path}")
         
         # Save feature names for reference
         info = {
             'categorical_features': self.categorical_features,
             'numerical_features': self.numerical_features,
-            'target': self.target
+            'target': self.target,
+            'match_type': self.match_type,
+            'classifier_params': self.classifier_params,
+            'model_version': version,
+            'parent_version': self.model_version,
+            'saved_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'updates': self.update_history,
+            'compression': self.compression
         }
-        info_path = os.path.join(model_dir, "model_info.pkl")
-        joblib.dump(info, info_path)
-        print(f"Model info saved to: {info_path}")
+        joblib.dump(info, os.path.join(version_dir, "model_info.pkl"))
+        
+        if self.tuning_results is not None:
+            with open(os.path.join(version_dir, "tuning_results.json"), "w") as f:
+                json.dump(self.tuning_results, f, indent=2, default=str)
+        if self.compression_report is not None:
+            with open(os.path.join(version_dir, "compression_report.json"), "w") as f:
+                json.dump(self.compression_report, f, indent=2, default=str)
         
-        return model_path
+        # Export the array-backed forest used by INFERENCE_BACKEND=compiled
+        try:
+            compiled = CompiledForest.from_pipeline(self.model, self.numerical_features, self.categorical_features)
+            compiled.save(os.path.join(version_dir, "cricket_model.compiled.npz"))
+        except Exception as e:
+            compiled = None
+            print(f"Warning: could not export compiled model: {e}")
+        
+        # Copy in write order, keeping mtimes, so the compiled forest stays newer than the pickle
+        for name in ["cricket_model.pkl", "model_info.pkl", "tuning_results.json", "compression_report.json",
+                     "cricket_model.compiled.npz"]:
+            if (version_dir / name).exists():
+                shutil.copy2(version_dir / name, os.path.join(model_dir, name))
+                print(f"Saved {name} to: {os.path.join(model_dir, name)}")
+        
+        # Memory-mappable serving bundle: the compiled forest, the precomputed explainer and the model info
+        if compiled is not None:
+            explainer = build_explainer(compiled)
+            for directory in (version_dir, Path(model_dir)):
+                path = model_bundle.save_bundle(directory / "cricket_model.bundle", compiled, explainer, info)
+            print(f"Saved cricket_model.bundle to: {path}")
+        self.model_version = version
+        ModelRegistry(model_dir).set_current(version_dir.name)
+        print(f"Model version {version} archived in: {version_dir} (now current)")
+        
+        return os.path.join(model_dir, "cricket_model.pkl")
+    
+    @staticmethod
+    def _next_version(model_dir: str) -> int:
+        versions_dir = Path(model_dir) / "versions"
+        existing = [int(p.name[1:]) for p in versions_dir.glob("v*") if p.name[1:].isdigit()] \
+            if versions_dir.exists() else []
+        return max(existing, default=0) + 1
 
 if __name__ == "__main__":
     # Train and save model
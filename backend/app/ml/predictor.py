@@ -3,13 +3,20 @@ import pandas as pd
 import numpy as np
 import os
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 import logging
+from app.ml.row_encoder import RowEncoder
+from app.ml.compiled_forest import CompiledForest
+from app.ml import lookup_surface, model_bundle
+from app.ml.model_registry import ModelRegistry
+from app.ml.tree_shap import TreeShapExplainer, build_explainer
+from app.ml.prediction_cache import PredictionCache
+from app import config, metrics
 
 # Logger
 logger = logging.getLogger(__name__)
 
-# SHAP is optional - use feature importance if not available
+# The shap package is optional - the built-in TreeShapExplainer is used without it
 try:
     import shap
     SHAP_AVAILABLE = True
@@ -17,124 +24,344 @@ except ImportError:
     SHAP_AVAILABLE = False
     logger.debug("SHAP not available. Using feature importance instead.")
 
+# Stand-in for NaN inside cache keys
+_NAN_KEY = ('nan',)
+
 class CricketPredictor:
     """
     Load trained model and make predictions with SHAP explanations
     """
     
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, cache_size: int = None, cache_ttl: float = None,
+                 backend: str = None):
         self.model = None
         self.model_info = None
         self.explainer = None
+        self.row_encoder = None
+        # "sklearn" runs the pickled pipeline, "compiled" the array-backed CompiledForest
+        self.backend = (backend or config.INFERENCE_BACKEND).lower()
+        self.compiled = None
+        # Precomputed win probabilities for the chase states of configured fixtures
+        self.surfaces = None
+        # Results for recently seen match states, keyed on the normalized input
+        self.cache = PredictionCache(
+            max_size=config.PREDICTION_CACHE_SIZE if cache_size is None else cache_size,
+            ttl_seconds=config.PREDICTION_CACHE_TTL if cache_ttl is None else cache_ttl
+        )
         
         if model_path is None:
-            # Default path
-            base_dir = Path(__file__).parent.parent.parent
-            model_path = base_dir / "models" / "cricket_model.pkl"
+            # Current version of the model registry (or its unversioned model)
+            model_path = default_registry().model_path()
         
         self.model_path = model_path
         self.load_model()
     
+    @property
+    def model_version(self) -> Optional[str]:
+        """Registry version of the loaded model, None for models saved before versioning"""
+        version = (self.model_info or {}).get('model_version')
+        return f"v{int(version):04d}" if version is not None else None
+    
+    @property
+    def match_type(self) -> Optional[str]:
+        """Match type the model was trained on, None for a model of every format"""
+        return (self.model_info or {}).get('match_type')
+    
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the loaded model: pipeline trees, compiled forest and explainer tables"""
+        arrays = []
+        forest = self.compiled if self.compiled is not None else getattr(self.explainer, 'forest', None)
+        if forest is not None:
+            arrays.extend(forest.to_arrays()[0].values())
+        if isinstance(self.explainer, TreeShapExplainer):
+            arrays.extend(self.explainer.to_arrays()[0].values())
+        total = sum(array.nbytes for array in arrays)
+        if self.model is not None:
+            for estimator in self.model.named_steps['classifier'].estimators_:
+                # sklearn's node struct is 64 bytes
+                total += estimator.tree_.node_count * 64 + estimator.tree_.value.nbytes
+        return total
+    
+    @property
+    def is_loaded(self) -> bool:
+        """True when a trained model serves predictions (the pipeline, or the bundle alone)"""
+        return self.model is not None or self.compiled is not None
+    
     def load_model(self):
         """Load the trained model"""
+        # Cached results belong to the previous model
+        if self.is_loaded:
+            self.cache.clear()
         try:
-            if os.path.exists(self.model_path):
+            bundle = self._load_bundle()
+            if bundle is not None and self.backend == "compiled" and config.SHAP_EXPLAINER != "shap":
+                # Everything served is memory-mapped from the bundle, the pipeline is never unpickled
+                self.model, self.row_encoder = None, None
+                self.model_info = bundle.model_info
+                self.compiled = bundle.forest
+                self._initialize_explainer(bundle.forest, bundle.explainer)
+            elif os.path.exists(self.model_path):
                 self.model = joblib.load(self.model_path)
                 logger.debug(f"Model loaded from: {self.model_path}")
                 
-                # Load model info
+                # Load model info, preferring the bundle manifest it is merged into
                 info_path = str(self.model_path).replace("cricket_model.pkl", "model_info.pkl")
-                if os.path.exists(info_path):
+                if bundle is not None:
+                    self.model_info = bundle.model_info
+                elif os.path.exists(info_path):
                     self.model_info = joblib.load(info_path)
                     logger.debug(f"Model info loaded from: {info_path}")
                 
+                # Preprocess dict rows directly instead of through a DataFrame
+                if self.model_info:
+                    self.row_encoder = RowEncoder.from_pipeline(
+                        self.model,
+                        self.model_info['numerical_features'],
+                        self.model_info['categorical_features']
+                    )
+                
+                # Array-backed forest, used for predictions with the compiled backend and for explanations
+                if bundle is not None:
+                    forest, explainer = bundle.forest, bundle.explainer
+                else:
+                    forest = self._load_compiled() if self.model_info else None
+                    explainer = None
+                self.compiled = forest if self.backend == "compiled" else None
+                
                 # Initialize SHAP explainer
-                self._initialize_explainer()
+                self._initialize_explainer(forest, explainer)
             else:
                 logger.warning(f"Model file not found: {self.model_path}")
                 logger.debug("Using mock predictions. Train the model first using model_trainer.py")
+            
+            self.surfaces = None
+            if self.is_loaded and config.LOOKUP_SURFACES:
+                self.surfaces = lookup_surface.load_surfaces(self.model_path, self.model_version)
         except Exception as e:
             logger.exception(f"Error loading model: {e}")
             logger.debug("Using mock predictions")
     
-    def _initialize_explainer(self):
-        """Initialize SHAP explainer for the model"""
-        if not SHAP_AVAILABLE:
-            logger.debug("SHAP not available. Will use feature importance instead.")
-            self.explainer = None
-            return
-            
+    def _load_bundle(self) -> Optional[model_bundle.ModelBundle]:
+        """Memory-map cricket_model.bundle when it is at least as new as the pickle"""
+        path = model_bundle.bundle_path(self.model_path)
         try:
-            # Get the classifier from the pipeline
-            classifier = self.model.named_steps['classifier']
-            # Create a SHAP explainer using the classifier
-            self.explainer = shap.TreeExplainer(classifier)
-            logger.debug("SHAP explainer initialized")
+            if model_bundle.is_current(path, self.model_path):
+                bundle = model_bundle.load_bundle(path)
+                logger.debug(f"Model bundle mapped from: {path}")
+                return bundle
         except Exception as e:
-            logger.warning(f"Could not initialize SHAP explainer: {e}")
-            self.explainer = None
+            logger.warning(f"Could not load model bundle {path}: {e}")
+        return None
+    
+    def _load_compiled(self) -> Optional[CompiledForest]:
+        """Load the exported CompiledForest, or compile it from the pipeline when missing or stale"""
+        compiled_path = str(self.model_path).replace(".pkl", ".compiled.npz")
+        try:
+            if os.path.exists(compiled_path) and os.path.getmtime(compiled_path) >= os.path.getmtime(self.model_path):
+                forest = CompiledForest.load(compiled_path)
+                logger.debug(f"Compiled model loaded from: {compiled_path}")
+                return forest
+        except Exception as e:
+            logger.warning(f"Could not load compiled model {compiled_path}: {e}")
+        
+        try:
+            forest = CompiledForest.from_pipeline(
+                self.model,
+                self.model_info['numerical_features'],
+                self.model_info['categorical_features']
+            )
+            logger.debug("Compiled model built from the pipeline")
+            return forest
+        except Exception as e:
+            logger.warning(f"Could not compile model, using the sklearn backend: {e}")
+            return None
+    
+    def _initialize_explainer(self, forest: Optional[CompiledForest] = None,
+                              prebuilt: Optional[TreeShapExplainer] = None):
+        """Initialize SHAP explainer for the model (prebuilt: the bundle's precomputed one)"""
+        self.explainer = None
+        if config.SHAP_EXPLAINER == "shap":
+            if SHAP_AVAILABLE:
+                try:
+                    # Get the classifier from the pipeline
+                    classifier = self.model.named_steps['classifier']
+                    # Create a SHAP explainer using the classifier
+                    self.explainer = shap.TreeExplainer(classifier)
+                    logger.debug("SHAP explainer initialized")
+                    return
+                except Exception as e:
+                    logger.warning(f"Could not initialize SHAP explainer: {e}")
+            else:
+                logger.debug("SHAP not available. Using the built-in TreeSHAP explainer instead.")
+        
+        # Exact TreeSHAP with one-hot columns folded into their source features
+        self.explainer = prebuilt if prebuilt is not None else build_explainer(forest)
+        if self.explainer is not None:
+            logger.debug("Built-in TreeSHAP explainer initialized")
+        else:
+            logger.debug("No SHAP explainer available. Will use feature importance instead.")
     
-    def predict(self, input_data: Dict) -> Tuple[str, float, List[Dict]]:
+    def predict(self, input_data: Dict, explain: str = "full", use_cache: bool = True) -> Tuple[str, float, List[Dict]]:
         """
         Make prediction and generate SHAP explanations
         
         Args:
             input_data: Dictionary with cricket match features
+            explain: Explanation level, "none" skips the explainer, "top5" or "full"
+            use_cache: False neither reads nor fills the prediction cache (warm-up)
             
         Returns:
             Tuple of (winner, probability, shap_values)
         """
-        if self.model is None:
-            return self._mock_prediction(input_data)
+        if not self.is_loaded:
+            return self._mock_prediction(input_data, explain)
         
         try:
-            # Create DataFrame from input
-            df = self._prepare_input(input_data)
-            
-            # Get prediction probabilities
-            probabilities = self.model.predict_proba(df)[0]
-            prediction = self.model.predict(df)
-            
-            # Debug logging
-            logger.debug(f"probabilities array: {probabilities}")
-            logger.debug(f"prediction: {prediction}")
-            
-            # In the training data:
-            # Class 0 = batting team loses (bowling team wins)
-            # Class 1 = batting team wins
-            # probabilities[0] = probability of batting team losing
-            # probabilities[1] = probability of batting team winning
-            
-            batting_team_win_probability = probabilities[1]  # Class 1 = batting team wins
+            with metrics.stage("normalize"):
+                row = self._normalize_input(input_data)
+            cache_key = self._cache_key(row)
+            cached = self.cache.get(cache_key) if use_cache else None
+            if cached is not None and (explain == "none" or cached[1] is not None):
+                batting_team_win_probability, shap_values = cached
+                return (self._winner(input_data, batting_team_win_probability), batting_team_win_probability,
+                        _explanation_level(shap_values, explain))
+            
+            lookup = self.surfaces.lookup(row) if cached is None and self.surfaces is not None else None
+            if cached is not None:
+                # Probability already known, only the explanation is missing
+                batting_team_win_probability, X = cached[0], None
+            elif lookup is not None:
+                # In a precomputed grid: an array index instead of a forest traversal
+                batting_team_win_probability, X = lookup, None
+            else:
+                # Preprocess once and reuse the matrix for probabilities, class and SHAP
+                probabilities, X = self._win_probabilities([row])
+                
+                # In the training data:
+                # Class 0 = batting team loses (bowling team wins)
+                # Class 1 = batting team wins
+                
+                batting_team_win_probability = float(probabilities[0])  # Class 1 = batting team wins
             
-            # Handle both scalar and array predictions
-            predicted_class_idx = int(prediction[0]) if hasattr(prediction, '__len__') else int(prediction)
+            # Same decision as model.predict, without a second pass through the forest
+            predicted_class_idx = int(batting_team_win_probability > 0.5)
             
             logger.debug(f"predicted_class_idx: {predicted_class_idx}")
             logger.debug(f"batting_team_win_prob: {batting_team_win_probability}")
             
-            # Determine winner based on which probability is higher
-            if batting_team_win_probability > 0.5:
-                winner = input_data.get('batting_team')
-            else:
-                winner = input_data.get('bowling_team')
-            
-            logger.debug(f"winner: {winner}")
-            
-            # Generate SHAP explanations
-            shap_values = self._get_shap_explanation(df)
+            # Generate SHAP explanations unless the caller only wants the probability
+            shap_values = None
+            if explain != "none":
+                with metrics.stage("shap"):
+                    shap_values = self._get_shap_explanations(X, [row])[0]
+            if use_cache:
+                self.cache.put(cache_key, (batting_team_win_probability, shap_values))
             
             # Return batting team's win probability (always 0-1 scale)
-            return winner, float(batting_team_win_probability), shap_values
+            return (self._winner(input_data, batting_team_win_probability), batting_team_win_probability,
+                    _explanation_level(shap_values, explain))
             
         except Exception as e:
             logger.exception(f"Error during prediction: {e}")
-            return self._mock_prediction(input_data)
+            return self._mock_prediction(input_data, explain)
     
-    def _prepare_input(self, input_data: Dict) -> pd.DataFrame:
-        """Prepare input data for model prediction"""
-        # Map the API input to model features
-        data = {
+    def predict_batch(self, inputs: List[Dict], explain: Union[str, List[str]] = "full",
+                      use_cache: bool = True) -> List[Tuple[str, float, List[Dict]]]:
+        """
+        Make predictions for many matches with a single vectorized model call
+        
+        Args:
+            inputs: List of dictionaries with cricket match features
+            explain: Explanation level for every input, or a list with one level per input
+            use_cache: False neither reads nor fills the prediction cache (warm-up)
+            
+        Returns:
+            List of (winner, probability, shap_values) tuples, in input order
+        """
+        if not inputs:
+            return []
+        
+        levels = [explain] * len(inputs) if isinstance(explain, str) else list(explain)
+        if not self.is_loaded:
+            return [self._mock_prediction(input_data, level) for input_data, level in zip(inputs, levels)]
+        
+        try:
+            with metrics.stage("normalize"):
+                rows = [self._normalize_input(input_data) for input_data in inputs]
+            cache_keys = [self._cache_key(row) for row in rows]
+            outcomes = [self.cache.get(key) if use_cache else None for key in cache_keys]
+            
+            # Cache misses in a precomputed grid are looked up...
+            missing = [i for i, outcome in enumerate(outcomes) if outcome is None]
+            scored = missing
+            if missing and self.surfaces is not None:
+                scored = []
+                for i in missing:
+                    lookup = self.surfaces.lookup(rows[i])
+                    if lookup is None:
+                        scored.append(i)
+                    else:
+                        outcomes[i] = (lookup, None)
+            
+            # ...the rest get one preprocessing pass and one predict_proba
+            X = None
+            if scored:
+                probabilities, X = self._win_probabilities([rows[i] for i in scored])
+                for i, batting_team_win_probability in zip(scored, probabilities):
+                    outcomes[i] = (float(batting_team_win_probability), None)
+            
+            # ...and one SHAP call for the rows that want an explanation and don't have one yet
+            unexplained = [i for i, outcome in enumerate(outcomes) if levels[i] != "none" and outcome[1] is None]
+            if unexplained:
+                # Reuse the preprocessed matrix when it covers every row (the explainer builds it otherwise)
+                position = {i: n for n, i in enumerate(scored)}
+                if X is not None and all(i in position for i in unexplained):
+                    X = X[[position[i] for i in unexplained]]
+                else:
+                    X = None
+                with metrics.stage("shap"):
+                    shap_lists = self._get_shap_explanations(X, [rows[i] for i in unexplained])
+                for i, shap_values in zip(unexplained, shap_lists):
+                    outcomes[i] = (outcomes[i][0], shap_values)
+            
+            if use_cache:
+                for i in sorted(set(missing) | set(unexplained)):
+                    self.cache.put(cache_keys[i], outcomes[i])
+            
+            return [
+                (self._winner(input_data, batting_team_win_probability), batting_team_win_probability,
+                 _explanation_level(shap_values, level))
+                for input_data, level, (batting_team_win_probability, shap_values) in zip(inputs, levels, outcomes)
+            ]
+            
+        except Exception as e:
+            logger.exception(f"Error during batch prediction: {e}")
+            return [self._mock_prediction(input_data, level) for input_data, level in zip(inputs, levels)]
+    
+    def score(self, inputs: List[Dict]) -> np.ndarray:
+        """
+        Batting team win probability for every input and nothing else: no
+        explanations, cache or lookup surfaces, for scoring large scenario grids
+        """
+        if not self.is_loaded:
+            return np.full(len(inputs), 0.5)
+        if not inputs:
+            return np.empty(0)
+        return self._win_probabilities([self._normalize_input(input_data) for input_data in inputs])[0]
+    
+    def _winner(self, input_data: Dict, batting_team_win_probability: float) -> str:
+        """Determine winner based on which probability is higher"""
+        if batting_team_win_probability > 0.5:
+            return input_data.get('batting_team')
+        return input_data.get('bowling_team')
+    
+    def _cache_key(self, row: Dict) -> tuple:
+        """Hashable cache key for a normalized input row (NaN never equals itself, so map it)"""
+        return tuple(_NAN_KEY if isinstance(v, float) and v != v else v for v in row.values())
+    
+    def _normalize_input(self, input_data: Dict) -> Dict:
+        """Map the API input to model features"""
+        return {
             'batting_team': input_data.get('batting_team', input_data.get('team1')),
             'bowling_team': input_data.get('bowling_team', input_data.get('team2')),
             'venue': input_data.get('venue'),
@@ -147,18 +374,54 @@ class CricketPredictor:
             'current_run_rate': input_data.get('current_run_rate', 6.0),
             'required_run_rate': input_data.get('required_run_rate', 7.5)
         }
+    
+    def _prepare_input(self, input_data: Dict) -> pd.DataFrame:
+        """Prepare input data for model prediction"""
+        return pd.DataFrame([self._normalize_input(input_data)])
+    
+    def _transform(self, rows: List[Dict]) -> np.ndarray:
+        """Run normalized rows through the preprocessor into a dense feature matrix"""
+        if self.row_encoder is not None:
+            return self.row_encoder.transform(rows)
+        
+        X = self.model.named_steps['preprocessor'].transform(pd.DataFrame(rows))
+        return X.toarray() if hasattr(X, 'toarray') else X
+    
+    def _win_probabilities(self, rows: List[Dict]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Batting team win probability for every normalized row
         
-        return pd.DataFrame([data])
+        Returns:
+            Tuple of (probabilities, preprocessed matrix), the matrix is None when
+            the compiled backend skipped the sklearn preprocessing
+        """
+        if self.compiled is not None:
+            # Encoding is fused into the compiled traversal
+            with metrics.stage("forest"):
+                return self.compiled.predict_proba(rows), None
+        
+        with metrics.stage("preprocess"):
+            X = self._transform(rows)
+        classifier = self.model.named_steps['classifier']
+        positive = list(classifier.classes_).index(1)
+        with metrics.stage("forest"):
+            return classifier.predict_proba(X)[:, positive], X
     
-    def _get_shap_explanation(self, df: pd.DataFrame) -> List[Dict]:
-        """Generate SHAP explanations for the prediction"""
+    def _get_shap_explanations(self, X_transformed: Optional[np.ndarray], rows: List[Dict]) -> List[List[Dict]]:
+        """Generate SHAP explanations for every preprocessed row with one explainer call"""
         if self.explainer is None:
-            return self._get_feature_importance_explanation(df)
+            return [self._get_feature_importance_explanation(row) for row in rows]
         
         try:
-            # Transform the data using the preprocessor
-            preprocessor = self.model.named_steps['preprocessor']
-            X_transformed = preprocessor.transform(df)
+            if isinstance(self.explainer, TreeShapExplainer):
+                shap_values_raw = self.explainer.explain(rows)
+                return [
+                    self._format_shap_row(values, self._group_labels(row))
+                    for values, row in zip(shap_values_raw, rows)
+                ]
+            
+            if X_transformed is None:
+                X_transformed = self._transform(rows)
             
             # Get SHAP values
             shap_values_raw = self.explainer.shap_values(X_transformed)
@@ -166,30 +429,43 @@ class CricketPredictor:
             # For binary classification, take the values for class 1 (winning)
             if isinstance(shap_values_raw, list):
                 shap_values_raw = shap_values_raw[1]
+            elif getattr(shap_values_raw, 'ndim', 0) == 3:
+                # Newer SHAP releases return (rows, features, classes)
+                shap_values_raw = shap_values_raw[:, :, 1]
             
             # Get feature names
             feature_names = self._get_feature_names()
             
-            # Create list of top SHAP values
-            shap_list = []
-            for idx, value in enumerate(shap_values_raw[0]):
-                if abs(value) > 0.01:  # Only include significant features
-                    shap_list.append({
-                        'feature': feature_names[idx] if idx < len(feature_names) else f"feature_{idx}",
-                        'value': float(value),
-                        'impact': 'positive' if value > 0 else 'negative' if value < 0 else 'neutral'
-                    })
-            
-            # Sort by absolute value and take top 10
-            shap_list = sorted(shap_list, key=lambda x: abs(x['value']), reverse=True)[:10]
-            
-            return shap_list
+            return [self._format_shap_row(row, feature_names) for row in shap_values_raw]
             
         except Exception as e:
             logger.exception(f"Error generating SHAP values: {e}")
-            return self._get_feature_importance_explanation(df)
+            return [self._get_feature_importance_explanation(row) for row in rows]
+    
+    def _group_labels(self, row: Dict) -> List[str]:
+        """Display names for the built-in explainer's features, categoricals labelled with the row's value"""
+        labels = [self._clean_feature_name(name) for name in self.model_info['numerical_features']]
+        for feature in self.model_info['categorical_features']:
+            label = feature.replace('_', ' ').title()
+            value = row.get(feature)
+            labels.append(f"{label}: {value}" if isinstance(value, str) else label)
+        return labels
     
-    def _get_feature_importance_explanation(self, df: pd.DataFrame) -> List[Dict]:
+    def _format_shap_row(self, values, feature_names: List[str]) -> List[Dict]:
+        """Turn one row of SHAP values into the top significant features"""
+        shap_list = []
+        for idx, value in enumerate(values):
+            if abs(value) > 0.01:  # Only include significant features
+                shap_list.append({
+                    'feature': feature_names[idx] if idx < len(feature_names) else f"feature_{idx}",
+                    'value': float(value),
+                    'impact': 'positive' if value > 0 else 'negative' if value < 0 else 'neutral'
+                })
+        
+        # Sort by absolute value and take top 10
+        return sorted(shap_list, key=lambda x: abs(x['value']), reverse=True)[:10]
+    
+    def _get_feature_importance_explanation(self, input_data: Dict) -> List[Dict]:
         """
         Alternative explanation using feature importance from RandomForest
         combined with input values to create dynamic explanations.
@@ -198,9 +474,6 @@ class CricketPredictor:
         try:
             import random
             
-            # Get input data to create dynamic explanations
-            input_data = df.iloc[0]
-            
             # Extract actual input values
             runs_required = float(input_data.get('runs_required', 150))
             wickets_in_hand = float(input_data.get('wickets_in_hand', 10))
@@ -294,6 +567,22 @@ class CricketPredictor:
             logger.exception(f"Error getting feature names: {e}")
             return []
     
+    def known_categories(self) -> Dict[str, List[str]]:
+        """Categories seen during training for each categorical feature"""
+        if self.model is None and self.compiled is not None:
+            return {
+                feature: [str(c) for c in categories]
+                for feature, categories in zip(self.compiled.categorical_features, self.compiled.categories)
+            }
+        try:
+            onehot = self.model.named_steps['preprocessor'].named_transformers_['cat'].named_steps['onehot']
+            return {
+                feature: [str(c) for c in categories]
+                for feature, categories in zip(self.model_info['categorical_features'], onehot.categories_)
+            }
+        except Exception:
+            return {}
+    
     def _default_shap_values(self) -> List[Dict]:
         """Return default SHAP values when actual calculation fails"""
         return [
@@ -304,10 +593,25 @@ class CricketPredictor:
             {'feature': 'current_run_rate', 'value': 0.06, 'impact': 'positive'},
         ]
     
-    def _mock_prediction(self, input_data: Dict) -> Tuple[str, float, List[Dict]]:
+    def _mock_prediction(self, input_data: Dict, explain: str = "full") -> Tuple[str, float, List[Dict]]:
         """Mock prediction when model is not available"""
         import random
+        metrics.count("mock_prediction")
         probability = random.uniform(0.55, 0.85)
         winner = input_data.get('team1', input_data.get('batting_team', 'Team 1'))
         shap_values = self._default_shap_values()
-        return winner, probability, shap_values
+        return winner, probability, _explanation_level(shap_values, explain)
+
+
+def default_registry() -> ModelRegistry:
+    """Registry at MODEL_REGISTRY_DIR, by default backend/models"""
+    return ModelRegistry(config.MODEL_REGISTRY_DIR or Path(__file__).parent.parent.parent / "models")
+
+
+def _explanation_level(shap_values: Optional[List[Dict]], explain: str) -> List[Dict]:
+    """Trim a full explanation (sorted by absolute value) to the requested level"""
+    if explain == "none" or not shap_values:
+        return []
+    if explain == "top5":
+        return shap_values[:5]
+    return shap_values
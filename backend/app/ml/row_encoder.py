@@ -0,0 +1,120 @@
+import math
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class RowEncoder:
+    """
+    Apply the fitted preprocessor of a trained pipeline to plain dict rows.
+
+    Produces the same dense matrix as ColumnTransformer.transform on a
+    DataFrame of the rows (median imputation + StandardScaler for numerical
+    features, most-frequent imputation + one-hot for categoricals), without
+    building a pandas DataFrame first.
+    """
+
+    def __init__(self, numerical_features: List[str], categorical_features: List[str],
+                 num_fill: np.ndarray, num_mean: Optional[np.ndarray], num_scale: Optional[np.ndarray],
+                 cat_fill: List, categories: List[List]):
+        self.numerical_features = list(numerical_features)
+        self.categorical_features = list(categorical_features)
+        self.num_fill = np.asarray(num_fill, dtype=np.float64)
+        self.num_mean = num_mean
+        self.num_scale = num_scale
+        self.cat_fill = list(cat_fill)
+        self.categories = [list(c) for c in categories]
+
+        # Column of each category in the encoded matrix
+        self.n_numerical = len(self.numerical_features)
+        self.category_index = []
+        offset = self.n_numerical
+        for cats in self.categories:
+            self.category_index.append({c: offset + i for i, c in enumerate(cats)})
+            offset += len(cats)
+        self.n_features = offset
+
+    @classmethod
+    def from_pipeline(cls, model, numerical_features: List[str],
+                      categorical_features: List[str]) -> Optional["RowEncoder"]:
+        """
+        Build an encoder from a fitted CricketModelTrainer pipeline.
+
+        Returns None when the preprocessor doesn't have the expected
+        structure, so callers can fall back to the DataFrame path.
+        """
+        try:
+            preprocessor = model.named_steps['preprocessor']
+            transformers = [(name, cols) for name, _, cols in preprocessor.transformers_ if name != 'remainder']
+            if transformers != [('num', list(numerical_features)), ('cat', list(categorical_features))]:
+                return None
+
+            num = preprocessor.named_transformers_['num']
+            cat = preprocessor.named_transformers_['cat']
+            if [n for n, _ in num.steps] != ['imputer', 'scaler'] or [n for n, _ in cat.steps] != ['imputer', 'onehot']:
+                return None
+
+            num_imputer, scaler = num.named_steps['imputer'], num.named_steps['scaler']
+            cat_imputer, onehot = cat.named_steps['imputer'], cat.named_steps['onehot']
+            if (onehot.drop_idx_ is not None or onehot.handle_unknown != 'ignore'
+                    or getattr(onehot, '_infrequent_enabled', False)):
+                return None
+            if (getattr(num_imputer, 'add_indicator', False) or getattr(cat_imputer, 'add_indicator', False)
+                    or not _is_nan(num_imputer.missing_values) or not _is_nan(cat_imputer.missing_values)):
+                return None
+
+            return cls(
+                numerical_features,
+                categorical_features,
+                num_fill=num_imputer.statistics_,
+                num_mean=scaler.mean_ if scaler.with_mean else None,
+                num_scale=scaler.scale_ if scaler.with_std else None,
+                cat_fill=list(cat_imputer.statistics_),
+                categories=onehot.categories_
+            )
+        except Exception as e:
+            logger.warning(f"Could not build row encoder, using DataFrame preprocessing: {e}")
+            return None
+
+    def transform(self, rows: List[Dict]) -> np.ndarray:
+        """Encode normalized input rows into the model's feature matrix"""
+        X = np.zeros((len(rows), self.n_features), dtype=np.float64)
+
+        # Numerical block: impute missing values with the training medians, then scale
+        num = np.array(
+            [[_to_float(row.get(f)) for f in self.numerical_features] for row in rows],
+            dtype=np.float64
+        ).reshape(len(rows), self.n_numerical)
+        missing = np.isnan(num)
+        if missing.any():
+            num[missing] = np.broadcast_to(self.num_fill, num.shape)[missing]
+        if self.num_mean is not None:
+            num -= self.num_mean
+        if self.num_scale is not None:
+            num /= self.num_scale
+        X[:, :self.n_numerical] = num
+
+        # Categorical block: one column per known category, unknown values stay all-zero
+        for j, feature in enumerate(self.categorical_features):
+            index, fill = self.category_index[j], self.cat_fill[j]
+            for i, row in enumerate(rows):
+                value = row.get(feature)
+                if _is_nan(value):
+                    # None is left as-is, like the imputer does for object columns
+                    value = fill
+                column = index.get(value)
+                if column is not None:
+                    X[i, column] = 1.0
+
+        return X
+
+
+def _is_nan(value) -> bool:
+    return isinstance(value, float) and math.isnan(value)
+
+
+def _to_float(value) -> float:
+    return np.nan if value is None else float(value)
@@ -0,0 +1,233 @@
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from app.ml.compiled_forest import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on rows x leaves x groups held in memory at once
+_CHUNK_ELEMENTS = 1 << 21
+
+
+class TreeShapExplainer:
+    """
+    Exact path-dependent TreeSHAP for a CompiledForest, without the shap package.
+
+    Gives the same values as shap.TreeExplainer(classifier).shap_values for
+    class 1 (feature_perturbation="tree_path_dependent"). Features are
+    grouped into players: by default each one-hot column is folded back into
+    its source categorical feature, so there is one value per input feature.
+
+    Everything that depends only on the model is precomputed once: for every
+    leaf, its value and the product of cover ratios along its path per group.
+    For a row, the only thing left to find is which groups the row agrees
+    with on each leaf's path. The Shapley weighting over coalitions is then
+    the integral over t in [0, 1] of a polynomial of degree < number of
+    groups, which Gauss-Legendre quadrature evaluates exactly with batched
+    array operations.
+    """
+
+    def __init__(self, forest: CompiledForest, fold_categories: bool = True):
+        self.forest = forest
+        n_numerical = len(forest.numerical_features)
+        n_columns = forest.encoder.n_features
+        if fold_categories:
+            # Numerical columns are their own group, one-hot columns join their source feature
+            self.group_names = forest.numerical_features + forest.categorical_features
+            column_group = list(range(n_numerical))
+            for j, cats in enumerate(forest.categories):
+                column_group += [n_numerical + j] * len(cats)
+        else:
+            self.group_names = forest.numerical_features + [
+                f"{feature}_{c}" for feature, cats in zip(forest.categorical_features, forest.categories) for c in cats
+            ]
+            column_group = list(range(n_columns))
+        self.column_group = np.asarray(column_group, dtype=np.intp)
+        self.n_groups = len(self.group_names)
+
+        is_leaf = forest.children[:, 0] == np.arange(forest.n_nodes)
+        node_group = np.where(is_leaf, 0, self.column_group[forest.feature])
+
+        # Walk the trees level by level, recording each parent -> child edge
+        self._levels = []
+        z = np.ones((forest.n_nodes, self.n_groups))
+        frontier = forest.roots[~is_leaf[forest.roots]].astype(np.intp)
+        while len(frontier):
+            left, right = forest.children[frontier, 0], forest.children[frontier, 1]
+            group = node_group[frontier]
+            for child in (left, right):
+                # Chance of taking this branch when the split's feature is unknown
+                z[child] = z[frontier]
+                z[child, group] *= forest.cover[child] / np.maximum(forest.cover[frontier], 1e-300)
+            self._levels.append((frontier, left, right, group))
+            children = np.concatenate([left, right])
+            frontier = children[~is_leaf[children]]
+
+        leaves = np.flatnonzero(is_leaf)
+        leaf_value = forest.value[leaves] / forest.n_trees
+        leaf_z = z[leaves]
+        self.expected_value = float(np.sum(leaf_value * leaf_z.prod(axis=1)))
+        self._leaves = leaves
+
+        # Each node's group bit lives in word group // 64 of a per-node bitmask
+        self._n_words = (self.n_groups + 63) // 64
+        self._group_word = np.arange(self.n_groups) // 64
+        self._group_bit = (np.arange(self.n_groups) % 64).astype(np.uint64)
+
+        # Bucket leaves by how many distinct groups their path splits on, and keep
+        # only those groups: the others contribute nothing and leave the product as is.
+        # The integrand has degree < k for k groups, and an n-point Gauss-Legendre
+        # rule is exact up to degree 2n - 1.
+        on_path = leaf_z < 1.0
+        path_groups = on_path.sum(axis=1)
+        self._buckets = []
+        for k in np.unique(path_groups[path_groups > 0]):
+            members = np.flatnonzero(path_groups == k)
+            groups = np.nonzero(on_path[members])[1].reshape(len(members), k).T  # (k, n_leaves)
+            nodes, weights = np.polynomial.legendre.leggauss((int(k) + 1) // 2)
+            # Sums each (slot, leaf) contribution, scaled by the leaf value, into its group
+            scatter = sparse.csr_matrix(
+                (np.tile(leaf_value[members], k), (np.arange(groups.size), groups.ravel())),
+                shape=(groups.size, self.n_groups)
+            )
+            self._buckets.append(_LeafBucket(
+                leaf=members,
+                word=self._group_word[groups],
+                bit=self._group_bit[groups],
+                z=leaf_z[members[np.newaxis, :], groups],
+                scatter=scatter,
+                t=(nodes + 1) / 2,
+                w=weights / 2
+            ))
+        self._path_elements = int(path_groups.sum())
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """The precomputed state as flat arrays plus JSON-serializable metadata"""
+        arrays = {'column_group': self.column_group, 'leaves': self._leaves}
+        # Levels concatenated, with offsets marking where each one starts
+        for i, name in enumerate(('parent', 'left', 'right', 'group')):
+            arrays[f'level_{name}'] = np.concatenate([level[i] for level in self._levels]) \
+                if self._levels else np.zeros(0, dtype=np.intp)
+        arrays['level_offsets'] = np.cumsum([0] + [len(level[0]) for level in self._levels])
+        for b, bucket in enumerate(self._buckets):
+            for name in ('leaf', 'word', 'bit', 'z', 't', 'w'):
+                arrays[f'bucket{b}_{name}'] = getattr(bucket, name)
+            arrays[f'bucket{b}_scatter_data'] = bucket.scatter.data
+            arrays[f'bucket{b}_scatter_indices'] = bucket.scatter.indices
+            arrays[f'bucket{b}_scatter_indptr'] = bucket.scatter.indptr
+        meta = {
+            'group_names': self.group_names,
+            'expected_value': self.expected_value,
+            'n_buckets': len(self._buckets),
+            'path_elements': self._path_elements
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, forest: CompiledForest, arrays: Dict[str, np.ndarray], meta: Dict) -> "TreeShapExplainer":
+        """Rebuild from to_arrays() output without recomputing or copying it"""
+        explainer = cls.__new__(cls)
+        explainer.forest = forest
+        explainer.group_names = list(meta['group_names'])
+        explainer.column_group = arrays['column_group']
+        explainer.n_groups = len(explainer.group_names)
+        explainer.expected_value = float(meta['expected_value'])
+        explainer._leaves = arrays['leaves']
+        offsets = arrays['level_offsets']
+        explainer._levels = [
+            tuple(arrays[f'level_{name}'][start:end] for name in ('parent', 'left', 'right', 'group'))
+            for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+        explainer._n_words = (explainer.n_groups + 63) // 64
+        explainer._group_word = np.arange(explainer.n_groups) // 64
+        explainer._group_bit = (np.arange(explainer.n_groups) % 64).astype(np.uint64)
+        explainer._buckets = []
+        for b in range(meta['n_buckets']):
+            z = arrays[f'bucket{b}_z']
+            scatter = sparse.csr_matrix(
+                (arrays[f'bucket{b}_scatter_data'], arrays[f'bucket{b}_scatter_indices'],
+                 arrays[f'bucket{b}_scatter_indptr']),
+                shape=(z.size, explainer.n_groups), copy=False
+            )
+            explainer._buckets.append(_LeafBucket(
+                scatter=scatter,
+                **{name: arrays[f'bucket{b}_{name}'] for name in ('leaf', 'word', 'bit', 'z', 't', 'w')}
+            ))
+        explainer._path_elements = int(meta['path_elements'])
+        return explainer
+
+    def shap_values(self, Z: np.ndarray) -> np.ndarray:
+        """SHAP values of the class-1 probability for raw encoded rows, shape (n_rows, n_groups)"""
+        if Z.shape[0] == 0:
+            return np.zeros((0, self.n_groups))
+        chunk = max(1, _CHUNK_ELEMENTS // max(1, self._path_elements))
+        return np.concatenate([self._shap_chunk(Z[start:start + chunk]) for start in range(0, Z.shape[0], chunk)])
+
+    def explain(self, rows: List[dict]) -> np.ndarray:
+        """SHAP values for normalized input rows"""
+        return self.shap_values(self.forest.encode(rows))
+
+    def _failed_groups(self, Z: np.ndarray) -> np.ndarray:
+        """Bitmask per row and leaf of the groups whose splits the row disagrees with on the leaf's path"""
+        forest = self.forest
+        go_right = Z[:, forest.feature] > forest.threshold
+
+        failed = np.zeros((Z.shape[0], forest.n_nodes, self._n_words), dtype=np.uint64)
+        for parent, left, right, group in self._levels:
+            bit = np.zeros((len(parent), self._n_words), dtype=np.uint64)
+            bit[np.arange(len(parent)), self._group_word[group]] = np.uint64(1) << self._group_bit[group]
+            right_taken = go_right[:, parent, np.newaxis]
+            failed[:, left] = failed[:, parent] | np.where(right_taken, bit, np.uint64(0))
+            failed[:, right] = failed[:, parent] | np.where(right_taken, np.uint64(0), bit)
+        return failed[:, self._leaves]
+
+    def _shap_chunk(self, Z: np.ndarray) -> np.ndarray:
+        n_rows = Z.shape[0]
+        failed = self._failed_groups(Z)
+        phi = np.zeros((n_rows, self.n_groups))
+
+        for bucket in self._buckets:
+            # a[r, k, l] = o - z, with o = 1 when row r agrees with every split on that group
+            words = failed[:, bucket.leaf[np.newaxis, :], bucket.word]
+            agree = ((words >> bucket.bit) & np.uint64(1)) == 0
+            a = agree - bucket.z
+
+            # integral over t of prod_{j != i} (z_j + a_j t), for every group slot i
+            weight = np.zeros_like(a)
+            factor = np.empty_like(a)
+            for t, w in zip(bucket.t, bucket.w):
+                np.multiply(a, t, out=factor)
+                factor += bucket.z
+                product = factor.prod(axis=1, keepdims=True)
+                product *= w
+                np.divide(product, factor, out=factor)
+                weight += factor
+
+            a *= weight
+            phi += a.reshape(n_rows, -1) @ bucket.scatter
+
+        return phi
+
+
+class _LeafBucket(NamedTuple):
+    leaf: np.ndarray    # (n_leaves,) position in TreeShapExplainer._leaves
+    word: np.ndarray    # (k, n_leaves) bitmask word and bit of the groups split on along each leaf's path
+    bit: np.ndarray
+    z: np.ndarray       # (k, n_leaves) product of cover ratios for those groups
+    scatter: sparse.csr_matrix  # (k * n_leaves, n_groups) leaf value / n_trees at each slot's group
+    t: np.ndarray       # Gauss-Legendre nodes on [0, 1]
+    w: np.ndarray       # and their weights
+
+
+def build_explainer(forest: Optional[CompiledForest], fold_categories: bool = True) -> Optional[TreeShapExplainer]:
+    """TreeShapExplainer for a compiled forest, or None if it can't be built"""
+    if forest is None:
+        return None
+    try:
+        return TreeShapExplainer(forest, fold_categories=fold_categories)
+    except Exception as e:
+        logger.warning(f"Could not build TreeSHAP explainer: {e}")
+        return None
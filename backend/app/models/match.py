@@ -1,5 +1,19 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, List
+import math
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Optional, Dict, List, Literal, Union
+
+# How much of the SHAP explanation to compute and return
+ExplainLevel = Literal["none", "top5", "full"]
+
+# Legal balls per innings for limited-overs formats
+INNINGS_BALLS = {"T20": 120, "ODI": 300}
+
+# Model features a scenario grid can vary
+NumericalFeature = Literal["runs_required", "balls_remaining", "wickets_in_hand", "target_match",
+                           "current_run_rate", "required_run_rate"]
+
+# Largest scenario grid, bounding the response size and the memory used to score it
+MAX_GRID_CELLS = 250_000
 
 class MatchInput(BaseModel):
     team1: str = Field(..., description="First team name (batting team)")
@@ -17,6 +31,11 @@ class MatchInput(BaseModel):
     current_run_rate: Optional[float] = Field(None, description="Current run rate")
     required_run_rate: Optional[float] = Field(None, description="Required run rate")
     
+    explain: ExplainLevel = Field(
+        default="full",
+        description="SHAP explanation: none (probability only, explainer skipped), top5, or full"
+    )
+    
     class Config:
         json_schema_extra = {
             "example": {
@@ -40,6 +59,7 @@ class PredictionResponse(BaseModel):
     confidence: str  # high, medium, low
     shap_explanation: List[ShapValue]
     factors: Dict[str, str]
+    model_version: Optional[str] = None  # registry version that made the prediction
     
     class Config:
         json_schema_extra = {
@@ -57,3 +77,161 @@ class PredictionResponse(BaseModel):
                 }
             }
         }
+
+class ShapArrays(BaseModel):
+    """Explanation as parallel arrays: entry i of each list describes one feature"""
+    features: List[str]
+    values: List[float]
+    impacts: List[str]
+
+class CompactPredictionResponse(BaseModel):
+    winner: str
+    probability: float
+    confidence: str
+    shap_explanation: ShapArrays
+    factors: Dict[str, str]
+    model_version: Optional[str] = None
+
+class BatchPredictionRequest(BaseModel):
+    matches: List[MatchInput] = Field(..., min_length=1, max_length=1000,
+                                      description="Matches to score in one vectorized call")
+
+class BatchPredictionResponse(BaseModel):
+    count: int
+    predictions: List[Union[PredictionResponse, CompactPredictionResponse]]
+
+class ChaseStep(BaseModel):
+    runs: int = Field(0, ge=0, le=50, description="Runs scored, extras included")
+    wickets: int = Field(0, ge=0, le=10, description="Wickets that fell")
+    balls: int = Field(1, ge=0, le=6, description="Legal balls bowled: 1 per delivery, 6 for a whole over, 0 for a wide or no-ball")
+
+class ChaseCurveRequest(BaseModel):
+    team1: str = Field(..., description="Chasing (batting) team")
+    team2: str = Field(..., description="Bowling team")
+    venue: str = Field(..., description="Match venue")
+    toss_winner: Optional[str] = Field(None, description="Toss winner team")
+    toss_decision: Optional[str] = Field(None, description="Bat or Bowl")
+    match_type: str = Field(default="T20", description="Match type (ODI, T20)")
+    target: int = Field(..., ge=1, description="Runs needed to win")
+    total_balls: Optional[int] = Field(None, ge=1, description="Legal balls in the innings, defaults from match_type")
+    # A full ODI chase plus room for extras
+    steps: List[ChaseStep] = Field(..., min_length=1, max_length=360,
+                                   description="Chase so far, ball by ball or over by over")
+    explain: ExplainLevel = Field(default="none", description="SHAP explanation for every point")
+    
+    @model_validator(mode="after")
+    def check_innings(self):
+        if self.total_balls is None:
+            self.total_balls = INNINGS_BALLS.get(self.match_type.upper())
+            if self.total_balls is None:
+                raise ValueError(f"total_balls is required for match_type {self.match_type!r}")
+        if sum(step.balls for step in self.steps) > self.total_balls:
+            raise ValueError("steps contain more balls than the innings")
+        if sum(step.wickets for step in self.steps) > 10:
+            raise ValueError("steps contain more than 10 wickets")
+        return self
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "team1": "India",
+                "team2": "Australia",
+                "venue": "Melbourne Cricket Ground",
+                "match_type": "T20",
+                "target": 168,
+                "steps": [{"runs": 1}, {"runs": 4}, {"runs": 0, "wickets": 1}, {"runs": 1, "balls": 0}]
+            }
+        }
+
+class CurvePoint(BaseModel):
+    balls_bowled: int
+    over: str  # overs.balls, e.g. "12.3"
+    runs: int
+    wickets: int
+    runs_required: int
+    balls_remaining: int
+    probability: float  # batting (chasing) team's win probability
+    shap_explanation: List[ShapValue] = []
+
+class GridAxis(BaseModel):
+    feature: NumericalFeature
+    start: float = Field(..., allow_inf_nan=False)
+    stop: float = Field(..., allow_inf_nan=False, description="Last value, inclusive")
+    step: float = Field(1, gt=0, allow_inf_nan=False)
+    
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.stop < self.start:
+            raise ValueError(f"{self.feature}: stop must not be below start")
+        if not math.isfinite((self.stop - self.start) / self.step):
+            raise ValueError(f"{self.feature}: too many steps between start and stop")
+        return self
+    
+    def length(self) -> int:
+        """Number of values, computed without building them"""
+        return int((self.stop - self.start) / self.step + 1e-9) + 1
+    
+    def values(self) -> List[float]:
+        return [round(self.start + i * self.step, 10) for i in range(self.length())]
+
+class ScenarioGridRequest(BaseModel):
+    match: MatchInput = Field(..., description="Base match state; the axes override its features")
+    axes: List[GridAxis] = Field(..., min_length=1, max_length=3,
+                                 description="Numerical features to vary; the grid is their cross product")
+    derive_run_rates: bool = Field(
+        default=True,
+        description="Recompute required (and, with target_match, current) run rate from runs_required "
+                    "and balls_remaining when those vary and the rates are not axes themselves"
+    )
+    
+    @model_validator(mode="after")
+    def check_grid(self):
+        features = [axis.feature for axis in self.axes]
+        if len(set(features)) != len(features):
+            raise ValueError("each feature can be used by one axis only")
+        cells = 1
+        for axis in self.axes:
+            cells *= axis.length()
+        if cells > MAX_GRID_CELLS:
+            raise ValueError(f"grid has {cells:,} cells, the limit is {MAX_GRID_CELLS:,}")
+        return self
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "match": {
+                    "team1": "India",
+                    "team2": "Australia",
+                    "venue": "Melbourne Cricket Ground",
+                    "match_type": "T20",
+                    "balls_remaining": 60,
+                    "target_match": 180
+                },
+                "axes": [
+                    {"feature": "runs_required", "start": 1, "stop": 150},
+                    {"feature": "wickets_in_hand", "start": 1, "stop": 10}
+                ]
+            }
+        }
+
+class GridAxisValues(BaseModel):
+    feature: str
+    values: List[float]
+
+class ScenarioGridResponse(BaseModel):
+    batting_team: str
+    bowling_team: str
+    axes: List[GridAxisValues]
+    shape: List[int]
+    count: int
+    # Batting team win probability, nested one level per axis in axis order
+    probabilities: List[Any]
+    model_version: Optional[str] = None
+
+class ChaseCurveResponse(BaseModel):
+    batting_team: str
+    bowling_team: str
+    target: int
+    count: int
+    points: List[CurvePoint]
+    model_version: Optional[str] = None
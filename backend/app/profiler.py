@@ -0,0 +1,141 @@
+"""
+On-demand sampling profiler for the running service.
+
+While a profile runs, a background thread snapshots the Python stack of
+every other thread (the event loop and the inference pool threads, so
+PredictionService and CricketPredictor internals are both covered) every
+`interval` seconds and counts identical stacks. Nothing is installed on the
+request path, so there is no overhead when no profile is running.
+
+Results render as collapsed stacks (one `frame;frame;frame count` line per
+stack, the input of flamegraph.pl and speedscope) or as a pstats-style
+table of self and cumulative samples per function. Process pool workers are
+separate processes and are not sampled.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app import metrics
+
+# Longest profile the admin endpoint runs, also the timeout of request-count profiles
+MAX_SECONDS = 120.0
+
+# (file name, function) of leaf frames that mean a thread is waiting, not working
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+}
+
+_lock = threading.Lock()
+_running = False
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+class Profile:
+    """Stack samples of one profiling run"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.seconds = 0.0
+        self.requests = 0
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def table(self, limit: int = 50) -> str:
+        """Functions by self samples, with cumulative samples (any frame of the stack), like pstats"""
+        own, cumulative = Counter(), Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")[1:]
+            own[frames[-1]] += n
+            for frame in set(frames):
+                cumulative[frame] += n
+        total = sum(self.stacks.values()) or 1
+        lines = [f"{self.samples} samples ({self.idle_samples} idle, not shown) every {self.interval * 1000:g} ms "
+                 f"over {self.seconds:.1f}s, {self.requests} /api/predict calls",
+                 "",
+                 f"{'self':>7} {'self%':>6} {'cumul':>7} {'cumul%':>6}  function"]
+        for frame, n in own.most_common(limit):
+            lines.append(f"{n:7d} {100 * n / total:6.1f} {cumulative[frame]:7d} "
+                         f"{100 * cumulative[frame] / total:6.1f}  {frame}")
+        return "\n".join(lines) + "\n"
+
+
+def run(seconds: Optional[float] = None, requests: Optional[int] = None, interval: float = 0.005,
+        include_idle: bool = False) -> Profile:
+    """
+    Sample every thread for `seconds`, or until `requests` more /api/predict
+    calls have finished (at most MAX_SECONDS). Blocks; run it off the event loop.
+    """
+    global _running
+    with _lock:
+        if _running:
+            raise ProfilerBusyError("A profile is already running")
+        _running = True
+    try:
+        return _sample(seconds, requests, interval, include_idle)
+    finally:
+        _running = False
+
+
+def _sample(seconds: Optional[float], requests: Optional[int], interval: float, include_idle: bool) -> Profile:
+    profile = Profile(interval)
+    me = threading.get_ident()
+    names: Dict[int, str] = {}
+    baseline = _predict_calls()
+    deadline = time.perf_counter() + min(seconds or MAX_SECONDS, MAX_SECONDS)
+    started = time.perf_counter()
+
+    while True:
+        now = time.perf_counter()
+        profile.requests = _predict_calls() - baseline
+        if now >= deadline or (requests is not None and profile.requests >= requests):
+            break
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            stack = _stack(frame)
+            profile.samples += 1
+            if not include_idle and stack[-1][:2] in IDLE_LEAVES:
+                profile.idle_samples += 1
+                continue
+            if thread_id not in names:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            thread_name = names.get(thread_id, str(thread_id))
+            profile.stacks[";".join([thread_name] + [_label(f) for f in stack])] += 1
+        time.sleep(max(0.0, interval - (time.perf_counter() - now)))
+
+    profile.seconds = time.perf_counter() - started
+    return profile
+
+
+def _predict_calls() -> int:
+    return metrics.REQUEST_SECONDS.count("/predict", "POST")
+
+
+def _stack(frame) -> List[Tuple[str, str, int]]:
+    """(file name, function, first line) of every frame, outermost first"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((os.path.basename(code.co_filename), code.co_name, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _label(frame: Tuple[str, str, int]) -> str:
+    filename, function, line = frame
+    return f"{function} ({filename}:{line})"
@@ -1,46 +1,270 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
+import hmac
+from contextlib import contextmanager
 import logging
-from app.models.match import MatchInput, PredictionResponse
-from app.services.prediction_service import PredictionService
+from typing import Literal, Optional, Union
+from app import config, metrics, profiler
+from app.models.match import (
+    MatchInput, PredictionResponse, CompactPredictionResponse, BatchPredictionRequest, BatchPredictionResponse,
+    ExplainLevel,
+    ChaseCurveRequest, ChaseCurveResponse, ScenarioGridRequest, ScenarioGridResponse
+)
+from app.ml.predictor import default_registry
+from app.ml.format_router import FormatRouter
+from app.services.prediction_service import PredictionService, ModelReloadInProgressError
+from app.services.inference_executor import ExecutorSaturatedError
+from app.routers.responses import ModelJSONResponse
+from app.routers.timed_route import TimedRoute
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
-# Lazy-initialize the service to avoid import-time failures during deployment
+router = APIRouter(route_class=TimedRoute)
+# Created once by begin_startup(), at app startup or on the first request
 prediction_service = None
+_startup_task = None
+_watch_task = None
+startup_phase = "not_started"
+startup_error = None
 
-@router.post("/predict", response_model=PredictionResponse)
-async def predict_match(match_data: MatchInput):
-    """
-    Predict the outcome of a cricket match
-    """
+
+async def _load_and_warm_up():
+    global prediction_service, startup_phase, startup_error
     try:
-        global prediction_service
-        if prediction_service is None:
-            try:
-                prediction_service = PredictionService()
-            except Exception as e:
-                logger.exception("Failed to initialize PredictionService")
-                raise HTTPException(status_code=500, detail="Prediction service unavailable")
-
-        result = await prediction_service.predict(match_data)
-        return result
+        # Load the model off the event loop so the health endpoint stays responsive
+        startup_phase = "loading"
+        loop = asyncio.get_running_loop()
+        service = await loop.run_in_executor(None, PredictionService)
+        if config.WARMUP_ON_STARTUP:
+            startup_phase = "warming_up"
+            await service.warm_up()
+        prediction_service = service
+        startup_phase = "ready"
+        startup_error = None
+        _start_registry_watch()
+        return service
     except Exception as e:
+        startup_phase = "failed"
+        startup_error = str(e)
+        raise
+
+
+def begin_startup():
+    """Start loading and warming up the prediction service in the background"""
+    global _startup_task
+    failed = _startup_task is not None and _startup_task.done() and (
+        _startup_task.cancelled() or _startup_task.exception() is not None)
+    if _startup_task is None or failed:
+        _startup_task = asyncio.ensure_future(_load_and_warm_up())
+    return _startup_task
+
+
+async def get_prediction_service() -> PredictionService:
+    """Return the ready service; concurrent first callers share a single load"""
+    if prediction_service is not None:
+        return prediction_service
+    try:
+        return await asyncio.shield(begin_startup())
+    except Exception:
+        logger.exception("Failed to initialize PredictionService")
+        raise HTTPException(status_code=500, detail="Prediction service unavailable")
+
+
+def _start_registry_watch():
+    global _watch_task
+    if config.MODEL_WATCH_INTERVAL > 0 and (_watch_task is None or _watch_task.done()):
+        _watch_task = asyncio.ensure_future(_watch_registry(config.MODEL_WATCH_INTERVAL))
+
+
+async def _watch_registry(interval: float):
+    """Hot-reload the model whenever the registry's CURRENT pointer names another version"""
+    registry = default_registry()
+    failed = None
+    while True:
+        await asyncio.sleep(interval)
+        current = registry.current()
+        if prediction_service is None or current in (None, prediction_service.model_version, failed):
+            continue
+        logger.info(f"Registry now points at {current}, reloading")
+        try:
+            await prediction_service.reload()
+            failed = None
+        except ModelReloadInProgressError:
+            pass
+        except Exception:
+            # Don't retry a broken version on every poll
+            failed = current
+            logger.exception(f"Hot reload of model version {current} failed, keeping the current model")
+
+
+async def shutdown_prediction_service():
+    global prediction_service, _startup_task, _watch_task, startup_phase
+    if _startup_task is not None and not _startup_task.done():
+        _startup_task.cancel()
+    if _watch_task is not None:
+        _watch_task.cancel()
+        _watch_task = None
+    if prediction_service is not None:
+        prediction_service.shutdown()
+    prediction_service = None
+    _startup_task = None
+    startup_phase = "not_started"
+
+
+_EXPLAIN_QUERY = Query(None, description="Override the request's explain level: none, top5 or full")
+_COMPACT_QUERY = Query(False, description="Return shap_explanation as parallel features/values/impacts arrays")
+
+
+def _json(model) -> ModelJSONResponse:
+    """Serialize a response model once, skipping FastAPI's response_model re-validation"""
+    with metrics.stage("serialize"):
+        return ModelJSONResponse(model)
+
+
+@contextmanager
+def _inference_errors(path: str):
+    """Map a saturated inference queue to 503 and unexpected errors to a generic 500"""
+    try:
+        yield
+    except HTTPException:
+        raise
+    except ExecutorSaturatedError:
+        logger.warning(f"Inference queue full, rejecting {path}")
+        raise HTTPException(status_code=503, detail="Prediction service busy, retry shortly",
+                            headers={"Retry-After": "1"})
+    except Exception:
         # Log the full exception with stack trace so deployments show useful logs
-        logger.exception("Unhandled error in /api/predict")
+        logger.exception(f"Unhandled error in {path}")
         # Return a generic HTTP 500 with minimal detail
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/predict", response_model=Union[PredictionResponse, CompactPredictionResponse])
+async def predict_match(match_data: MatchInput, explain: Optional[ExplainLevel] = _EXPLAIN_QUERY,
+                        compact: bool = _COMPACT_QUERY):
+    """
+    Predict the outcome of a cricket match
+    """
+    with _inference_errors("/api/predict"):
+        service = await get_prediction_service()
+        result = await service.predict(match_data, explain=explain, compact=compact)
+        return _json(result)
+
+
+@router.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(batch: BatchPredictionRequest, explain: Optional[ExplainLevel] = _EXPLAIN_QUERY,
+                        compact: bool = _COMPACT_QUERY):
+    """
+    Predict the outcome of many cricket matches in one vectorized model call
+    """
+    with _inference_errors("/api/predict/batch"):
+        service = await get_prediction_service()
+        predictions = await service.predict_batch(batch.matches, explain=explain, compact=compact)
+        return _json(BatchPredictionResponse.model_construct(count=len(predictions), predictions=predictions))
+
+
+@router.post("/predict/curve", response_model=ChaseCurveResponse)
+async def predict_curve(request: ChaseCurveRequest, explain: Optional[ExplainLevel] = _EXPLAIN_QUERY):
+    """
+    Win probability curve of a chase: one point before the first ball and after every step
+    """
+    with _inference_errors("/api/predict/curve"):
+        service = await get_prediction_service()
+        return _json(await service.predict_curve(request, explain=explain))
+
+
+@router.post("/predict/grid", response_model=ScenarioGridResponse)
+async def predict_grid(request: ScenarioGridRequest):
+    """
+    What-if grid: win probability over ranges of 1-3 numerical features around a base match
+    """
+    with _inference_errors("/api/predict/grid"):
+        service = await get_prediction_service()
+        return _json(await service.predict_grid(request))
+
+
+@router.post("/admin/reload")
+async def reload_model(version: Optional[str] = Query(None, description="Registry version to switch to, e.g. v0003; defaults to the current one"),
+                       x_admin_token: Optional[str] = Header(None)):
+    """
+    Load a model version, warm it up and swap it in without dropping requests
+    """
+    if not config.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    service = await get_prediction_service()
+    try:
+        return await service.reload(version)
+    except ModelReloadInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception:
+        logger.exception("Unhandled error in /api/admin/reload")
+        raise HTTPException(status_code=500, detail="Model reload failed, the previous model is still serving")
+
+
+@router.post("/admin/profile", response_class=PlainTextResponse)
+async def profile_traffic(seconds: Optional[float] = Query(None, gt=0, le=profiler.MAX_SECONDS, description="Profile for this many seconds of live traffic"),
+                          requests: Optional[int] = Query(None, gt=0, description="Profile until this many more /api/predict calls have finished"),
+                          format: Literal["collapsed", "table"] = Query("collapsed", description="collapsed stacks for flame graphs, or a pstats-style table"),
+                          interval_ms: float = Query(5.0, ge=1, le=1000, description="Sampling interval"),
+                          x_admin_token: Optional[str] = Header(None)):
+    """
+    Sample the stacks of the running service while it serves traffic
+    """
+    if not config.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if seconds is None and requests is None:
+        raise HTTPException(status_code=422, detail="Give seconds or requests")
+    try:
+        profile = await asyncio.to_thread(profiler.run, seconds, requests, interval_ms / 1000)
+    except profiler.ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    headers = {
+        "X-Profile-Samples": str(profile.samples),
+        "X-Profile-Seconds": f"{profile.seconds:.3f}",
+        "X-Profile-Requests": str(profile.requests)
+    }
+    executor = getattr(prediction_service, 'executor', None)
+    if getattr(executor, 'mode', None) == "process":
+        headers["X-Profile-Note"] = "Inference runs in worker processes, which are not sampled"
+    return PlainTextResponse(profile.collapsed() if format == "collapsed" else profile.table(), headers=headers)
+
+
 @router.get("/health")
 async def health():
-    """Simple health endpoint reporting model readiness"""
-    global prediction_service
+    """
+    Readiness endpoint: 503 until the model is loaded and warmed up, then 200
+    """
     if prediction_service is None:
-        try:
-            prediction_service = PredictionService()
-        except Exception:
-            logger.exception("Failed to initialize PredictionService during health check")
-            return {"ready": False, "model_loaded": False}
+        begin_startup()
+        return JSONResponse(status_code=503, content={
+            "ready": False,
+            "status": startup_phase,
+            "model_loaded": False,
+            "error": startup_error
+        })
 
     model_loaded = getattr(prediction_service, 'model_loaded', False)
-    return {"ready": True, "model_loaded": bool(model_loaded)}
+    executor = getattr(prediction_service, 'executor', None)
+    batcher = getattr(prediction_service, 'batcher', None)
+    cache = getattr(prediction_service.predictor, 'cache', None)
+    surfaces = getattr(prediction_service.predictor, 'surfaces', None)
+    compiled = getattr(prediction_service.predictor, 'compiled', None)
+    router = prediction_service.predictor if isinstance(prediction_service.predictor, FormatRouter) else None
+    return {
+        "ready": True,
+        "status": "ready",
+        "model_loaded": bool(model_loaded),
+        "model_version": prediction_service.model_version,
+        "model_path": str(prediction_service.predictor.model_path) if prediction_service.predictor else None,
+        "load_seconds": round(prediction_service.load_seconds, 3),
+        "reload": prediction_service.reload_stats,
+        "inference_backend": "compiled" if compiled is not None else "sklearn",
+        "warmup": prediction_service.warmup_stats,
+        "executor": executor.stats() if executor is not None else None,
+        "batcher": batcher.stats() if batcher is not None else None,
+        "cache": cache.stats() if cache is not None else None,
+        "lookup_surfaces": surfaces.stats() if surfaces is not None else None,
+        "format_models": router.stats() if router is not None else None
+    }
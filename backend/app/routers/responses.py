@@ -0,0 +1,16 @@
+"""
+JSON response for pydantic models, serialized once.
+
+When an endpoint returns a model, FastAPI validates it again against the
+route's response_model, dumps it to plain dicts and encodes those with
+json.dumps. Returning a ModelJSONResponse skips all three:
+pydantic-core's Rust serializer writes the model straight to JSON bytes. The
+route's response_model then only documents the schema.
+"""
+import pydantic_core
+from fastapi.responses import JSONResponse
+
+
+class ModelJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return pydantic_core.to_json(content)
@@ -0,0 +1,51 @@
+"""
+APIRoute that times every request it handles.
+
+FastAPI reads and validates the body before calling the endpoint and
+serializes the returned model afterwards, both inside the route handler.
+Wrapping the endpoint marks where it starts and ends, which splits the
+handler into `validate`, the endpoint's own stages and `serialize`.
+"""
+import functools
+import time
+
+from fastapi.routing import APIRoute
+
+from app import config, metrics
+
+
+class TimedRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **kwargs):
+            timings = metrics.current()
+            if timings is None:
+                return await endpoint(*args, **kwargs)
+            started = time.perf_counter()
+            timings.add("validate", started - timings.started)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timings.endpoint_finished = time.perf_counter()
+
+        super().__init__(path, timed_endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        method = ",".join(sorted(self.methods or ()))
+
+        async def timed_handler(request):
+            with metrics.collect() as timings:
+                try:
+                    response = await handler(request)
+                finally:
+                    finished = time.perf_counter()
+                    if timings.endpoint_finished is not None:
+                        timings.add("serialize", finished - timings.endpoint_finished)
+                    metrics.observe(self.path_format, method, timings, finished - timings.started)
+            if config.SERVER_TIMING:
+                timings.add("total", finished - timings.started)
+                response.headers["Server-Timing"] = timings.server_timing()
+            return response
+
+        return timed_handler
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict
+
+from app import config, metrics
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_MODES = ("thread", "process", "inline")
+
+# Per-process predictor used by process pool workers
+_worker_predictor = None
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the inference queue is full and the job is rejected"""
+
+
+def _init_worker(model_path: str):
+    """Load the model once when a worker process starts"""
+    global _worker_predictor
+    from app.ml.format_router import load_predictor
+    _worker_predictor = load_predictor(model_path)
+
+
+def _run_in_worker(method: str, args: tuple):
+    return metrics.call_collecting(getattr(_worker_predictor, method), *args)
+
+
+class InferenceExecutor:
+    """
+    Run blocking CricketPredictor calls off the asyncio event loop.
+
+    Jobs go to a thread pool sharing the caller's predictor, or to a process
+    pool where every worker preloads its own copy of the model. At most
+    `max_pending` jobs may be queued or running; further submissions raise
+    ExecutorSaturatedError so callers can shed load instead of queueing forever.
+    """
+
+    def __init__(self, predictor, mode: str = "thread", workers: int = 2, max_pending: int = 64):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode '{mode}', expected one of {EXECUTOR_MODES}")
+
+        self.predictor = predictor
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self._pool = None
+
+        if mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        elif mode == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(str(predictor.model_path),)
+            )
+        logger.info(f"Inference executor: mode={mode} workers={self.workers} max_pending={self.max_pending}")
+
+    @classmethod
+    def from_config(cls, predictor) -> "InferenceExecutor":
+        """Build an executor from app.config settings"""
+        return cls(
+            predictor,
+            mode=config.INFERENCE_EXECUTOR,
+            workers=config.INFERENCE_WORKERS,
+            max_pending=config.INFERENCE_MAX_PENDING
+        )
+
+    async def run(self, method: str, *args) -> Any:
+        """Call predictor.<method>(*args) on the pool and await the result"""
+        if self._pool is None:
+            return getattr(self.predictor, method)(*args)
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorSaturatedError(f"Inference queue full ({self.pending} pending)")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # Pool threads and workers don't see the caller's context; their stage timings come back with the result
+            if self.mode == "process":
+                result, timings = await loop.run_in_executor(self._pool, _run_in_worker, method, args)
+            else:
+                result, timings = await loop.run_in_executor(self._pool, metrics.call_collecting,
+                                                             getattr(self.predictor, method), *args)
+            metrics.merge(timings)
+            return result
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and counters for diagnostics"""
+        return {
+            "mode": self.mode,
+            "workers": self.workers if self._pool is not None else 0,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self, cancel_pending: bool = True):
+        """Release the pool; with cancel_pending=False queued jobs still run (used when retiring a model)"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=cancel_pending)
+            self._pool = None
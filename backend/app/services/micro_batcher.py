@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single predictions into vectorized predict_batch calls.
+
+    Requests are collected until `window_ms` has passed since the first one
+    arrived or `max_batch_size` requests are waiting, then scored with one
+    predict_batch call on the inference executor and fanned back out to the
+    waiting coroutines.
+    """
+
+    def __init__(self, executor, window_ms: float = 2.0, max_batch_size: int = 32):
+        self.executor = executor
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[Dict, str, asyncio.Future, float]] = []
+        self._timer = None
+        self._tasks = set()
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.max_observed_batch = 0
+        self._recent_sizes = deque(maxlen=1024)
+        self._recent_delays = deque(maxlen=1024)
+
+    async def submit(self, model_input: Dict, explain: str = "full") -> Tuple[str, float, List[Dict]]:
+        """Queue one model input and wait for its (winner, probability, shap_values)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((model_input, explain, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        result, timings = await future
+        # Every request in the batch waited for all of its stages
+        metrics.merge(timings)
+        return result
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Dict, str, asyncio.Future, float]]):
+        started = time.perf_counter()
+        self.batches += 1
+        self.items += len(batch)
+        self.max_observed_batch = max(self.max_observed_batch, len(batch))
+        self._recent_sizes.append(len(batch))
+        self._recent_delays.extend(started - enqueued for _, _, _, enqueued in batch)
+
+        try:
+            # Each request keeps its own explanation level; the explainer only runs for those that want one
+            with metrics.collect() as timings:
+                results = await self.executor.run(
+                    'predict_batch',
+                    [model_input for model_input, _, _, _ in batch],
+                    [explain for _, explain, _, _ in batch]
+                )
+        except Exception as e:
+            logger.warning(f"Micro-batch of {len(batch)} failed: {e}")
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result((result, timings))
+
+    def stats(self) -> Dict[str, Any]:
+        """Achieved batch sizes and queueing delay, recent values over the last 1024 batches/requests"""
+        delays = sorted(self._recent_delays)
+        sizes = self._recent_sizes
+
+        def delay_ms(q: float) -> float:
+            return round(delays[min(len(delays) - 1, int(q * len(delays)))] * 1000, 3) if delays else 0.0
+
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "recent_mean_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            "max_observed_batch_size": self.max_observed_batch,
+            "queue_delay_p50_ms": delay_ms(0.5),
+            "queue_delay_p99_ms": delay_ms(0.99),
+            "waiting": len(self._pending)
+        }
@@ -1,29 +1,53 @@
+import asyncio
 import logging
-from app.models.match import MatchInput, PredictionResponse, ShapValue
-from app.ml.predictor import CricketPredictor
-from typing import List
+import random
+import statistics
+import time
+import numpy as np
+from app.models.match import (
+    MatchInput, PredictionResponse, CompactPredictionResponse, ShapArrays, ShapValue, ChaseCurveRequest, ChaseCurveResponse, CurvePoint, INNINGS_BALLS,
+    ScenarioGridRequest, ScenarioGridResponse, GridAxisValues
+)
+from app.ml.predictor import CricketPredictor, default_registry
+from app.ml.format_router import load_predictor
+from app.ml.model_trainer import CricketModelTrainer
+from app.services.inference_executor import InferenceExecutor
+from app.services.micro_batcher import MicroBatcher
+from app import config, metrics
+from typing import Dict, List, Optional, Union
 
 logger = logging.getLogger(__name__)
 
+
+class ModelReloadInProgressError(Exception):
+    """Raised when a reload is requested while another one is still running"""
+
+
 class PredictionService:
     """
     Service for cricket match prediction with ML model
     """
     
-    def __init__(self):
+    def __init__(self, model_path: str = None, executor: InferenceExecutor = None):
         # Load the trained ML model
         # Ensure predictor attribute always exists even if initialization fails.
         self.predictor = None
+        self.executor = executor
+        self.warmup_stats = None
+        self.reload_stats = None
+        self._reloading = False
+        load_started = time.perf_counter()
         try:
             logger.info("Initializing CricketPredictor...")
-            self.predictor = CricketPredictor()
+            self.predictor = load_predictor(model_path)
             logger.info("PredictionService initialized with ML predictor")
         except Exception:
             # Log full stack and keep predictor as None so other code paths can handle fallback.
             logger.exception("Failed to initialize CricketPredictor during PredictionService startup")
+        self.load_seconds = time.perf_counter() - load_started
         # Set model_loaded flag for diagnostics
         try:
-            self.model_loaded = bool(getattr(self.predictor, 'model', None))
+            self.model_loaded = bool(getattr(self.predictor, 'is_loaded', False))
             logger.info(f"Model loaded: {self.model_loaded}")
             if self.model_loaded:
                 # If model_info exists, log a short summary
@@ -33,13 +57,350 @@ class PredictionService:
         except Exception:
             self.model_loaded = False
             logger.exception("Error determining model_loaded flag")
+        # Run blocking inference off the event loop
+        if self.executor is None and self.predictor is not None:
+            try:
+                self.executor = InferenceExecutor.from_config(self.predictor)
+            except Exception:
+                logger.exception("Invalid inference executor settings, running inference inline")
+                self.executor = InferenceExecutor(self.predictor, mode="inline")
+        # Optionally coalesce concurrent single predictions into batches
+        self.batcher = None
+        if self.executor is not None and config.PREDICT_BATCH_WINDOW_MS > 0:
+            self.batcher = MicroBatcher(
+                self.executor,
+                window_ms=config.PREDICT_BATCH_WINDOW_MS,
+                max_batch_size=config.PREDICT_BATCH_MAX_SIZE
+            )
     
-    async def predict(self, match_data: MatchInput) -> PredictionResponse:
+    async def predict(self, match_data: MatchInput, explain: Optional[str] = None,
+                      compact: bool = False) -> Union[PredictionResponse, CompactPredictionResponse]:
         """
         Predict match outcome based on input data using ML model
+        
+        `explain` overrides the explanation level requested in match_data;
+        `compact` returns the explanation as parallel arrays.
+        """
+        with metrics.stage("build_input"):
+            model_input = self._build_model_input(match_data)
+        explain = explain or match_data.explain
+        # A reload during the request doesn't change the model answering it
+        model_version = self.model_version
+        
+        # Get prediction from ML model (queueing, batching and the model's own stages)
+        with metrics.stage("inference"):
+            if getattr(self, "predictor", None) and self.batcher is not None:
+                winner, batting_win_prob, shap_values = await self.batcher.submit(model_input, explain)
+            elif getattr(self, "predictor", None):
+                winner, batting_win_prob, shap_values = await self.executor.run('predict', model_input, explain)
+            else:
+                winner, batting_win_prob, shap_values = self._fallback_prediction(match_data, model_input, explain)
+        
+        with metrics.stage("build_response"):
+            return self._build_response(match_data, winner, batting_win_prob, shap_values, model_version, compact)
+    
+    async def predict_batch(self, matches: List[MatchInput], explain: Optional[str] = None,
+                            compact: bool = False) -> List[Union[PredictionResponse, CompactPredictionResponse]]:
+        """
+        Predict outcomes for many matches with one vectorized model call
+        
+        `explain` overrides the explanation level requested by each match.
+        """
+        with metrics.stage("build_input"):
+            model_inputs = [self._build_model_input(match_data) for match_data in matches]
+        levels = [explain or match_data.explain for match_data in matches]
+        model_version = self.model_version
+        
+        with metrics.stage("inference"):
+            if getattr(self, "predictor", None):
+                results = await self.executor.run('predict_batch', model_inputs, levels)
+            else:
+                results = [
+                    self._fallback_prediction(match_data, model_input, level)
+                    for match_data, model_input, level in zip(matches, model_inputs, levels)
+                ]
+        
+        with metrics.stage("build_response"):
+            return [
+                self._build_response(match_data, winner, batting_win_prob, shap_values, model_version, compact)
+                for match_data, (winner, batting_win_prob, shap_values) in zip(matches, results)
+            ]
+    
+    async def predict_curve(self, request: ChaseCurveRequest, explain: Optional[str] = None) -> ChaseCurveResponse:
+        """
+        Batting team win probability before the chase and after every step, scored in one batch
+        
+        States where the chase is already decided (target reached, all out or out of
+        balls) are not sent to the model.
+        """
+        explain = explain or request.explain
+        model_version = self.model_version
+        match_data = MatchInput(
+            team1=request.team1,
+            team2=request.team2,
+            venue=request.venue,
+            toss_winner=request.toss_winner,
+            toss_decision=request.toss_decision,
+            match_type=request.match_type
+        )
+        base_input = self._build_model_input(match_data)
+        
+        # Replay the chase, one state per step plus the starting state
+        states = []
+        runs = wickets = balls = 0
+        for step in [None] + list(request.steps):
+            if step is not None:
+                runs, wickets, balls = runs + step.runs, wickets + step.wickets, balls + step.balls
+            features = CricketModelTrainer.chase_features(request.target, runs, wickets, balls, request.total_balls)
+            states.append((runs, wickets, balls, features))
+        
+        decided = [_decided_probability(features) for _, _, _, features in states]
+        outcomes = [None if probability is None else (probability, []) for probability in decided]
+        open_states = [i for i, outcome in enumerate(outcomes) if outcome is None]
+        model_inputs = [dict(base_input, **states[i][3]) for i in open_states]
+        if open_states and getattr(self, "predictor", None):
+            results = await self.executor.run('predict_batch', model_inputs, explain)
+        else:
+            results = [self._fallback_prediction(match_data, model_input, explain) for model_input in model_inputs]
+        for i, (_, batting_win_prob, shap_values) in zip(open_states, results):
+            outcomes[i] = (batting_win_prob, shap_values)
+        
+        points = []
+        for (runs, wickets, balls, features), outcome in zip(states, outcomes):
+            batting_win_prob, shap_values = outcome
+            points.append(CurvePoint(
+                balls_bowled=balls,
+                over=f"{balls // 6}.{balls % 6}",
+                runs=runs,
+                wickets=wickets,
+                runs_required=features['runs_required'],
+                balls_remaining=features['balls_remaining'],
+                probability=round(float(batting_win_prob), 4),
+                shap_explanation=[ShapValue(**sv) for sv in shap_values]
+            ))
+        
+        return ChaseCurveResponse(
+            batting_team=request.team1,
+            bowling_team=request.team2,
+            target=request.target,
+            count=len(points),
+            points=points,
+            model_version=model_version
+        )
+    
+    async def predict_grid(self, request: ScenarioGridRequest) -> ScenarioGridResponse:
         """
-        # Prepare input data for the model
-        model_input = {
+        Batting team win probability over the cross product of the request's axes
+        
+        Cells are expanded and scored SCENARIO_GRID_CHUNK_ROWS at a time without
+        explanations, so memory is bounded by one chunk plus the float32 result.
+        """
+        model_version = self.model_version
+        base_input = self._build_model_input(request.match)
+        axis_values = [np.asarray(axis.values()) for axis in request.axes]
+        shape = tuple(len(values) for values in axis_values)
+        count = int(np.prod(shape))
+        
+        probabilities = np.empty(count, dtype=np.float32)
+        chunk_rows = max(config.SCENARIO_GRID_CHUNK_ROWS, 1)
+        for start in range(0, count, chunk_rows):
+            stop = min(start + chunk_rows, count)
+            if getattr(self, "predictor", None):
+                model_inputs = self._grid_inputs(base_input, request, axis_values, shape, start, stop)
+                probabilities[start:stop] = await self.executor.run('score', model_inputs)
+            else:
+                probabilities[start:stop] = 0.5
+        
+        return ScenarioGridResponse(
+            batting_team=base_input['batting_team'],
+            bowling_team=base_input['bowling_team'],
+            axes=[GridAxisValues(feature=axis.feature, values=values.tolist())
+                  for axis, values in zip(request.axes, axis_values)],
+            shape=list(shape),
+            count=count,
+            probabilities=probabilities.reshape(shape).astype(np.float64).round(4).tolist(),
+            model_version=model_version
+        )
+    
+    def _grid_inputs(self, base_input: dict, request: ScenarioGridRequest, axis_values: List[np.ndarray],
+                     shape: tuple, start: int, stop: int) -> List[dict]:
+        """Model inputs for grid cells start..stop in row-major order"""
+        index = np.unravel_index(np.arange(start, stop), shape)
+        columns = {axis.feature: values[i] for axis, values, i in zip(request.axes, axis_values, index)}
+        if request.derive_run_rates:
+            columns.update(_derived_run_rates(base_input, columns, stop - start))
+        names = list(columns)
+        return [dict(base_input, **dict(zip(names, cell))) for cell in zip(*(columns[name].tolist() for name in names))]
+    
+    async def warm_up(self, min_iterations: int = None, max_iterations: int = None,
+                      window: int = None, tolerance: float = None) -> Dict:
+        """
+        Run synthetic predictions until latency reaches steady state.
+        
+        Each round sends one prediction per inference worker so every worker
+        (thread or process) pays its first-call costs here instead of on a user
+        request. Warm-up stops once the p50 of the latest window of rounds is
+        within `tolerance` of the previous window, or after max_iterations.
+        """
+        if self.predictor is None or self.executor is None:
+            self.warmup_stats = {"iterations": 0, "seconds": 0.0, "steady": False, "p50_ms": None}
+            return self.warmup_stats
+        
+        self.warmup_stats = await self._warm_up_executor(self.executor, self.predictor, min_iterations,
+                                                         max_iterations, window, tolerance)
+        return self.warmup_stats
+    
+    async def _warm_up_executor(self, executor: InferenceExecutor, predictor: CricketPredictor,
+                                min_iterations: int = None, max_iterations: int = None,
+                                window: int = None, tolerance: float = None) -> Dict:
+        """Warm-up rounds against one executor, which need not be serving requests yet"""
+        min_iterations = config.WARMUP_MIN_ITERATIONS if min_iterations is None else min_iterations
+        max_iterations = max(min_iterations, config.WARMUP_MAX_ITERATIONS if max_iterations is None else max_iterations)
+        window = max(1, config.WARMUP_WINDOW if window is None else window)
+        tolerance = config.WARMUP_TOLERANCE if tolerance is None else tolerance
+        
+        started = time.perf_counter()
+        concurrency = executor.workers
+        # Batch inputs come last and are never predicted singly, so the batch call scores every row
+        batch_size = max(1, config.PREDICT_BATCH_MAX_SIZE)
+        inputs = self._warmup_inputs(max_iterations * concurrency + batch_size, predictor)
+        batch_inputs = inputs[-batch_size:]
+        latencies = []
+        window_p50s = []
+        steady = False
+        
+        async def timed_predict(model_input):
+            t0 = time.perf_counter()
+            # Bypass the cache: synthetic states must not fill it or inflate its stats
+            await executor.run('predict', model_input, "full", False)
+            return time.perf_counter() - t0
+        
+        iterations = 0
+        for iterations in range(1, max_iterations + 1):
+            round_inputs = inputs[(iterations - 1) * concurrency:iterations * concurrency]
+            latencies.extend(await asyncio.gather(*(timed_predict(i) for i in round_inputs)))
+            
+            if iterations % window == 0:
+                window_p50s.append(statistics.median(latencies[-window * concurrency:]))
+                if (iterations >= min_iterations and len(window_p50s) >= 2
+                        and abs(window_p50s[-1] - window_p50s[-2]) <= tolerance * window_p50s[-2]):
+                    steady = True
+                    break
+        
+        # Exercise the vectorized path used by the batch endpoint and micro-batching
+        await executor.run('predict_batch', batch_inputs, "full", False)
+        
+        warmup_stats = {
+            "iterations": iterations,
+            "predictions": len(latencies),
+            "seconds": round(time.perf_counter() - started, 3),
+            "first_ms": round(latencies[0] * 1000, 3),
+            "p50_ms": round(window_p50s[-1] * 1000, 3) if window_p50s else round(statistics.median(latencies) * 1000, 3),
+            "steady": steady
+        }
+        logger.info(f"Warm-up complete: {warmup_stats}")
+        return warmup_stats
+    
+    async def reload(self, version: Optional[str] = None) -> Dict:
+        """
+        Load a registry version in the background, warm it up and swap it in.
+        
+        The new model gets its own predictor and inference executor. Both are
+        swapped in with one assignment once the model is warm. Requests already
+        running finish on the model they started with, and later ones use the
+        new model. With `version`, the registry's CURRENT pointer is moved to it
+        after it loads; otherwise the current version is (re)loaded.
+        """
+        if self._reloading:
+            raise ModelReloadInProgressError("A model reload is already in progress")
+        self._reloading = True
+        try:
+            started = time.perf_counter()
+            registry = default_registry()
+            model_path = registry.model_path(version)
+            if not model_path.exists():
+                raise ValueError(f"Unknown model version '{version}', available: {', '.join(registry.versions()) or 'none'}")
+            
+            loop = asyncio.get_running_loop()
+            predictor = await loop.run_in_executor(None, load_predictor, str(model_path))
+            if not predictor.is_loaded:
+                raise ValueError(f"Could not load the model at {model_path}")
+            load_seconds = time.perf_counter() - started
+            executor = InferenceExecutor.from_config(predictor)
+            try:
+                warmup_stats = await self._warm_up_executor(executor, predictor)
+            except Exception:
+                executor.shutdown()
+                raise
+            
+            previous_version = self.predictor.model_version if self.predictor is not None else None
+            previous_executor = self.executor
+            self.predictor, self.executor = predictor, executor
+            if self.batcher is not None:
+                self.batcher.executor = executor
+            self.model_loaded = True
+            self.load_seconds = load_seconds
+            self.warmup_stats = warmup_stats
+            if version is not None:
+                registry.set_current(version)
+            # Jobs already queued on the old executor still run
+            if previous_executor is not None:
+                previous_executor.shutdown(cancel_pending=False)
+            
+            self.reload_stats = {
+                "previous_version": previous_version,
+                "model_version": predictor.model_version,
+                "model_path": str(model_path),
+                "load_seconds": round(load_seconds, 3),
+                "seconds": round(time.perf_counter() - started, 3),
+                "warmup": warmup_stats
+            }
+            logger.info(f"Model reloaded: {self.reload_stats}")
+            return self.reload_stats
+        finally:
+            self._reloading = False
+    
+    @property
+    def model_version(self) -> Optional[str]:
+        """Version of the model serving new requests"""
+        return self.predictor.model_version if self.predictor is not None else None
+    
+    def _warmup_inputs(self, count: int, predictor: Optional[CricketPredictor] = None) -> List[dict]:
+        """Deterministic synthetic match states drawn from the model's vocabulary"""
+        categories = (predictor or self.predictor).known_categories()
+        teams = categories.get('batting_team') or ['Team 1', 'Team 2']
+        venues = categories.get('venue') or ['Venue']
+        rng = random.Random(0)
+        inputs = []
+        for _ in range(count):
+            target = rng.randint(120, 320)
+            balls_remaining = rng.randint(1, 299)
+            runs_required = rng.randint(1, target)
+            team1, team2 = rng.choice(teams), rng.choice(teams)
+            match_data = MatchInput(
+                team1=team1,
+                team2=team2,
+                venue=rng.choice(venues),
+                toss_winner=rng.choice([team1, team2]),
+                toss_decision=rng.choice(['bat', 'field']),
+                runs_required=runs_required,
+                balls_remaining=balls_remaining,
+                wickets_in_hand=rng.randint(1, 10),
+                target_match=target,
+                current_run_rate=round(rng.uniform(3, 12), 2),
+                required_run_rate=round(runs_required * 6 / balls_remaining, 2)
+            )
+            inputs.append(self._build_model_input(match_data))
+        return inputs
+    
+    def shutdown(self):
+        """Release inference workers"""
+        if self.executor is not None:
+            self.executor.shutdown()
+    
+    def _build_model_input(self, match_data: MatchInput) -> dict:
+        """Prepare input data for the model"""
+        return {
             'team1': match_data.team1,
             'team2': match_data.team2,
             'batting_team': match_data.team1,  # Assume team1 is batting
@@ -47,57 +408,80 @@ class PredictionService:
             'venue': match_data.venue,
             'toss_winner': match_data.toss_winner or match_data.team1,
             'toss_decision': match_data.toss_decision or 'bat',
+            # Routes the prediction to the match type's own model, if there is one
+            'match_type': match_data.match_type,
             # These would come from match context in a real scenario
             'runs_required': getattr(match_data, 'runs_required', 150),
-            'balls_remaining': getattr(match_data, 'balls_remaining', 120),
+            # A chase that hasn't started has the whole innings left
+            'balls_remaining': (match_data.balls_remaining if match_data.balls_remaining is not None
+                                else INNINGS_BALLS.get(match_data.match_type.upper())),
             'wickets_in_hand': getattr(match_data, 'wickets_in_hand', 10),
             'target_match': getattr(match_data, 'target_match', 250),
             'current_run_rate': getattr(match_data, 'current_run_rate', 6.0),
             'required_run_rate': getattr(match_data, 'required_run_rate', 7.5)
         }
+    
+    def _fallback_prediction(self, match_data: MatchInput, model_input: dict, explain: str = "full"):
+        """Fallback prediction if predictor unavailable"""
+        logger.warning("Predictor not available, returning fallback prediction")
+        metrics.count("fallback_prediction")
+        batting_team = model_input.get('batting_team') or match_data.team1
+        if explain == "none":
+            return batting_team, 0.5, []
+        return batting_team, 0.5, self._generate_dynamic_shap_values(model_input)
+    
+    def _build_response(self, match_data: MatchInput, winner: str, batting_win_prob: float,
+                        shap_values: List[dict], model_version: Optional[str] = None,
+                        compact: bool = False) -> Union[PredictionResponse, CompactPredictionResponse]:
+        """
+        Assemble the API response from a model prediction
         
-        # Get prediction from ML model
-        if getattr(self, "predictor", None):
-            winner, batting_win_prob, shap_values = self.predictor.predict(model_input)
-        else:
-            # Fallback prediction if predictor unavailable
-            logger.warning("Predictor not available, returning fallback prediction")
-            batting_team = model_input.get('batting_team') or match_data.team1
-            winner = batting_team
-            batting_win_prob = 0.5
-            shap_values = self._generate_dynamic_shap_values(model_input)
-
+        Every field is coerced to its declared type here, so the models are
+        built with model_construct instead of being validated field by field.
+        """
         # Determine confidence level
         confidence = "high" if batting_win_prob > 0.7 else "medium" if batting_win_prob > 0.6 else "low"
         
         # Convert SHAP values to response format (defensively)
-        shap_explanation = []
         try:
-            for sv in shap_values:
-                # Ensure keys exist and types are correct
-                feature = str(sv.get('feature', 'Unknown'))
-                value = float(sv.get('value', 0.0))
-                impact = str(sv.get('impact', 'neutral'))
-                shap_explanation.append(ShapValue(feature=feature, value=value, impact=impact))
+            # Ensure keys exist and types are correct
+            features = [str(sv.get('feature', 'Unknown')) for sv in shap_values]
+            values = [float(sv.get('value', 0.0)) for sv in shap_values]
+            impacts = [str(sv.get('impact', 'neutral')) for sv in shap_values]
         except Exception:
             # Fallback to default explanation to avoid 500s
             logger.exception("Error converting SHAP values, using default explanation")
-            shap_explanation = [ShapValue(**sv) for sv in self._default_shap_values()]
+            defaults = self._default_shap_values()
+            features = [sv['feature'] for sv in defaults]
+            values = [float(sv['value']) for sv in defaults]
+            impacts = [sv['impact'] for sv in defaults]
         
         # Prepare factors
         factors = {
             "toss": f"Won by {match_data.toss_winner}" if match_data.toss_winner else "N/A",
             "toss_decision": match_data.toss_decision if match_data.toss_decision else "N/A",
-            "venue": match_data.venue,
-            "match_type": match_data.match_type
+            "venue": str(match_data.venue),
+            "match_type": str(match_data.match_type)
         }
         
-        return PredictionResponse(
-            winner=winner,
-            probability=round(batting_win_prob, 2),
+        fields = dict(
+            winner=str(winner),
+            probability=round(float(batting_win_prob), 2),
             confidence=confidence,
-            shap_explanation=shap_explanation,
-            factors=factors
+            factors=factors,
+            model_version=model_version
+        )
+        if compact:
+            return CompactPredictionResponse.model_construct(
+                shap_explanation=ShapArrays.model_construct(features=features, values=values, impacts=impacts),
+                **fields
+            )
+        return PredictionResponse.model_construct(
+            shap_explanation=[
+                ShapValue.model_construct(feature=feature, value=value, impact=impact)
+                for feature, value, impact in zip(features, values, impacts)
+            ],
+            **fields
         )
     
     def _generate_dynamic_shap_values(self, model_input: dict) -> List[dict]:
@@ -105,6 +489,7 @@ class PredictionService:
         Generate dynamic SHAP-like values based on actual input data
         """
         import random
+        metrics.count("dynamic_shap")
         
         # Extract input values
         runs_required = model_input.get('runs_required', 150)
@@ -172,3 +557,45 @@ class PredictionService:
             {'feature': 'Toss Impact', 'value': -0.05, 'impact': 'negative'},
             {'feature': 'Venue History', 'value': 0.08, 'impact': 'positive'},
         ]
+
+
+def _derived_run_rates(base_input: dict, columns: Dict[str, np.ndarray], count: int) -> Dict[str, np.ndarray]:
+    """
+    Run rates that follow from varied runs_required, balls_remaining or
+    target_match, for the rates that aren't axes themselves. The current run
+    rate needs the target and the innings length of the match type.
+    """
+    if not {'runs_required', 'balls_remaining', 'target_match'} & set(columns):
+        return {}
+    
+    def feature(name):
+        if name in columns:
+            return columns[name].astype(float)
+        value = base_input.get(name)
+        return None if value is None else np.full(count, float(value))
+    
+    runs_required, balls_remaining, target = (feature('runs_required'), feature('balls_remaining'),
+                                              feature('target_match'))
+    derived = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if ('required_run_rate' not in columns and runs_required is not None and balls_remaining is not None
+                and {'runs_required', 'balls_remaining'} & set(columns)):
+            # Undefined once the innings is out of balls; the pipeline imputes it
+            derived['required_run_rate'] = np.where(balls_remaining > 0, runs_required * 6 / balls_remaining, np.nan)
+        total_balls = INNINGS_BALLS.get(str(base_input.get('match_type')).upper())
+        if ('current_run_rate' not in columns and total_balls and target is not None
+                and runs_required is not None and balls_remaining is not None):
+            runs = np.maximum(target - runs_required, 0)
+            balls_bowled = np.maximum(total_balls - balls_remaining, 0)
+            derived['current_run_rate'] = np.where(balls_bowled > 0, runs * 6 / balls_bowled, 0.0)
+    return derived
+
+
+def _decided_probability(features: dict) -> Optional[float]:
+    """Batting team win probability of a finished chase, None while it is still open"""
+    if features['runs_required'] == 0:
+        return 1.0
+    if features['wickets_in_hand'] <= 0 or features['balls_remaining'] == 0:
+        # One run short means the scores are level
+        return 0.5 if features['runs_required'] == 1 else 0.0
+    return None
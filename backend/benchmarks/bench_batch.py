@@ -0,0 +1,60 @@
+"""
+Compare per-row throughput of CricketPredictor.predict against predict_batch
+
+Usage: python benchmarks/bench_batch.py [--rows 1000] [--model path/to/cricket_model.pkl]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.ml.predictor import CricketPredictor
+from benchmarks.synthetic import sample_match_inputs, train_synthetic_model
+
+
+def to_model_input(payload):
+    return dict(payload, batting_team=payload['team1'], bowling_team=payload['team2'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--model", help="Trained model to load (defaults to a synthetic one)")
+    args = parser.parse_args()
+
+    model_path = args.model or train_synthetic_model()
+    # Cache disabled so both paths do the full work
+    predictor = CricketPredictor(str(model_path), cache_size=0)
+    inputs = [to_model_input(p) for p in sample_match_inputs(args.rows)]
+
+    # Warm up both paths once
+    predictor.predict(inputs[0])
+    predictor.predict_batch(inputs[:2])
+
+    start = time.perf_counter()
+    single = [predictor.predict(row) for row in inputs]
+    single_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = predictor.predict_batch(inputs)
+    batch_s = time.perf_counter() - start
+
+    same_winner = all(a[0] == b[0] for a, b in zip(single, batch))
+    same_prob = all(a[1] == b[1] for a, b in zip(single, batch))
+    same_shap = all(a[2] == b[2] for a, b in zip(single, batch))
+
+    print(f"rows:                 {args.rows}")
+    print(f"shap explainer:       {type(predictor.explainer).__name__ if predictor.explainer is not None else 'none (feature importance fallback)'}")
+    print(f"predict loop:         {single_s:.3f}s  ({single_s / args.rows * 1e6:,.0f} us/row)")
+    print(f"predict_batch:        {batch_s:.3f}s  ({batch_s / args.rows * 1e6:,.0f} us/row)")
+    print(f"speedup:              {single_s / batch_s:.1f}x")
+    print(f"identical winners:    {same_winner}")
+    print(f"identical probs:      {same_prob}")
+    print(f"identical shap lists: {same_shap}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Cold-load time and per-worker memory: pickled model vs the memory-mapped bundle
+
+Starts --workers processes per mode, as uvicorn/gunicorn workers would, and
+reports after all of them have loaded the model and served one explained
+prediction. RSS counts shared pages in every process; PSS splits them
+between the processes mapping them, so total PSS is the real footprint.
+Memory figures need Linux /proc.
+
+Usage: python benchmarks/bench_cold_load.py [--workers 4] [--model path/to/cricket_model.pkl]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# mode -> (inference backend, whether the bundle is available)
+MODES = {
+    "pickle (sklearn backend)": ("sklearn", False),
+    "pickle (compiled backend)": ("compiled", False),
+    "bundle (compiled backend)": ("compiled", True),
+}
+
+
+def memory_mb():
+    """RSS, its anonymous (private) and file-backed parts, and PSS of this process in MB"""
+    stats = {}
+    for path, keys in (("/proc/self/status", ("VmRSS", "RssAnon", "RssFile")), ("/proc/self/smaps_rollup", ("Pss",))):
+        try:
+            with open(path) as f:
+                for line in f:
+                    name, _, value = line.partition(":")
+                    if name in keys:
+                        stats[name] = int(value.split()[0]) / 1024
+        except OSError:
+            pass
+    return stats
+
+
+def worker(model_path, backend):
+    os.environ["INFERENCE_BACKEND"] = backend
+    os.environ["WARMUP_ON_STARTUP"] = "false"
+    started = time.perf_counter()
+    from app.ml.predictor import CricketPredictor
+    from benchmarks.synthetic import sample_match_inputs
+    imported = time.perf_counter()
+    predictor = CricketPredictor(model_path, cache_size=0)
+    loaded = time.perf_counter()
+    payload = sample_match_inputs(1)[0]
+    predictor.predict(dict(payload, batting_team=payload['team1'], bowling_team=payload['team2']))
+    first = time.perf_counter()
+
+    print(json.dumps({"import_s": imported - started, "load_s": loaded - imported,
+                      "first_predict_s": first - loaded, "from_bundle": predictor.model is None}), flush=True)
+    # Measure only once every worker of this mode is up, so shared pages are split between them
+    sys.stdin.readline()
+    print(json.dumps(memory_mb()), flush=True)
+
+
+def run_mode(model_path, backend, n_workers):
+    procs = [
+        subprocess.Popen([sys.executable, __file__, "--worker", backend, "--model", str(model_path)],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(n_workers)
+    ]
+    timings = [json.loads(p.stdout.readline()) for p in procs]
+    memory = []
+    for p in procs:
+        p.stdin.write("\n")
+        p.stdin.flush()
+        memory.append(json.loads(p.stdout.readline()))
+    for p in procs:
+        p.wait()
+    return timings, memory
+
+
+def mean(values):
+    values = list(values)
+    return sum(values) / len(values) if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model", help="Trained model to load (defaults to a synthetic one)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.model, args.worker)
+        return
+
+    from benchmarks.synthetic import train_synthetic_model
+    model_path = Path(args.model or train_synthetic_model())
+
+    # The same model without its bundle, as saved before the bundle format existed
+    legacy_dir = Path(tempfile.mkdtemp(prefix="cricket-legacy-"))
+    for name in ("cricket_model.pkl", "model_info.pkl", "cricket_model.compiled.npz"):
+        if (model_path.parent / name).exists():
+            shutil.copy2(model_path.parent / name, legacy_dir / name)
+
+    print(f"workers per mode: {args.workers}")
+    print(f"{'mode':<27} {'load s':>7} {'1st pred s':>10} {'RSS MB':>8} {'private MB':>10} {'PSS MB':>8} {'total PSS':>10}")
+    for mode, (backend, use_bundle) in MODES.items():
+        path = model_path if use_bundle else legacy_dir / "cricket_model.pkl"
+        timings, memory = run_mode(path, backend, args.workers)
+        if use_bundle and not all(t["from_bundle"] for t in timings):
+            print(f"{mode:<27} no bundle next to {model_path}; retrain to create one")
+            continue
+        print(f"{mode:<27} {mean(t['load_s'] for t in timings):7.3f} "
+              f"{mean(t['first_predict_s'] for t in timings):10.3f} "
+              f"{mean(m.get('VmRSS', 0) for m in memory):8.1f} {mean(m.get('RssAnon', 0) for m in memory):10.1f} "
+              f"{mean(m.get('Pss', 0) for m in memory):8.1f} {sum(m.get('Pss', 0) for m in memory):10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare the sklearn pipeline against the array-backed CompiledForest
+
+Checks that both backends agree on every probability, then times single-row
+and batch scoring for each.
+
+Usage: python benchmarks/bench_compiled.py [--rows 2000] [--model path/to/cricket_model.pkl]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from app.ml.compiled_forest import CompiledForest
+from app.ml.predictor import CricketPredictor
+from benchmarks.latency import format_summary, summarize
+from benchmarks.synthetic import sample_match_inputs, train_synthetic_model
+
+
+def time_calls(fn, items):
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--model", help="Trained model to load (defaults to a synthetic one)")
+    args = parser.parse_args()
+
+    predictor = CricketPredictor(str(args.model or train_synthetic_model()), cache_size=0, backend="sklearn")
+    pipeline = predictor.model
+    classifier = pipeline.named_steps['classifier']
+    info = predictor.model_info
+
+    start = time.perf_counter()
+    compiled = CompiledForest.from_pipeline(pipeline, info['numerical_features'], info['categorical_features'])
+    compile_s = time.perf_counter() - start
+
+    rows = [
+        predictor._normalize_input(dict(p, batting_team=p['team1'], bowling_team=p['team2']))
+        for p in sample_match_inputs(args.rows)
+    ]
+
+    expected = pipeline.predict_proba(pd.DataFrame(rows))[:, list(classifier.classes_).index(1)]
+    actual = compiled.predict_proba(rows)
+    max_diff = float(np.max(np.abs(expected - actual)))
+
+    stages = [
+        ("pipeline.predict_proba (1 row)", lambda row: pipeline.predict_proba(pd.DataFrame([row]))),
+        ("encode + classifier (1 row)", lambda row: classifier.predict_proba(predictor._transform([row]))),
+        ("compiled.predict_proba (1 row)", lambda row: compiled.predict_proba([row])),
+    ]
+    for _, fn in stages:
+        fn(rows[0])
+    for name, fn in stages:
+        print(format_summary(name, time_calls(fn, rows[:min(len(rows), 500)])))
+
+    start = time.perf_counter()
+    classifier.predict_proba(predictor._transform(rows))
+    sklearn_batch_s = time.perf_counter() - start
+    start = time.perf_counter()
+    compiled.predict_proba(rows)
+    compiled_batch_s = time.perf_counter() - start
+
+    print(f"\nnodes / trees / depth:     {compiled.n_nodes} / {compiled.n_trees} / {compiled.max_depth}")
+    print(f"compile time:              {compile_s:.3f}s")
+    print(f"sklearn batch:             {sklearn_batch_s / len(rows) * 1e6:,.1f} us/row")
+    print(f"compiled batch:            {compiled_batch_s / len(rows) * 1e6:,.1f} us/row")
+    print(f"max |probability diff|:    {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Concurrent load benchmark for the inference executor modes
+
+Drives /api/predict with concurrent clients through an in-process ASGI client
+while a probe polls /health, and reports p50/p95/p99 latency for both. With
+inline inference the probe stalls behind every prediction; with a worker pool
+it stays responsive.
+
+Usage: python benchmarks/bench_concurrency.py [--concurrency 16] [--duration 10] [--modes inline,thread,process]
+                                             [--batch-window-ms 2 --batch-max-size 32]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+
+from app import config
+from app.main import app
+from app.routers import prediction
+from app.services.prediction_service import PredictionService
+from benchmarks.latency import format_summary, summarize
+from benchmarks.synthetic import sample_match_inputs, train_synthetic_model
+
+
+async def drive(concurrency: int, duration: float):
+    payloads = sample_match_inputs(256)
+    predict_latencies, health_latencies = [], []
+    status_counts = {}
+    deadline = time.perf_counter() + duration
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def predict_client(worker_id: int):
+            i = worker_id
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post("/api/predict", json=payloads[i % len(payloads)])
+                predict_latencies.append(time.perf_counter() - start)
+                status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+                i += concurrency
+
+        async def health_probe():
+            # Latency is measured from when the probe is due, so event loop stalls count
+            while time.perf_counter() < deadline:
+                due = time.perf_counter() + 0.01
+                await asyncio.sleep(0.01)
+                await client.get("/health")
+                health_latencies.append(time.perf_counter() - due)
+
+        await asyncio.gather(health_probe(), *(predict_client(i) for i in range(concurrency)))
+
+    return predict_latencies, health_latencies, status_counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--modes", default="inline,thread,process")
+    parser.add_argument("--batch-window-ms", type=float, default=0.0,
+                        help="Enable micro-batching with this window (0 = off)")
+    parser.add_argument("--batch-max-size", type=int, default=32)
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Prediction cache entries (0 = off, so every request hits the model)")
+    parser.add_argument("--model", help="Trained model to load (defaults to a synthetic one)")
+    args = parser.parse_args()
+
+    model_path = str(args.model or train_synthetic_model())
+
+    for mode in args.modes.split(","):
+        config.INFERENCE_EXECUTOR = mode
+        config.INFERENCE_WORKERS = args.workers
+        config.INFERENCE_MAX_PENDING = args.max_pending
+        config.PREDICT_BATCH_WINDOW_MS = args.batch_window_ms
+        config.PREDICT_BATCH_MAX_SIZE = args.batch_max_size
+        config.PREDICTION_CACHE_SIZE = args.cache_size
+        service = PredictionService(model_path)
+        prediction.prediction_service = service
+        try:
+            # Warm up the pool (process workers load the model on first use)
+            asyncio.run(drive(min(args.workers, args.concurrency), 1.0))
+            predict_latencies, health_latencies, status_counts = asyncio.run(drive(args.concurrency, args.duration))
+        finally:
+            service.shutdown()
+
+        print(f"\n== executor={mode} concurrency={args.concurrency} duration={args.duration:.0f}s")
+        print(format_summary("/api/predict", summarize(predict_latencies)))
+        print(format_summary("/health (probe)", summarize(health_latencies)))
+        print(f"{'throughput':<34} {len(predict_latencies) / args.duration:.1f} req/s  status={status_counts}")
+        if args.cache_size:
+            print(f"{'prediction cache':<34} {service.predictor.cache.stats()}")
+        if service.batcher is not None:
+            print(f"{'micro-batching':<34} {service.batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Time a whole-chase win probability curve against one /api/predict-style call per ball
+
+Usage: python benchmarks/bench_curve.py [--balls 120] [--model path/to/cricket_model.pkl]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.ml.model_trainer import CricketModelTrainer
+from app.models.match import ChaseCurveRequest, ChaseStep, MatchInput
+from app.services.prediction_service import PredictionService
+from benchmarks.synthetic import TEAMS, VENUES, train_synthetic_model
+
+
+async def run(args):
+    service = PredictionService(str(args.model or train_synthetic_model()))
+    # Cache disabled so both paths do the full work
+    service.predictor.cache.max_size = 0
+    rng = random.Random(3)
+    total_balls = 120 if args.balls <= 120 else 300
+    steps = [ChaseStep(runs=rng.choice([0, 0, 1, 1, 2, 4, 6])) for _ in range(args.balls)]
+    request = ChaseCurveRequest(team1=TEAMS[0], team2=TEAMS[1], venue=VENUES[0], target=400,
+                                total_balls=total_balls, steps=steps)
+
+    # One MatchInput per state, as a client replaying the chase would send
+    matches = []
+    runs = balls = 0
+    for step in [None] + steps:
+        if step is not None:
+            runs, balls = runs + step.runs, balls + step.balls
+        features = CricketModelTrainer.chase_features(request.target, runs, 0, balls, total_balls)
+        matches.append(MatchInput(team1=TEAMS[0], team2=TEAMS[1], venue=VENUES[0], explain="none", **features))
+
+    await service.predict_curve(request)
+    await service.predict(matches[0])
+
+    start = time.perf_counter()
+    curve = await service.predict_curve(request)
+    curve_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    singles = [await service.predict(match) for match in matches]
+    singles_s = time.perf_counter() - start
+
+    # Finished states are decided without the model; responses round to 2 decimals
+    same = all(abs(p.probability - s.probability) <= 0.005 + 1e-9
+               for p, s in zip(curve.points, singles) if p.balls_remaining > 0)
+    print(f"states:               {curve.count}")
+    print(f"predict_curve:        {curve_s * 1e3:8.1f} ms")
+    print(f"one predict per ball: {singles_s * 1e3:8.1f} ms")
+    print(f"speedup:              {singles_s / curve_s:.1f}x")
+    print(f"same probabilities:   {same} (open states)")
+    service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--balls", type=int, default=120)
+    parser.add_argument("--model", help="Trained model to load (defaults to a synthetic one)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
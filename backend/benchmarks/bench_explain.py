@@ -0,0 +1,93 @@
+"""
+Compare the built-in TreeShapExplainer against shap.TreeExplainer
+
+With one-hot columns left unfolded the built-in explainer must reproduce
+shap's values; folded is what the API serves. Also checks local accuracy
+(SHAP values + expected value = predicted probability).
+
+Usage: python benchmarks/bench_explain.py [--rows 200] [--model path/to/cricket_model.pkl]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.ml.compiled_forest import CompiledForest
+from app.ml.predictor import CricketPredictor
+from app.ml.tree_shap import TreeShapExplainer
+from benchmarks.latency import format_summary, summarize
+from benchmarks.synthetic import sample_match_inputs, train_synthetic_model
+
+try:
+    import shap
+    SHAP_AVAILABLE = True
+except ImportError:
+    SHAP_AVAILABLE = False
+
+
+def time_calls(fn, items):
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--model", help="Trained model to load (defaults to a synthetic one)")
+    args = parser.parse_args()
+
+    predictor = CricketPredictor(str(args.model or train_synthetic_model()), cache_size=0)
+    info = predictor.model_info
+    forest = CompiledForest.from_pipeline(predictor.model, info['numerical_features'], info['categorical_features'])
+    rows = [
+        predictor._normalize_input(dict(p, batting_team=p['team1'], bowling_team=p['team2']))
+        for p in sample_match_inputs(args.rows)
+    ]
+
+    start = time.perf_counter()
+    folded = TreeShapExplainer(forest)
+    build_s = time.perf_counter() - start
+    unfolded = TreeShapExplainer(forest, fold_categories=False)
+
+    stages = [("builtin folded (1 row)", lambda row: folded.explain([row]))]
+    if SHAP_AVAILABLE:
+        tree_explainer = shap.TreeExplainer(predictor.model.named_steps['classifier'])
+        stages.append(("shap.TreeExplainer (1 row)", lambda row: tree_explainer.shap_values(predictor._transform([row]))))
+    for _, fn in stages:
+        fn(rows[0])
+    for name, fn in stages:
+        print(format_summary(name, time_calls(fn, rows[:100])))
+
+    start = time.perf_counter()
+    values = folded.explain(rows)
+    batch_s = time.perf_counter() - start
+    probabilities = forest.predict_proba(rows)
+    local_error = np.max(np.abs(values.sum(axis=1) + folded.expected_value - probabilities))
+
+    print(f"\nexplainer build:           {build_s:.3f}s")
+    print(f"builtin folded batch:      {batch_s / len(rows) * 1e3:.2f} ms/row")
+    print(f"local accuracy error:      {local_error:.2e}")
+    if SHAP_AVAILABLE:
+        start = time.perf_counter()
+        reference = tree_explainer.shap_values(predictor._transform(rows))
+        shap_s = time.perf_counter() - start
+        reference = reference[1] if isinstance(reference, list) else reference
+        if reference.ndim == 3:
+            reference = reference[:, :, 1]
+        print(f"shap.TreeExplainer batch:  {shap_s / len(rows) * 1e3:.2f} ms/row")
+        print(f"max |diff| vs shap:        {np.max(np.abs(unfolded.explain(rows) - reference)):.2e}")
+    else:
+        print("shap not installed, skipping the comparison")
+
+
+if __name__ == "__main__":
+    main()
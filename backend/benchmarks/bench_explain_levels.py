@@ -0,0 +1,60 @@
+"""
+Latency of a single prediction at each explanation level
+
+explain=none skips the explainer entirely, top5 and full run it and only
+differ in how much of the (sorted) explanation is returned.
+
+Usage: python benchmarks/bench_explain_levels.py [--iterations 200] [--batch 200]
+                                                 [--backends sklearn,compiled] [--model path/to/cricket_model.pkl]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.ml.predictor import CricketPredictor
+from benchmarks.latency import format_summary, summarize
+from benchmarks.synthetic import sample_match_inputs, train_synthetic_model
+
+LEVELS = ["none", "top5", "full"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=200, help="Rows for the predict_batch comparison")
+    parser.add_argument("--backends", default="sklearn,compiled")
+    parser.add_argument("--model", help="Trained model to load (defaults to a synthetic one)")
+    args = parser.parse_args()
+
+    model_path = str(args.model or train_synthetic_model())
+    inputs = [
+        dict(p, batting_team=p['team1'], bowling_team=p['team2'])
+        for p in sample_match_inputs(max(args.iterations, args.batch))
+    ]
+
+    for backend in args.backends.split(","):
+        # Cache disabled so every call does the full work
+        predictor = CricketPredictor(model_path, cache_size=0, backend=backend)
+        print(f"\nbackend={backend} explainer={type(predictor.explainer).__name__}")
+        for level in LEVELS:
+            predictor.predict(inputs[0], level)
+            samples = []
+            for input_data in inputs[:args.iterations]:
+                start = time.perf_counter()
+                predictor.predict(input_data, level)
+                samples.append(time.perf_counter() - start)
+            print(format_summary(f"predict explain={level}", summarize(samples)))
+
+        for level in LEVELS:
+            start = time.perf_counter()
+            predictor.predict_batch(inputs[:args.batch], level)
+            elapsed = time.perf_counter() - start
+            print(f"predict_batch explain={level:<5} {elapsed / args.batch * 1e3:8.3f} ms/row")
+
+
+if __name__ == "__main__":
+    main()
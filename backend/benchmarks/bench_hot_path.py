@@ -0,0 +1,85 @@
+"""
+Microbenchmark of the single-prediction hot path before and after the fast path
+
+The legacy path built a one-row DataFrame, ran the full pipeline for
+predict_proba and again for predict, then ran the preprocessor a third time
+for SHAP. The fast path encodes the dict row directly and runs the forest once,
+reusing the matrix for the class decision and explanations.
+
+Usage: python benchmarks/bench_hot_path.py [--iterations 300] [--model path/to/cricket_model.pkl]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pandas as pd
+
+from app.ml.predictor import CricketPredictor
+from benchmarks.latency import format_summary, summarize
+from benchmarks.synthetic import sample_match_inputs, train_synthetic_model
+
+
+def time_calls(fn, rows):
+    samples = []
+    for row in rows:
+        start = time.perf_counter()
+        fn(row)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--model", help="Trained model to load (defaults to a synthetic one)")
+    args = parser.parse_args()
+
+    predictor = CricketPredictor(str(args.model or train_synthetic_model()))
+    pipeline = predictor.model
+    preprocessor = pipeline.named_steps['preprocessor']
+    classifier = pipeline.named_steps['classifier']
+    rows = [
+        predictor._normalize_input(dict(p, batting_team=p['team1'], bowling_team=p['team2']))
+        for p in sample_match_inputs(args.iterations)
+    ]
+
+    def legacy_stages(row):
+        df = pd.DataFrame([row])
+        pipeline.predict_proba(df)
+        pipeline.predict(df)
+        preprocessor.transform(df)
+
+    def fast_stages(row):
+        X = predictor._transform([row])
+        classifier.predict_proba(X)
+
+    stages = [
+        ("DataFrame build", lambda row: pd.DataFrame([row])),
+        ("ColumnTransformer", lambda row: preprocessor.transform(pd.DataFrame([row]))),
+        ("RowEncoder", lambda row: predictor.row_encoder.transform([row])),
+        ("pipeline.predict_proba", lambda row: pipeline.predict_proba(pd.DataFrame([row]))),
+        ("classifier.predict_proba", lambda row: classifier.predict_proba(predictor._transform([row]))),
+        ("legacy (proba+predict+transform)", legacy_stages),
+        ("fast (encode+proba)", fast_stages),
+    ]
+
+    # Warm up
+    for _, fn in stages:
+        fn(rows[0])
+
+    results = {}
+    for name, fn in stages:
+        results[name] = time_calls(fn, rows)
+        print(format_summary(name, results[name]))
+
+    legacy, fast = results["legacy (proba+predict+transform)"], results["fast (encode+proba)"]
+    print(f"\nper-call savings: {legacy['mean_ms'] - fast['mean_ms']:.2f}ms mean, "
+          f"{legacy['p50_ms'] - fast['p50_ms']:.2f}ms p50 ({legacy['mean_ms'] / fast['mean_ms']:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
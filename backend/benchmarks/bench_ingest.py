@@ -0,0 +1,66 @@
+"""
+Compare loading cricket_features.csv with pandas against the memory-mapped feature store
+
+Usage: python benchmarks/bench_ingest.py [--matches 2000] [--csv path/to/cricket_features.csv]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pandas as pd
+
+from app.ml import feature_store
+from app.ml.model_trainer import CricketModelTrainer
+from benchmarks.synthetic import simulate_chase_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--matches", type=int, default=2000, help="Synthetic matches to generate")
+    parser.add_argument("--csv", help="Feature CSV to load (defaults to a synthetic one)")
+    args = parser.parse_args()
+
+    trainer = CricketModelTrainer()
+    columns = trainer.categorical_features + trainer.numerical_features
+    work_dir = Path(tempfile.mkdtemp(prefix="cricket-ingest-"))
+    csv_path = Path(args.csv) if args.csv else work_dir / "cricket_features.csv"
+    if not args.csv:
+        simulate_chase_rows(n_matches=args.matches).to_csv(csv_path, index=False)
+
+    start = time.perf_counter()
+    df = pd.read_csv(csv_path)
+    csv_s = time.perf_counter() - start
+    csv_mb = df[columns + [trainer.target]].memory_usage(deep=True).sum() / 1e6
+
+    start = time.perf_counter()
+    store = feature_store.ingest(csv_path, work_dir / "store", trainer.categorical_features,
+                                 trainer.numerical_features, trainer.target)
+    ingest_s = time.perf_counter() - start
+    disk_mb = sum(f.stat().st_size for f in store.path.glob("*.bin")) / 1e6
+
+    start = time.perf_counter()
+    frame = store.frame(columns + [trainer.target])
+    frame_s = time.perf_counter() - start
+    frame_mb = frame.memory_usage(deep=True).sum() / 1e6
+
+    same = all(
+        frame[name].astype(object).where(frame[name].notna(), None).tolist()
+        == df[name].astype(object).where(df[name].notna(), None).tolist()
+        for name in trainer.categorical_features
+    )
+
+    print(f"rows:                      {store.n_rows:,}")
+    print(f"pd.read_csv:               {csv_s:6.2f}s  {csv_mb:8.1f} MB in memory")
+    print(f"ingest (chunked, typed):   {ingest_s:6.2f}s  {disk_mb:8.1f} MB on disk")
+    print(f"store.frame (all rows):    {frame_s:6.2f}s  {frame_mb:8.1f} MB in memory")
+    print(f"memory reduction:          {csv_mb / frame_mb:.1f}x")
+    print(f"identical categoricals:    {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Open-loop load test of /api/predict against a locally launched uvicorn server
+
+Starts `uvicorn app.main:app --workers N` on a free port (or targets --url),
+then sends randomized MatchInput payloads at fixed arrival rates. Requests
+are fired on schedule whether or not earlier ones have finished, and latency
+is measured from the scheduled send time, so a slow server cannot hide
+queueing by slowing the client down (no coordinated omission).
+
+Rates are swept upwards (--rates, or geometrically from --start-rate) until
+a level saturates: errors above --max-error-rate, achieved throughput below
+90% of the offered rate, or p99 above --slo-ms. The last healthy rate is the
+sustainable throughput of the instance. The in-flight column is the number
+of requests outstanding when each one was sent, i.e. the concurrency a rate
+produces.
+
+Usage: python benchmarks/bench_load.py [--workers 2] [--rates 25,50,100 | --start-rate 10 --step 1.5]
+                                       [--duration 10] [--slo-ms 500] [--url http://host:8000] [--output load.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+
+from benchmarks.latency import LatencyHistogram
+from benchmarks.synthetic import sample_match_inputs, train_synthetic_model
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# A level whose achieved throughput is below this share of the offered rate is saturated
+MIN_THROUGHPUT_RATIO = 0.9
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def launch_server(port: int, workers: int, registry_dir: str, cache_size: int, log) -> subprocess.Popen:
+    env = dict(os.environ, MODEL_REGISTRY_DIR=registry_dir, PREDICTION_CACHE_SIZE=str(cache_size))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def wait_until_ready(url: str, workers: int, timeout: float = 180.0):
+    """Poll /api/health until enough consecutive 200s that every worker has likely warmed up"""
+    deadline = time.perf_counter() + timeout
+    streak = 0
+    with httpx.Client(base_url=url, timeout=5) as client:
+        while streak < workers * 5:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"Server at {url} not ready after {timeout:.0f}s")
+            try:
+                streak = streak + 1 if client.get("/api/health").status_code == 200 else 0
+            except httpx.HTTPError:
+                streak = 0
+            time.sleep(0.1)
+
+
+async def run_level(client: httpx.AsyncClient, path: str, payloads, rate: float, duration: float,
+                    arrivals: str, rng: random.Random):
+    """Offer `rate` requests/s for `duration` seconds and wait for every response"""
+    loop = asyncio.get_running_loop()
+    latencies, send_lag = LatencyHistogram(), LatencyHistogram()
+    statuses = Counter()
+    in_flight, in_flight_total, peak_in_flight = 0, 0, 0
+    last_finished = 0.0
+
+    async def fire(payload, due: float):
+        nonlocal in_flight, last_finished
+        try:
+            response = await client.post(path, json=payload)
+            statuses[response.status_code] += 1
+            if response.status_code == 200:
+                latencies.record(loop.time() - due)
+        except httpx.HTTPError as e:
+            statuses[type(e).__name__] += 1
+        finally:
+            in_flight -= 1
+            last_finished = loop.time()
+
+    offsets, t = [], 0.0
+    while True:
+        t += rng.expovariate(rate) if arrivals == "poisson" else 1 / rate
+        if t > duration:
+            break
+        offsets.append(t)
+
+    start = loop.time()
+    tasks = []
+    for n, offset in enumerate(offsets):
+        due = start + offset
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        send_lag.record(max(0.0, loop.time() - due))
+        in_flight_total += in_flight
+        in_flight += 1
+        peak_in_flight = max(peak_in_flight, in_flight)
+        tasks.append(asyncio.create_task(fire(payloads[n % len(payloads)], due)))
+    await asyncio.gather(*tasks)
+
+    sent = len(offsets)
+    ok = statuses.get(200, 0)
+    elapsed = max(last_finished, start + duration) - start
+    return {
+        'offered_rate': rate,
+        'sent': sent,
+        'achieved_rate': ok / elapsed if elapsed else 0.0,
+        'error_rate': (sent - ok) / sent if sent else 0.0,
+        'statuses': {str(status): n for status, n in statuses.items()},
+        'mean_in_flight': in_flight_total / sent if sent else 0.0,
+        'peak_in_flight': peak_in_flight,
+        'latency': latencies.summary(),
+        # Lag of the generator behind its schedule; large values mean the client, not the server, saturated
+        'send_lag_p99_ms': send_lag.percentile(99) * 1e3,
+    }
+
+
+def is_saturated(level, slo_ms: float, max_error_rate: float) -> bool:
+    return (level['error_rate'] > max_error_rate
+            or level['achieved_rate'] < MIN_THROUGHPUT_RATIO * level['offered_rate']
+            or not level['latency']['p99_ms'] <= slo_ms)
+
+
+def format_level(level) -> str:
+    latency = level['latency']
+    return (f"{level['offered_rate']:8.1f} {level['achieved_rate']:9.1f} {level['error_rate']:6.1%} "
+            f"{latency['p50_ms']:8.1f} {latency['p90_ms']:8.1f} {latency['p99_ms']:8.1f} "
+            f"{latency['p99.9_ms']:8.1f} {latency['max_ms']:8.1f} "
+            f"{level['mean_in_flight']:7.1f}/{level['peak_in_flight']:<5d} {level['send_lag_p99_ms']:7.1f}")
+
+
+async def sweep(url: str, args):
+    rng = random.Random(args.seed)
+    payloads = sample_match_inputs(args.payloads, seed=args.seed)
+    path = f"/api/predict?explain={args.explain}"
+    if args.rates:
+        rates = [float(rate) for rate in args.rates.split(",")]
+    else:
+        rates = [args.start_rate]
+        while rates[-1] * args.step <= args.max_rate:
+            rates.append(rates[-1] * args.step)
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        if args.warmup > 0:
+            await run_level(client, path, payloads, rates[0], args.warmup, args.arrivals, rng)
+
+        print(f"{'offered':>8} {'achieved':>9} {'errors':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+              f"{'p99.9 ms':>8} {'max ms':>8} {'in-flight':>13} {'lag ms':>7}")
+        levels, sustainable = [], None
+        for rate in rates:
+            level = await run_level(client, path, payloads, rate, args.duration, args.arrivals, rng)
+            level['saturated'] = is_saturated(level, args.slo_ms, args.max_error_rate)
+            levels.append(level)
+            print(format_level(level) + ("  saturated" if level['saturated'] else ""))
+            if level['saturated']:
+                break
+            sustainable = level
+    return levels, sustainable
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Load an already running server instead of launching one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes of the launched server")
+    parser.add_argument("--registry", help="Model registry the launched server serves (defaults to a synthetic model)")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic model's directory after the run")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Prediction cache entries of the launched server (0 = off, so every request hits the model)")
+    parser.add_argument("--rates", help="Comma-separated arrival rates (requests/s) to test, in order")
+    parser.add_argument("--start-rate", type=float, default=10.0)
+    parser.add_argument("--step", type=float, default=1.5, help="Rate multiplier between sweep levels")
+    parser.add_argument("--max-rate", type=float, default=5000.0)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unrecorded seconds at the first rate")
+    parser.add_argument("--arrivals", choices=["uniform", "poisson"], default="poisson")
+    parser.add_argument("--explain", choices=["none", "top5", "full"], default="full")
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="p99 latency above which a level is saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--payloads", type=int, default=5000, help="Distinct randomized payloads to cycle through")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the levels as JSON")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        registry = args.registry or str(train_synthetic_model(keep=args.keep).parent)
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        # Server output (including its load-shedding warnings) goes to a file, not over the results
+        log_path = Path(tempfile.gettempdir()) / f"cricket-load-server-{port}.log"
+        print(f"Server log: {log_path}")
+        server = launch_server(port, args.workers, registry, args.cache_size, open(log_path, "w"))
+    try:
+        wait_until_ready(url, args.workers)
+        print(f"Loading {url} (workers={args.workers if server else '?'}, arrivals={args.arrivals}, "
+              f"{args.duration:.0f}s per level, SLO p99 <= {args.slo_ms:.0f}ms)\n")
+        levels, sustainable = asyncio.run(sweep(url, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if sustainable is None:
+        print("\n❌ Saturated at the first rate; lower --start-rate")
+    elif levels[-1]['saturated']:
+        print(f"\n✓ Sustains {sustainable['achieved_rate']:.1f} predictions/s "
+              f"(p99 {sustainable['latency']['p99_ms']:.1f}ms); saturates by {levels[-1]['offered_rate']:.1f}/s")
+    else:
+        print(f"\n✓ Sustained every rate up to {sustainable['offered_rate']:.1f}/s without saturating")
+    if any(level['send_lag_p99_ms'] > 10 for level in levels):
+        print("Warning: the load generator fell behind its schedule; results at those rates understate the server")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'url': url, 'settings': vars(args), 'levels': levels,
+                       'sustainable_rate': sustainable['achieved_rate'] if sustainable else None}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
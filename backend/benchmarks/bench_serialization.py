@@ -0,0 +1,163 @@
+"""
+Response construction and serialization cost: legacy path against the fast path
+
+The legacy path validated a ShapValue per feature and the PredictionResponse,
+then FastAPI validated the returned model again against response_model,
+dumped it to dicts and encoded those with json.dumps. The fast
+path builds the models with model_construct and serializes them once with
+pydantic-core (ModelJSONResponse); the compact variant sends the explanation
+as parallel arrays.
+
+Measured twice: building and encoding one response in process, and full
+requests through a small FastAPI app (in-process ASGI client) whose routes
+differ only in how they build and return the same prediction.
+
+Usage: python benchmarks/bench_serialization.py [--iterations 2000] [--requests 1000] [--features 25]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from pydantic import TypeAdapter
+
+from app.models.match import MatchInput, PredictionResponse, ShapValue
+from app.routers.responses import ModelJSONResponse
+from app.services.prediction_service import PredictionService
+from benchmarks.latency import format_summary, summarize
+from benchmarks.synthetic import sample_match_inputs
+
+# FastAPI's response_model field wraps a TypeAdapter like this one
+RESPONSE_FIELD = TypeAdapter(PredictionResponse)
+
+
+def legacy_response(match_data: MatchInput, winner: str, probability: float, shap_values, model_version=None):
+    """PredictionService._build_response before the fast path: every model validated"""
+    confidence = "high" if probability > 0.7 else "medium" if probability > 0.6 else "low"
+    shap_explanation = [ShapValue(feature=str(sv['feature']), value=float(sv['value']), impact=str(sv['impact']))
+                        for sv in shap_values]
+    factors = {
+        "toss": f"Won by {match_data.toss_winner}" if match_data.toss_winner else "N/A",
+        "toss_decision": match_data.toss_decision if match_data.toss_decision else "N/A",
+        "venue": match_data.venue,
+        "match_type": match_data.match_type
+    }
+    return PredictionResponse(winner=winner, probability=round(probability, 2), confidence=confidence,
+                              shap_explanation=shap_explanation, factors=factors, model_version=model_version)
+
+
+def legacy_encode(response: PredictionResponse) -> bytes:
+    """
+    What FastAPI does with a model returned under response_model: validate it
+    against the response field, dump it to JSON-compatible objects, json.dumps them
+    """
+    value = RESPONSE_FIELD.validate_python(response)
+    return json.dumps(RESPONSE_FIELD.dump_python(value, mode="json"), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def sample_shap_values(n: int, seed: int = 3):
+    rng = random.Random(seed)
+    values = [{'feature': f"Feature {i}", 'value': rng.uniform(-0.2, 0.2)} for i in range(n)]
+    for sv in values:
+        sv['impact'] = "positive" if sv['value'] > 0 else "negative"
+    return sorted(values, key=lambda sv: abs(sv['value']), reverse=True)
+
+
+def time_calls(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def build_app(service: PredictionService, shap_values) -> FastAPI:
+    """Routes that predict nothing and differ only in how they return the same response"""
+    app = FastAPI()
+
+    @app.post("/legacy", response_model=PredictionResponse)
+    async def legacy(match_data: MatchInput):
+        return legacy_response(match_data, match_data.team1, 0.64, shap_values)
+
+    @app.post("/fast", response_model=PredictionResponse)
+    async def fast(match_data: MatchInput):
+        return ModelJSONResponse(service._build_response(match_data, match_data.team1, 0.64, shap_values))
+
+    @app.post("/compact")
+    async def compact(match_data: MatchInput):
+        return ModelJSONResponse(service._build_response(match_data, match_data.team1, 0.64, shap_values,
+                                                         compact=True))
+
+    return app
+
+
+async def drive(app: FastAPI, path: str, payloads):
+    samples, size = [], 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post(path, json=payloads[0])
+        for payload in payloads:
+            start = time.perf_counter()
+            response = await client.post(path, json=payload)
+            samples.append(time.perf_counter() - start)
+            size = len(response.content)
+    return summarize(samples), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000, help="Responses built and encoded in process")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per route through the ASGI client")
+    parser.add_argument("--features", type=int, default=25, help="Explanation entries per response (full level)")
+    args = parser.parse_args()
+
+    # No model is needed to build responses
+    service = PredictionService.__new__(PredictionService)
+    shap_values = sample_shap_values(args.features)
+    match_data = MatchInput(**sample_match_inputs(1)[0])
+
+    # Both paths must produce the same document
+    legacy = json.loads(legacy_encode(legacy_response(match_data, match_data.team1, 0.64, shap_values)))
+    fast = json.loads(ModelJSONResponse(service._build_response(match_data, match_data.team1, 0.64,
+                                                                shap_values)).body)
+    assert legacy == fast, "fast path output differs from the legacy path"
+
+    print(f"== build + encode one response ({args.features} explanation entries)")
+    cases = {
+        "legacy (validate, dump, json.dumps)":
+            lambda: legacy_encode(legacy_response(match_data, match_data.team1, 0.64, shap_values)),
+        "fast (construct, pydantic-core)":
+            lambda: ModelJSONResponse(service._build_response(match_data, match_data.team1, 0.64, shap_values)),
+        "compact arrays":
+            lambda: ModelJSONResponse(service._build_response(match_data, match_data.team1, 0.64, shap_values,
+                                                              compact=True)),
+    }
+    results = {}
+    for name, fn in cases.items():
+        fn()
+        results[name] = time_calls(fn, args.iterations)
+        print(format_summary(name, results[name]))
+    legacy_ms = results["legacy (validate, dump, json.dumps)"]['mean_ms']
+    fast_ms = results["fast (construct, pydantic-core)"]['mean_ms']
+    print(f"fast path: {legacy_ms / fast_ms:.1f}x faster, {(legacy_ms - fast_ms) * 1000:.0f}µs saved per response")
+
+    print(f"\n== full requests through the ASGI app")
+    app = build_app(service, shap_values)
+    payloads = sample_match_inputs(args.requests)
+    for path in ("/legacy", "/fast", "/compact"):
+        summary, size = asyncio.run(drive(app, path, payloads))
+        print(f"{format_summary(path, summary)} {1000 / summary['mean_ms']:7.0f} req/s {size:6d} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Offline benchmark suite for the predictor, service and HTTP layers with regression checks
+
+Trains a small model on synthetic chase data (or loads --model) and measures
+single, batch and concurrent workloads at three levels:
+
+- predictor: CricketPredictor.predict / predict_batch (threads for concurrency)
+- service:   PredictionService.predict / predict_batch on the inference executor
+- http:      the FastAPI app through an in-process ASGI client
+
+Every case reports throughput (predictions/s) and call latency p50/p95/p99.
+Each level runs --repeats times and every figure is the best over the
+repeats (lowest latency, highest throughput), since interference from the
+rest of the machine only ever makes a run slower; the spread of p50 across
+repeats is reported as the case's noise.
+Results are written as JSON; given a baseline from an earlier run, the suite
+exits with status 1 when a case is slower than the baseline by more than
+--threshold, or --tail-threshold for the noisier p95/p99 and concurrent cases.
+
+Noise floor: on a 1-CPU container, best-of-5 figures of two back-to-back
+runs of the same code differed by up to ~18% (p50, p95/p99 and throughput
+alike), while single repeats of a case differed by up to ~50% in p50. The
+default thresholds sit above that; use more --repeats on noisier machines.
+
+Usage: python benchmarks/bench_suite.py [--output results.json] [--baseline baseline.json] [--threshold 0.25]
+                                        [--levels predictor,service,http] [--repeats 5]
+                                        [--model path/to/cricket_model.pkl]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+import sklearn
+
+from app import config
+from app.main import app
+from app.ml.predictor import CricketPredictor
+from app.models.match import MatchInput
+from app.routers import prediction
+from app.services.prediction_service import PredictionService
+from benchmarks.latency import format_summary, summarize
+from benchmarks.synthetic import sample_match_inputs, train_synthetic_model
+
+LEVELS = ("predictor", "service", "http")
+
+# Lower is better for latencies, higher for throughput
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput")
+
+# Checked against --tail-threshold in every case
+TAIL_METRICS = ("p95_ms", "p99_ms")
+
+
+def to_model_input(payload):
+    return dict(payload, batting_team=payload['team1'], bowling_team=payload['team2'])
+
+
+def result(samples, items: int, seconds: float):
+    summary = summarize(samples)
+    summary['items'] = items
+    summary['throughput'] = items / seconds if seconds else float('nan')
+    return summary
+
+
+def run_sync(call, jobs, items_per_job: int = 1):
+    samples = []
+    started = time.perf_counter()
+    for job in jobs:
+        start = time.perf_counter()
+        call(job)
+        samples.append(time.perf_counter() - start)
+    return result(samples, len(jobs) * items_per_job, time.perf_counter() - started)
+
+
+def run_threads(call, jobs, concurrency: int):
+    def timed(job):
+        start = time.perf_counter()
+        call(job)
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(timed, jobs))
+    return result(samples, len(jobs), time.perf_counter() - started)
+
+
+async def run_async(call, jobs, concurrency: int = 1, items_per_job: int = 1):
+    """`concurrency` clients working through the jobs, each awaiting one call at a time"""
+    samples = []
+    queue = list(reversed(jobs))
+
+    async def client():
+        while queue:
+            job = queue.pop()
+            start = time.perf_counter()
+            await call(job)
+            samples.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return result(samples, len(jobs) * items_per_job, time.perf_counter() - started)
+
+
+def bench_predictor(model_path, payloads, batches, args):
+    predictor = CricketPredictor(str(model_path), cache_size=0)
+    inputs = [to_model_input(p) for p in payloads]
+    input_batches = [[to_model_input(p) for p in batch] for batch in batches]
+    predictor.predict(inputs[0], args.explain)
+    predictor.predict_batch(input_batches[0], args.explain)
+
+    return {
+        "predictor.single": run_sync(lambda row: predictor.predict(row, args.explain), inputs),
+        "predictor.batch": run_sync(lambda batch: predictor.predict_batch(batch, args.explain), input_batches,
+                                    args.batch_size),
+        "predictor.concurrent": run_threads(lambda row: predictor.predict(row, args.explain), inputs,
+                                            args.concurrency),
+    }
+
+
+def bench_service(service, payloads, batches, args):
+    matches = [MatchInput(**p) for p in payloads]
+    match_batches = [[MatchInput(**p) for p in batch] for batch in batches]
+
+    async def run():
+        await service.predict(matches[0], args.explain)
+        await service.predict_batch(match_batches[0], args.explain)
+        return {
+            "service.single": await run_async(lambda match: service.predict(match, args.explain), matches),
+            "service.batch": await run_async(lambda batch: service.predict_batch(batch, args.explain),
+                                             match_batches, items_per_job=args.batch_size),
+            "service.concurrent": await run_async(lambda match: service.predict(match, args.explain), matches,
+                                                  args.concurrency),
+        }
+
+    return asyncio.run(run())
+
+
+def bench_http(service, payloads, batches, args):
+    prediction.prediction_service = service
+    query = f"?explain={args.explain}"
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            async def predict(payload):
+                (await client.post(f"/api/predict{query}", json=payload)).raise_for_status()
+
+            async def predict_batch(batch):
+                (await client.post(f"/api/predict/batch{query}", json={"matches": batch})).raise_for_status()
+
+            await predict(payloads[0])
+            await predict_batch(batches[0])
+            return {
+                "http.single": await run_async(predict, payloads),
+                "http.batch": await run_async(predict_batch, batches, items_per_job=args.batch_size),
+                "http.concurrent": await run_async(predict, payloads, args.concurrency),
+            }
+
+    return asyncio.run(run())
+
+
+def repeat(bench, repeats: int):
+    """
+    Run a level's cases `repeats` times: the best of every figure per case,
+    plus `p50_spread`, the range of p50 across repeats relative to the best
+    """
+    runs = [bench() for _ in range(repeats)]
+    combined = {}
+    for case in runs[0]:
+        summaries = [run[case] for run in runs]
+        summary = {key: (max if key == 'throughput' else min)(s[key] for s in summaries) for key in summaries[0]}
+        p50s = [s['p50_ms'] for s in summaries]
+        summary['repeats'] = repeats
+        summary['p50_spread'] = (max(p50s) - min(p50s)) / summary['p50_ms'] if summary['p50_ms'] else 0.0
+        combined[case] = summary
+    return combined
+
+
+def compare(results, baseline, threshold: float, tail_threshold: float):
+    """Lines comparing every case with the baseline, and the regressions beyond their threshold"""
+    lines, regressions = [], []
+    for case, current in results.items():
+        previous = baseline.get(case)
+        if previous is None:
+            lines.append(f"{case:<24} (not in baseline)")
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            # Positive change = worse
+            change = (before - after) / before if metric == "throughput" else (after - before) / before
+            changes.append(f"{metric} {change:+.1%}")
+            noisy = metric in TAIL_METRICS or case.endswith(".concurrent")
+            if change > (tail_threshold if noisy else threshold):
+                regressions.append(f"{case} {metric}: {before:.3f} -> {after:.3f} ({change:+.1%})")
+        lines.append(f"{case:<24} " + "  ".join(changes))
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--levels", default=",".join(LEVELS))
+    parser.add_argument("--requests", type=int, default=300, help="Single predictions per single/concurrent case")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--explain", choices=["none", "top5", "full"], default="full")
+    parser.add_argument("--executor", choices=["thread", "process", "inline"], default="thread",
+                        help="Inference executor for the service and http levels")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to check for regressions")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs of every level; figures are their median")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline as a fraction (0.25 = 25%%)")
+    parser.add_argument("--tail-threshold", type=float, default=0.5,
+                        help="Allowed slowdown of p95/p99 and of the concurrent cases, which vary more between runs")
+    parser.add_argument("--model", help="Trained model to load (defaults to a synthetic one)")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic model's directory after the run")
+    args = parser.parse_args()
+
+    levels = args.levels.split(",")
+    unknown = set(levels) - set(LEVELS)
+    if unknown:
+        parser.error(f"unknown levels {sorted(unknown)}, expected some of {LEVELS}")
+
+    model_path = args.model or train_synthetic_model(keep=args.keep)
+    payloads = sample_match_inputs(args.requests)
+    batch_payloads = sample_match_inputs(args.batch_size * args.batches, seed=11)
+    batches = [batch_payloads[i:i + args.batch_size] for i in range(0, len(batch_payloads), args.batch_size)]
+
+    # Every request reaches the model, one at a time unless the workload is concurrent
+    config.PREDICTION_CACHE_SIZE = 0
+    config.PREDICT_BATCH_WINDOW_MS = 0.0
+    config.INFERENCE_EXECUTOR = args.executor
+    config.INFERENCE_MAX_PENDING = max(config.INFERENCE_MAX_PENDING, args.concurrency)
+
+    results = {}
+    if "predictor" in levels:
+        results.update(repeat(lambda: bench_predictor(model_path, payloads, batches, args), args.repeats))
+    if "service" in levels or "http" in levels:
+        service = PredictionService(str(model_path))
+        try:
+            if "service" in levels:
+                results.update(repeat(lambda: bench_service(service, payloads, batches, args), args.repeats))
+            if "http" in levels:
+                results.update(repeat(lambda: bench_http(service, payloads, batches, args), args.repeats))
+        finally:
+            service.shutdown()
+
+    for case, summary in results.items():
+        print(f"{format_summary(case, summary)} {summary['throughput']:9.1f}/s  noise ±{summary['p50_spread'] / 2:.0%}")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "scikit_learn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        differing = [key for key in ("batch_size", "concurrency", "explain", "executor", "repeats")
+                     if baseline.get("settings", {}).get(key) != getattr(args, key)]
+        if differing:
+            print(f"Warning: the baseline was run with different {', '.join(differing)}")
+        lines, regressions = compare(results, baseline.get("results", {}), args.threshold,
+                                     args.tail_threshold)
+        print(f"\nAgainst {args.baseline} (threshold {args.threshold:.0%}, tails and concurrent "
+              f"{args.tail_threshold:.0%}, positive changes are slower):")
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s):")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print("\n✓ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Latency summary helpers shared by the benchmark scripts
+"""
+import math
+from typing import Dict, Iterable
+
+
+def percentile(sorted_values, q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return float('nan')
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples: Iterable[float]) -> Dict[str, float]:
+    """Count, mean and p50/p95/p99 of latency samples in seconds, reported in ms"""
+    values = sorted(samples)
+    count = len(values)
+    return {
+        'count': count,
+        'mean_ms': sum(values) / count * 1e3 if count else float('nan'),
+        'p50_ms': percentile(values, 50) * 1e3,
+        'p95_ms': percentile(values, 95) * 1e3,
+        'p99_ms': percentile(values, 99) * 1e3,
+    }
+
+
+def format_summary(name: str, summary: Dict[str, float]) -> str:
+    return (f"{name:<34} n={summary['count']:<6} mean={summary['mean_ms']:8.2f}ms "
+            f"p50={summary['p50_ms']:8.2f}ms p95={summary['p95_ms']:8.2f}ms p99={summary['p99_ms']:8.2f}ms")
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram in the spirit of HdrHistogram
+
+    Every value is kept to within `precision` relative error in constant
+    memory, so tail percentiles stay meaningful over millions of requests.
+    """
+
+    PERCENTILES = (50, 75, 90, 99, 99.9, 99.99)
+
+    def __init__(self, lowest: float = 1e-5, precision: float = 0.01):
+        self.lowest = lowest
+        self._log_base = math.log1p(precision)
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        index = 0 if seconds <= self.lowest else int(math.log(seconds / self.lowest) / self._log_base) + 1
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile, in seconds"""
+        if not self.count:
+            return float('nan')
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.lowest * math.exp(index * self._log_base), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Count, mean, the PERCENTILES and max, in ms"""
+        result = {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1e3 if self.count else float('nan'),
+        }
+        for q in self.PERCENTILES:
+            result[f"p{q:g}_ms"] = self.percentile(q) * 1e3
+        result['max_ms'] = self.max * 1e3
+        return result
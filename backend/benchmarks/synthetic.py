@@ -0,0 +1,128 @@
+"""
+Synthetic cricket_features-style data for offline benchmarks.
+
+The real cricket_features.csv is not shipped with the repo, so benchmarks
+simulate second-innings chases ball by ball and train a small model on them.
+"""
+import atexit
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+from app.ml.model_trainer import CricketModelTrainer
+
+TEAMS = [
+    "Mumbai Indians",
+    "Chennai Super Kings",
+    "Royal Challengers Bangalore",
+    "Kolkata Knight Riders",
+    "Delhi Capitals",
+    "Punjab Kings",
+    "Rajasthan Royals",
+    "Sunrisers Hyderabad",
+]
+
+VENUES = [
+    "Wankhede Stadium, Mumbai",
+    "M. Chinnaswamy Stadium, Bangalore",
+    "Eden Gardens, Kolkata",
+    "Feroz Shah Kotla, Delhi",
+    "MA Chidambaram Stadium, Chennai",
+]
+
+COLUMNS = ['batting_team', 'bowling_team', 'venue', 'runs_required', 'balls_remaining',
+           'wickets_in_hand', 'target_match', 'current_run_rate', 'required_run_rate',
+           'toss_winner', 'toss_decision', 'win']
+
+
+def simulate_chase_rows(n_matches: int = 200, total_balls: int = 120, seed: int = 42) -> pd.DataFrame:
+    """Simulate ball-by-ball chases and return one feature row per ball"""
+    rng = random.Random(seed)
+    strength = {team: rng.uniform(-0.15, 0.15) for team in TEAMS}
+    rows = []
+
+    for _ in range(n_matches):
+        batting_team, bowling_team = rng.sample(TEAMS, 2)
+        venue = rng.choice(VENUES)
+        toss_winner = rng.choice([batting_team, bowling_team])
+        toss_decision = rng.choice(['bat', 'field'])
+        target = int(rng.gauss(165, 25))
+        edge = strength[batting_team] - strength[bowling_team]
+
+        runs, wickets, balls = 0, 0, 0
+        match_rows = []
+        while balls < total_balls and wickets < 10 and runs < target:
+            balls += 1
+            if rng.random() < 0.05 - edge * 0.1:
+                wickets += 1
+            else:
+                runs += rng.choices([0, 1, 2, 3, 4, 6], weights=[35, 35, 8, 1, 13 + edge * 20, 8 + edge * 20])[0]
+            match_rows.append({
+                'batting_team': batting_team,
+                'bowling_team': bowling_team,
+                'venue': venue,
+                'toss_winner': toss_winner,
+                'toss_decision': toss_decision,
+                **CricketModelTrainer.chase_features(target, runs, wickets, balls, total_balls),
+            })
+
+        win = int(runs >= target)
+        for row in match_rows:
+            row['win'] = win
+        rows.extend(match_rows)
+
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def sample_match_inputs(n: int, seed: int = 7) -> List[Dict]:
+    """Random MatchInput-shaped payloads covering the synthetic vocabulary"""
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(n):
+        team1, team2 = rng.sample(TEAMS, 2)
+        target = rng.randint(120, 220)
+        balls_remaining = rng.randint(1, 119)
+        runs_required = rng.randint(1, target)
+        balls_bowled = 120 - balls_remaining
+        payloads.append({
+            'team1': team1,
+            'team2': team2,
+            'venue': rng.choice(VENUES),
+            'toss_winner': rng.choice([team1, team2]),
+            'toss_decision': rng.choice(['bat', 'field']),
+            'match_type': 'T20',
+            'runs_required': runs_required,
+            'balls_remaining': balls_remaining,
+            'wickets_in_hand': rng.randint(1, 10),
+            'target_match': target,
+            'current_run_rate': round((target - runs_required) * 6 / balls_bowled, 2),
+            'required_run_rate': round(runs_required * 6 / balls_remaining, 2),
+        })
+    return payloads
+
+
+def train_synthetic_model(model_dir: str = None, n_matches: int = 200, seed: int = 42, keep: bool = False) -> Path:
+    """
+    Train a CricketModelTrainer model on synthetic data and return its path
+
+    Without model_dir the model goes to a temporary directory that is removed
+    when the process exits, unless keep is set.
+    """
+    if model_dir is None:
+        model_dir = tempfile.mkdtemp(prefix="cricket-bench-")
+        if keep:
+            print(f"Keeping the synthetic model in {model_dir}")
+        else:
+            atexit.register(shutil.rmtree, model_dir, ignore_errors=True)
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    data_path = model_dir / "cricket_features.csv"
+    simulate_chase_rows(n_matches=n_matches, seed=seed).to_csv(data_path, index=False)
+
+    trainer = CricketModelTrainer()
+    trainer.train(str(data_path))
+    return Path(trainer.save_model(str(model_dir)))
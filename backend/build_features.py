@@ -0,0 +1,33 @@
+"""
+Script to build cricket_features.csv from Cricsheet ball-by-ball match files
+Only new or changed match files are reprocessed on later runs
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.ml.feature_builder import build_features
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the training table from per-match ball-by-ball files")
+    parser.add_argument("match_dir", help="Directory of Cricsheet JSON/YAML/CSV match files (searched recursively)")
+    parser.add_argument("--output", default=str(Path(__file__).parent.parent / "cricket_features.csv"),
+                        help="Feature CSV to write (default: cricket_features.csv in the project root)")
+    parser.add_argument("--workers", type=int, help="Worker processes (defaults to all CPUs)")
+    parser.add_argument("--full", action="store_true", help="Reprocess every match file, ignoring the manifest")
+    args = parser.parse_args()
+    
+    if not Path(args.match_dir).is_dir():
+        print(f"\n❌ Error: Match directory not found at {args.match_dir}")
+        return
+    
+    summary = build_features(args.match_dir, args.output, n_workers=args.workers, full=args.full)
+    if summary['failed']:
+        print(f"⚠ {summary['failed']} match files could not be processed (see manifest.json in the parts directory)")
+    print("✓ Feature table ready; run train_model.py to retrain")
+
+if __name__ == "__main__":
+    main()
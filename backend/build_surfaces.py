@@ -0,0 +1,65 @@
+"""
+Precompute win-probability lookup surfaces for configured fixtures
+
+Every chase state (runs required x balls remaining x wickets in hand) of
+every fixture is scored with batched model calls and stored next to the
+model, which then answers those states by array lookup.
+
+The fixtures file is a JSON list such as:
+    [{"batting_team": "India", "bowling_team": "Australia", "venue": "Wankhede Stadium, Mumbai",
+      "toss_winner": "India", "toss_decision": "field", "match_type": "T20", "target": [160, 180]}]
+`target` is one target or a list; `total_balls` defaults from match_type.
+
+Usage: python build_surfaces.py fixtures.json [--model models/cricket_model.pkl] [--dtype float16]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.ml import lookup_surface
+from app.ml.predictor import CricketPredictor, default_registry
+from app.models.match import INNINGS_BALLS
+
+
+def expand_fixtures(entries):
+    """One fixture per target, with total_balls resolved from match_type"""
+    fixtures = []
+    for entry in entries:
+        total_balls = entry.get('total_balls') or INNINGS_BALLS.get(str(entry.get('match_type', '')).upper())
+        if total_balls is None:
+            raise ValueError(f"total_balls is required for match_type {entry.get('match_type')!r}")
+        targets = entry['target'] if isinstance(entry['target'], list) else [entry['target']]
+        fixtures.extend(dict(entry, target=target, total_balls=total_balls) for target in targets)
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fixtures", help="JSON file listing the fixtures")
+    parser.add_argument("--model", help="Model to score with (defaults to the registry's current model)")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16",
+                        help="Stored probability precision (float16: ~0.0005 error, half the size)")
+    args = parser.parse_args()
+
+    with open(args.fixtures) as f:
+        fixtures = expand_fixtures(json.load(f))
+    model_path = Path(args.model or default_registry().model_path())
+    predictor = CricketPredictor(str(model_path), cache_size=0)
+    if not predictor.is_loaded:
+        print(f"❌ Error: no trained model at {model_path}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    path = lookup_surface.build(predictor, fixtures, lookup_surface.surfaces_path(model_path), args.dtype)
+    size_mb = sum(p.stat().st_size for p in path.iterdir()) / 1e6
+    print(f"✓ {len(fixtures)} surfaces for model {predictor.model_version or 'unversioned'} "
+          f"({size_mb:.1f} MB) in {time.perf_counter() - started:.1f}s: {path}")
+
+
+if __name__ == "__main__":
+    main()
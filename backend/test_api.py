@@ -1,5 +1,8 @@
 """
 Simple test script to verify the API is working
+
+To measure how much traffic a server sustains, use the open-loop load
+generator instead: python benchmarks/bench_load.py --workers 2
 """
 import requests
 import json
@@ -2,6 +2,7 @@
 Script to train the cricket prediction model
 Run this script after installing dependencies to train and save the model
 """
+import argparse
 import sys
 import os
 from pathlib import Path
@@ -12,6 +13,30 @@ sys.path.insert(0, str(Path(__file__).parent))
 from app.ml.model_trainer import CricketModelTrainer
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the cricket prediction model")
+    parser.add_argument("--tune", action="store_true",
+                        help="Cross-validate a hyperparameter grid in parallel before the final fit")
+    parser.add_argument("--folds", type=int, default=5, help="Cross-validation folds for --tune")
+    parser.add_argument("--workers", type=int, help="Worker processes for --tune (defaults to all CPUs)")
+    parser.add_argument("--update", metavar="NEW_DATA",
+                        help="Update the saved model with new rows (CSV or feature store) instead of retraining")
+    parser.add_argument("--trees", type=int, default=25, help="Trees to fit on the new rows for --update")
+    parser.add_argument("--retire", type=int, default=0, help="Oldest trees to drop for --update")
+    parser.add_argument("--compare", action="store_true",
+                        help="With --update, also time a full retrain and check the accuracy gap")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="Accepted accuracy gap to a full retrain for --compare")
+    parser.add_argument("--compress", nargs="*", metavar="CANDIDATE",
+                        help="Compare compressed models (prune:N, depth:D, distill:N:D, gbm:N; "
+                             "default set if none given) with the trained one on held-out rows")
+    parser.add_argument("--serve", metavar="CANDIDATE",
+                        help="With --compress, save this compressed candidate instead of the full model")
+    parser.add_argument("--per-format", action="store_true",
+                        help="Also train one model per match_type, served for requests of that format")
+    parser.add_argument("--min-rows", type=int, default=5000,
+                        help="Fewest rows a match_type needs for its own model with --per-format")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("Cricket Match Prediction Model Training")
     print("=" * 60)
@@ -21,6 +46,11 @@ def main():
     
     # Path to cricket data
     data_path = Path(__file__).parent.parent / "cricket_features.csv"
+    models_dir = Path(__file__).parent / "models"
+    
+    if args.update:
+        update_model(trainer, args, data_path, models_dir)
+        return
     
     if not data_path.exists():
         print(f"\n❌ Error: Data file not found at {data_path}")
@@ -32,10 +62,17 @@ def main():
     
     try:
         # Train the model
-        model, accuracy = trainer.train(str(data_path))
+        if args.tune:
+            model, accuracy = trainer.tune(str(data_path), n_folds=args.folds, n_workers=args.workers)
+        else:
+            model, accuracy = trainer.train(str(data_path))
+        
+        if args.compress is not None or args.serve:
+            trainer.compress(str(data_path), candidates=args.compress, serve=args.serve)
+            if args.serve:
+                accuracy = trainer.compression['accuracy']
         
         # Save the model
-        models_dir = Path(__file__).parent / "models"
         model_path = trainer.save_model(str(models_dir))
         
         print("\n" + "=" * 60)
@@ -43,6 +80,14 @@ def main():
         print("=" * 60)
         print(f"Model Accuracy: {accuracy:.2%}")
         print(f"Model saved to: {model_path}")
+        
+        if args.per_format:
+            accuracies = trainer.train_per_format(str(data_path), str(models_dir), min_rows=args.min_rows)
+            print("\n" + "=" * 60)
+            print(f"✓ Trained {len(accuracies)} per-format model(s)")
+            print("=" * 60)
+            for match_type, format_accuracy in accuracies.items():
+                print(f"{match_type:<10} Accuracy: {format_accuracy:.2%}")
         print("\nYou can now start the FastAPI server and make predictions!")
         
     except Exception as e:
@@ -50,5 +95,29 @@ def main():
         import traceback
         traceback.print_exc()
 
+def update_model(trainer, args, data_path, models_dir):
+    """Warm-start the saved model on newly arrived rows and save it as a new version"""
+    try:
+        trainer.load(str(models_dir))
+        report = trainer.update(args.update, n_trees=args.trees, retire_oldest=args.retire,
+                                reference_data_path=str(data_path) if args.compare else None,
+                                tolerance=args.tolerance)
+        model_path = trainer.save_model(str(models_dir))
+        
+        print("\n" + "=" * 60)
+        print("✓ Update Complete!")
+        print("=" * 60)
+        print(f"Model Accuracy: {report['accuracy']:.2%} ({report['n_trees']} trees)")
+        if 'accuracy_gap' in report:
+            status = "within" if report['within_tolerance'] else "OUTSIDE"
+            print(f"Full retrain:   {report['full_retrain_accuracy']:.2%} "
+                  f"(gap {report['accuracy_gap']:+.4f}, {status} tolerance {args.tolerance})")
+        print(f"Model saved to: {model_path}")
+        
+    except Exception as e:
+        print(f"\n❌ Error during update: {e}")
+        import traceback
+        traceback.print_exc()
+
 if __name__ == "__main__":
     main()
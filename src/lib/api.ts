@@ -15,6 +15,8 @@ export interface PredictionRequest {
   target_match?: number;
   current_run_rate?: number;
   required_run_rate?: number;
+  // "none" skips the SHAP explanation when only the probability is needed
+  explain?: "none" | "top5" | "full";
 }
 
 export interface ShapValue {
@@ -34,6 +36,7 @@ export interface PredictionResponse {
     venue: string;
     match_type: string;
   };
+  model_version?: string;
 }
 
 // API service